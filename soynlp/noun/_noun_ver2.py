@@ -1,14 +1,22 @@
 from collections import defaultdict
 from collections import namedtuple
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+import json
 import os
 
+import numpy as np
+
 from soynlp.normalizer import normalize_sent_for_lrgraph
 from soynlp.utils import check_corpus
 from soynlp.utils import check_dirs
 from soynlp.utils import EojeolCounter
 from soynlp.utils import LRGraph
+from soynlp.utils import CompactLRGraph
 from soynlp.utils import get_process_memory
+from soynlp.utils import check_instrument
 from soynlp.tokenizer import MaxScoreTokenizer
+from soynlp.tokenizer import ScoreTrie
 from ._josa import extract_domain_pos_features
 from ._noun_postprocessing import detaching_features
 from ._noun_postprocessing import ignore_features
@@ -16,15 +24,170 @@ from ._noun_postprocessing import check_N_is_NJ
 
 NounScore = namedtuple('NounScore', 'frequency score')
 
+class _FeatureTrie:
+    """Trie of reversed R features. Each node has bit flags of the feature types
+    (pos, neg, common) of the features which end at the node.
+
+    Features word[e:] + r for all 0 <= e < len(word) are found by one walk
+    along reversed r and then reversed word.
+    """
+
+    POS, NEG, COMMON = 1, 2, 4
+
+    def __init__(self, pos_features, neg_features, common_features):
+        self._children = {}
+        self._flags = [0]
+        for flag, features in [(self.POS, pos_features),
+            (self.NEG, neg_features), (self.COMMON, common_features)]:
+            for feature in features:
+                self._insert(feature, flag)
+
+    def _insert(self, feature, flag):
+        node = 0
+        for char in reversed(feature):
+            child = self._children.get((node, char))
+            if child is None:
+                child = len(self._flags)
+                self._children[(node, char)] = child
+                self._flags.append(0)
+            node = child
+        self._flags[node] |= flag
+
+    def longer_flags(self, word, r):
+        """It returns the union of flags of features word[e:] + r, 0 <= e < len(word)"""
+        node = self.suffix_node(r)
+        if node < 0:
+            return 0
+        return self.longer_flags_from(node, word)
+
+    def suffix_node(self, r):
+        """It returns the node of reversed r, or -1 if r is not a suffix of any feature"""
+        children = self._children
+        node = 0
+        for char in reversed(r):
+            node = children.get((node, char))
+            if node is None:
+                return -1
+        return node
+
+    def longer_flags_from(self, node, word):
+        children = self._children
+        flags = 0
+        for char in reversed(word):
+            node = children.get((node, char))
+            if node is None:
+                break
+            flags |= self._flags[node]
+        return flags
+
+class _CompoundTrie:
+    """Trie of nouns for compound segmentation.
+
+    segment(word) returns the same compound parts with tokenizing word by
+    MaxScoreTokenizer(scores={noun: len(noun)}) and _parse_compound. Nouns
+    in word are found by walking the trie from each begin index, and they are
+    selected greedily in order of (-length, begin) without overlapping.
+    word is a compound when the selected nouns tile a prefix of word,
+    and the remained suffix is empty or a pos feature.
+    """
+
+    def __init__(self, nouns, max_length=10):
+        """nouns is collection of str, dict or ScoreTrie. ScoreTrie is used as it is"""
+        self.max_length = max_length
+        self._trie = nouns if isinstance(nouns, ScoreTrie) else ScoreTrie(nouns)
+
+    def _matches(self, word, max_length):
+        """It returns (-length, begin, end) of nouns in word"""
+        last = len(word) - 1
+        return [(b - e, b, e) for b, e, _ in self._trie.matches(word, max_length) if b < last]
+
+    def segment(self, word, pos_features):
+        """It returns tuple of nouns if word is Noun* or Noun* + Josa, else None"""
+        n = len(word)
+        if n <= 2:
+            return None
+        max_length = min(self.max_length, n)
+
+        occupied = 0
+        picks = []
+        for _, b, e in sorted(self._matches(word, max_length)):
+            mask = ((1 << (e - b)) - 1) << b
+            if not (occupied & mask):
+                occupied |= mask
+                picks.append((b, e))
+        if not picks:
+            return None
+
+        # every token except the last one should be noun
+        picks.sort()
+        end = 0
+        for b, e in picks:
+            if b != end:
+                return None
+            end = e
+        nouns = tuple(word[b:e] for b, e in picks)
+
+        # all tokens are noun
+        if end == n:
+            if len(nouns) >= 3 and nouns[-1] in pos_features:
+                return nouns[:-1]
+            return nouns
+
+        # the suffix longer than max_length is split into several tokens
+        if n - end > max_length:
+            return None
+
+        # Noun* + Josa
+        if len(nouns) >= 2 and word[end:] in pos_features:
+            return nouns
+        return None
+
+# integer classes of R features used in predict_batch
+_END, _COMMON, _POS, _NEG, _UNK = range(5)
+
+_worker_predictor = None
+_worker_compound_trie = None
+_worker_pos_features = None
+
+def _init_noun_prediction_worker(predictor):
+    # predictor has only the features and the parameters of prediction.
+    # LRGraph of the words is passed with each group of words
+    global _worker_predictor
+    _worker_predictor = predictor
+
+def _predict_nouns_in_worker(args):
+    words, lrgraph, min_noun_score = args
+    _worker_predictor.lrgraph = lrgraph
+    return _worker_predictor._predict_and_remove_eojeols(words, min_noun_score)
+
+def _init_compound_segmentation_worker(compound_trie, pos_features):
+    global _worker_compound_trie, _worker_pos_features
+    _worker_compound_trie = compound_trie
+    _worker_pos_features = pos_features
+
+def _segment_compounds(compound_trie, pos_features, words):
+    segment = compound_trie.segment
+    return [(word, segment(word, pos_features)) for word in words]
+
+def _segment_compounds_in_worker(words):
+    return _segment_compounds(_worker_compound_trie, _worker_pos_features, words)
+
 class LRNounExtractor_v2:
     def __init__(self, max_left_length=10, max_right_length=9, predictor_headers=None,
         verbose=True, min_num_of_features=1, max_frequency_when_noun_is_eojeol=30,
         eojeol_counter_filtering_checkpoint=500000,
         extract_compound=True, extract_pos_feature=False, extract_determiner=False,
-        ensure_normalized=False, postprocessing=None, logpath=None):
+        ensure_normalized=False, postprocessing=None, logpath=None, instrument=None):
+        """
+        :param instrument: soynlp.utils.Instrument
+            It measures 'train' and the stages of extract ('noun_prediction',
+            'compound_extraction', ...), and counts 'words' and 'candidates'.
+            Default is no-op instrument
+        """
 
         self.max_left_length = max_left_length
         self.max_right_length = max_right_length
+        self._lrgraph_path = None
         self.lrgraph = None
         self.verbose = verbose
         self.min_num_of_features = min_num_of_features
@@ -35,6 +198,7 @@ class LRNounExtractor_v2:
         self.extract_determiner = extract_determiner
         self.ensure_normalized = ensure_normalized
         self.logpath = logpath
+        self.instrument = check_instrument(instrument)
 
         if logpath:
             check_dirs(logpath)
@@ -59,6 +223,24 @@ class LRNounExtractor_v2:
     def is_trained(self):
         return self.lrgraph
 
+    @property
+    def lrgraph(self):
+        # the graph of lazy loaded extractor is loaded when it is used first
+        if self._lrgraph_path is not None:
+            self._load_lrgraph()
+        return self._lrgraph
+
+    @lrgraph.setter
+    def lrgraph(self, lrgraph):
+        self._lrgraph = lrgraph
+        self._lrgraph_path = None
+
+    def _load_lrgraph(self):
+        lrgraph = CompactLRGraph() if self._lrgraph_compact else LRGraph()
+        lrgraph.load(self._lrgraph_path)
+        self._lrgraph = lrgraph
+        self._lrgraph_path = None
+
     def _set_default_predictor_header(self):
 
         if self.verbose:
@@ -101,6 +283,11 @@ class LRNounExtractor_v2:
         self._pos_features = pos
         self._neg_features = neg
         self._common_features = common
+        self._build_feature_trie()
+
+    def _build_feature_trie(self):
+        self._feature_trie = _FeatureTrie(
+            self._pos_features, self._neg_features, self._common_features)
 
     def _append_features(self, feature_type, features):
 
@@ -129,6 +316,7 @@ class LRNounExtractor_v2:
             raise ValueError('Feature type was wrong. Choice = [pos, neg, common]')
 
         self._common_features.update(commons)
+        self._build_feature_trie()
 
         # size after
         n_pos_, n_neg_, n_common_ = check_feature_size()
@@ -139,26 +327,33 @@ class LRNounExtractor_v2:
             print('[Noun Extractor] features appended. {}'.format(message))
 
     def train_extract(self, inputs, min_noun_score=0.3,
-        min_noun_frequency=1, min_eojeol_frequency=1, reset_lrgraph=True):
-
-        self.train(inputs, min_eojeol_frequency)
-
-        return self.extract(min_noun_score, min_noun_frequency, reset_lrgraph)
-
-    def train(self, inputs, min_eojeol_frequency=1):
-        if isinstance(inputs, LRGraph):
-            self._train_with_lrgraph(inputs)
-        elif isinstance(inputs, EojeolCounter):
-            self._train_with_eojeol_counter(inputs)
-        else:
-            self._train_with_sentences(inputs, min_eojeol_frequency)
+        min_noun_frequency=1, min_eojeol_frequency=1, reset_lrgraph=True, n_jobs=1):
+
+        self.train(inputs, min_eojeol_frequency, n_jobs)
+
+        return self.extract(min_noun_score, min_noun_frequency, reset_lrgraph, n_jobs)
+
+    def train(self, inputs, min_eojeol_frequency=1, n_jobs=1):
+        """
+        :param n_jobs: int
+            Number of worker processes for eojeol counting.
+            Used only when inputs are sentences
+        """
+        with self.instrument.stage('train'):
+            if isinstance(inputs, LRGraph):
+                self._train_with_lrgraph(inputs)
+            elif isinstance(inputs, EojeolCounter):
+                self._train_with_eojeol_counter(inputs)
+            else:
+                self._train_with_sentences(inputs, min_eojeol_frequency, n_jobs)
 
-    def _train_with_sentences(self, sentences, min_eojeol_frequency=1):
+    def _train_with_sentences(self, sentences, min_eojeol_frequency=1, n_jobs=1):
         if self.verbose:
             print('[Noun Extractor] counting eojeols')
 
         if not self.ensure_normalized:
-            preprocess = lambda x:x
+            # identity function of EojeolCounter, which is picklable for workers
+            preprocess = None
         else:
             preprocess = normalize_sent_for_lrgraph
 
@@ -170,14 +365,17 @@ class LRNounExtractor_v2:
             max_length = self.max_left_length + self.max_right_length,
             filtering_checkpoint = self.eojeol_counter_filtering_checkpoint,
             verbose = self.verbose,
-            preprocess = preprocess
+            preprocess = preprocess,
+            n_jobs = n_jobs,
+            instrument = self.instrument
         )
 
         self._train_with_eojeol_counter(eojeol_counter)
 
     def _train_with_eojeol_counter(self, eojeol_counter):
-        lrgraph = eojeol_counter.to_lrgraph(
-            self.max_left_length, self.max_right_length)
+        with self.instrument.stage('lrgraph_construction'):
+            lrgraph = eojeol_counter.to_lrgraph(
+                self.max_left_length, self.max_right_length)
 
         num_of_eojeols = eojeol_counter._count_sum
 
@@ -206,7 +404,7 @@ class LRNounExtractor_v2:
         min_noun_score=0.3, min_noun_frequency=100,
         min_pos_score=0.3, min_pos_feature_frequency=1000,
         min_num_of_unique_lastchar=4, min_entropy_of_lastchar=0.5,
-        min_noun_entropy=1.5):
+        min_noun_entropy=1.5, n_jobs=1):
 
         if self.verbose:
             print('[Noun Extractor] batch prediction for extracting pos feature')
@@ -215,7 +413,7 @@ class LRNounExtractor_v2:
             noun_candidates = self._noun_candidates_from_positive_features()
 
         prediction_scores = self._batch_predicting_nouns(
-            noun_candidates, min_noun_score)
+            noun_candidates, min_noun_score, n_jobs)
 
         self.lrgraph.reset_lrgraph()
 
@@ -240,7 +438,12 @@ class LRNounExtractor_v2:
             print('[Noun Extractor] {} pos features were extracted'.format(
                 len(self._pos_features_extracted)))
 
-    def extract(self, min_noun_score=0.3, min_noun_frequency=1, reset_lrgraph=True):
+    def extract(self, min_noun_score=0.3, min_noun_frequency=1, reset_lrgraph=True, n_jobs=1):
+        """
+        :param n_jobs: int
+            Number of worker processes for noun prediction.
+            If n_jobs = -1, it uses all cores
+        """
 
         # reset covered eojeol count
         self._num_of_covered_eojeols = 0
@@ -252,10 +455,12 @@ class LRNounExtractor_v2:
             if self.verbose:
                 print('[Noun Extractor] extract and append pos features')
 
-            self.extract_domain_pos_features(noun_candidates)
+            with self.instrument.stage('pos_feature_extraction'):
+                self.extract_domain_pos_features(noun_candidates, n_jobs=n_jobs)
 
-        prediction_scores = self._batch_predicting_nouns(
-            noun_candidates, min_noun_score)
+        with self.instrument.stage('noun_prediction'):
+            prediction_scores = self._batch_predicting_nouns(
+                noun_candidates, min_noun_score, n_jobs)
 
         if self.logpath:
             with open(self.logpath+'_prediction_score.log', 'w', encoding='utf-8') as f:
@@ -268,8 +473,9 @@ class LRNounExtractor_v2:
         if self.extract_compound:
             candidates = {l:sum(rdict.values()) for l,rdict in
                 self.lrgraph._lr.items() if len(l) >= 4}
-            compounds = self.extract_compounds(
-                candidates, prediction_scores, min_noun_score)
+            with self.instrument.stage('compound_extraction'):
+                compounds = self.extract_compounds(
+                    candidates, prediction_scores, min_noun_score, n_jobs)
 
         else:
             compounds = {}
@@ -284,15 +490,21 @@ class LRNounExtractor_v2:
         nouns = {noun:score for noun, score in nouns.items()
             if score[0] >= min_noun_frequency}
 
-        nouns = self._post_processing(nouns, prediction_scores, compounds)
+        with self.instrument.stage('postprocessing'):
+            nouns = self._post_processing(nouns, prediction_scores, compounds)
 
         if self.verbose:
             print('[Noun Extractor] {} nouns ({} compounds) with min frequency={}'.format(
                 len(nouns), len(compounds), min_noun_frequency), flush=True)
             print('[Noun Extractor] flushing ... ', flush=True, end='')
 
-        self._check_covered_eojeols(nouns)
+        with self.instrument.stage('eojeol_coverage'):
+            self._check_covered_eojeols(nouns)
+        self.instrument.event('nouns_extracted',
+            num_nouns=len(nouns), num_compounds=len(compounds))
 
+        self._prediction_scores = prediction_scores
+        self._compounds = compounds
         self._nouns = nouns
 
         if reset_lrgraph:
@@ -303,34 +515,166 @@ class LRNounExtractor_v2:
         nouns_ = {noun:NounScore(score[0], score[1]) for noun, score in nouns.items()}
         return nouns_
 
-    def _get_nonempty_features(self, word, features):
+    def save(self, dirname):
+        """
+        :param dirname: str
+            Directory path. It has configuration.json, features.json,
+            nouns.json (prediction scores, nouns, compounds and their components)
+            and lrgraph.npz, the binary format of LRGraph.save
+
+        Usage
+        -----
+            >>> noun_extractor.train_extract(corpus)
+            >>> noun_extractor.save('model/noun_extractor')
+        """
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        configuration = {
+            'max_left_length': self.max_left_length,
+            'max_right_length': self.max_right_length,
+            'min_num_of_features': self.min_num_of_features,
+            'max_frequency_when_noun_is_eojeol': self.max_frequency_when_noun_is_eojeol,
+            'eojeol_counter_filtering_checkpoint': self.eojeol_counter_filtering_checkpoint,
+            'extract_compound': self.extract_compound,
+            'extract_pos_feature': self.extract_pos_feature,
+            'extract_determiner': self.extract_determiner,
+            'ensure_normalized': self.ensure_normalized,
+            'postprocessing': self.postprocessing,
+            'num_of_eojeols': getattr(self, '_num_of_eojeols', 0),
+            'num_of_covered_eojeols': getattr(self, '_num_of_covered_eojeols', 0)
+        }
+        with open('%s/configuration.json' % dirname, 'w', encoding='utf-8') as f:
+            json.dump(configuration, f, indent=2)
+
+        features = {
+            'pos': sorted(self._pos_features),
+            'neg': sorted(self._neg_features),
+            'common': sorted(self._common_features)
+        }
+        with open('%s/features.json' % dirname, 'w', encoding='utf-8') as f:
+            json.dump(features, f, ensure_ascii=False)
+
+        decomposer = getattr(self, '_compound_decomposer', None)
+        nouns = {
+            'prediction_scores': getattr(self, '_prediction_scores', {}),
+            'nouns': getattr(self, '_nouns', {}),
+            'compounds': getattr(self, '_compounds', {}),
+            'compounds_components': getattr(self, '_compounds_components', {}),
+            'compound_decomposer': list(decomposer.scores) if decomposer else None
+        }
+        with open('%s/nouns.json' % dirname, 'w', encoding='utf-8') as f:
+            json.dump(nouns, f, ensure_ascii=False)
+
+        # the original graph is saved even if lrgraph has not been reset
+        lrgraph_path = '%s/lrgraph.npz' % dirname
+        if self._lrgraph_path is not None:
+            if os.path.abspath(self._lrgraph_path) != os.path.abspath(lrgraph_path):
+                self.lrgraph.save(lrgraph_path, binary=True)
+        elif self._lrgraph is not None:
+            self._lrgraph.save(lrgraph_path, binary=True)
+        elif os.path.exists(lrgraph_path):
+            os.remove(lrgraph_path)
+
+    def load(self, dirname, lazy=True, compact=True):
+        """
+        :param dirname: str
+            Directory path written by save(dirname)
+        :param lazy: Boolean
+            If True, lrgraph is loaded when it is used first.
+            Extracted nouns and decompose_compound are available without lrgraph,
+            so restarting a service with the trained extractor is near-instant
+        :param compact: Boolean
+            If True, lrgraph is loaded as CompactLRGraph. Else, LRGraph
+
+        Usage
+        -----
+            >>> noun_extractor = LRNounExtractor_v2(verbose=False)
+            >>> noun_extractor.load('model/noun_extractor')
+            >>> noun_extractor.decompose_compound('두바이월드센터시카고옵션거래소')
+        """
+        with open('%s/configuration.json' % dirname, encoding='utf-8') as f:
+            configuration = json.load(f)
+        self.max_left_length = configuration['max_left_length']
+        self.max_right_length = configuration['max_right_length']
+        self.min_num_of_features = configuration['min_num_of_features']
+        self.max_frequency_when_noun_is_eojeol = configuration['max_frequency_when_noun_is_eojeol']
+        self.eojeol_counter_filtering_checkpoint = configuration['eojeol_counter_filtering_checkpoint']
+        self.extract_compound = configuration['extract_compound']
+        self.extract_pos_feature = configuration['extract_pos_feature']
+        self.extract_determiner = configuration['extract_determiner']
+        self.ensure_normalized = configuration['ensure_normalized']
+        self.postprocessing = configuration['postprocessing']
+        self._num_of_eojeols = configuration['num_of_eojeols']
+        self._num_of_covered_eojeols = configuration['num_of_covered_eojeols']
+
+        with open('%s/features.json' % dirname, encoding='utf-8') as f:
+            features = json.load(f)
+        self._pos_features = set(features['pos'])
+        self._neg_features = set(features['neg'])
+        self._common_features = set(features['common'])
+        self._build_feature_trie()
+
+        # json stores tuples as lists
+        with open('%s/nouns.json' % dirname, encoding='utf-8') as f:
+            nouns = json.load(f)
+        self._prediction_scores = {word:tuple(score)
+            for word, score in nouns['prediction_scores'].items()}
+        self._nouns = {word:tuple(score) for word, score in nouns['nouns'].items()}
+        self._compounds = {word:tuple(score) for word, score in nouns['compounds'].items()}
+        self._compounds_components = {word:tuple(components)
+            for word, components in nouns['compounds_components'].items()}
+        if nouns['compound_decomposer'] is not None:
+            # the decomposer and the compound trie share a trie
+            noun_trie = ScoreTrie({noun:len(noun) for noun in nouns['compound_decomposer']})
+            self._compound_decomposer = MaxScoreTokenizer(scores=noun_trie)
+            self._compound_trie = _CompoundTrie(noun_trie)
+
+        lrgraph_path = '%s/lrgraph.npz' % dirname
+        self.lrgraph = None
+        if os.path.exists(lrgraph_path):
+            self._lrgraph_path = lrgraph_path
+            self._lrgraph_compact = compact
+            if not lazy:
+                self._load_lrgraph()
+
+    @property
+    def nouns(self):
+        """It returns {noun: NounScore} of the last extraction"""
+        return {noun:NounScore(score[0], score[1])
+            for noun, score in getattr(self, '_nouns', {}).items()}
+
+    def _get_nonempty_features(self, word, features, longer_flags=None):
+        if longer_flags is None:
+            longer_flags = self._longer_feature_flags(word, features)
+        POS, NEG = _FeatureTrie.POS, _FeatureTrie.NEG
         return [r for r, _ in features if (
-            ( (r in self._pos_features) and (not self._exist_longer_pos(word, r)) ) or
-            ( (r in self._neg_features) and (not self._exist_longer_neg(word, r)) ) )]
+            ( (r in self._pos_features) and (not (longer_flags[r] & POS)) ) or
+            ( (r in self._neg_features) and (not (longer_flags[r] & NEG)) ) )]
+
+    def _longer_feature_flags(self, word, features):
+        """It returns {r: flags of longer features word[e:] + r} for r in features"""
+        longer_flags = self._feature_trie.longer_flags
+        return {r:longer_flags(word, r) for r, _ in features}
 
     def _exist_longer_pos(self, word, r):
-        for e in range(len(word)-1, -1, -1):
-            if (word[e:]+r) in self._pos_features:
-                return True
-        return False
+        return bool(self._feature_trie.longer_flags(word, r) & _FeatureTrie.POS)
 
     def _exist_longer_neg(self, word, r):
-        for e in range(len(word)-1, -1, -1):
-            if (word[e:]+r) in self._neg_features:
-                return True
-        return False
+        return bool(self._feature_trie.longer_flags(word, r) & _FeatureTrie.NEG)
 
     def predict(self, word, min_noun_score=0.3, debug=False):
 
         # scoring
         features = self.lrgraph.get_r(word, -1)
-        pos, common, neg, unk, end = self._predict(word, features)
+        longer_flags = self._longer_feature_flags(word, features)
+        pos, common, neg, unk, end = self._predict(word, features, longer_flags)
 
         base = pos + neg
         score = 0 if base == 0 else (pos - neg) / base
         support = pos + end + common if score >= min_noun_score else neg + end + common
 
-        features_ = self._get_nonempty_features(word, features)
+        features_ = self._get_nonempty_features(word, features, longer_flags)
         n_features_ = len(features_)
 
         # debug code
@@ -363,7 +707,7 @@ class LRNounExtractor_v2:
                 if not r:
                     continue
                 if r in self._pos_features or r in self._common_features:
-                    if not self._exist_longer_pos(word, r):
+                    if not (longer_flags[r] & _FeatureTrie.POS):
                         first_chars.add(r[0])
                 if not (r in self._pos_features or r in self._common_features):
                     first_chars.add(r[0])
@@ -381,7 +725,10 @@ class LRNounExtractor_v2:
             # "명사 + Unknown R" 로 후처리
             return (support, 0)
 
-    def _predict(self, word, features):
+    def _predict(self, word, features, longer_flags=None):
+
+        if longer_flags is None:
+            longer_flags = self._longer_feature_flags(word, features)
 
         pos, common, neg, unk, end = 0, 0, 0, 0, 0
 
@@ -389,9 +736,9 @@ class LRNounExtractor_v2:
             if r == '':
                 end += freq
                 continue
-            if self._exist_longer_pos(word, r): # ignore
+            if longer_flags[r] & _FeatureTrie.POS: # ignore
                 continue
-            if self._exist_longer_neg(word, r): # negative -다고, -자는
+            if longer_flags[r] & _FeatureTrie.NEG: # negative -다고, -자는
                 #neg += freq # ('관계자' 의 경우 '관계 + 자는'으로 고려될 수 있음)
                 continue
             if r in self._common_features:
@@ -405,6 +752,146 @@ class LRNounExtractor_v2:
 
         return pos, common, neg, unk, end
 
+    def predict_batch(self, words, min_noun_score=0.3):
+        """It returns the same (support, score) with predict for each word
+        as two numpy.ndarray. R features are classified once into integer
+        classes, and the counts of features are aggregated with NumPy.
+
+        :param words: list of str
+        :param min_noun_score: float
+
+        Usage
+        -----
+            >>> supports, scores = noun_extractor.predict_batch(['아이오아이', '아이돌'])
+        """
+
+        words = list(words)
+        n = len(words)
+        word_idx, r_idx, counts, r_list = self._gather_features(words)
+        r_class, in_pos, in_neg, in_common, r_node, first_char = self._classify_features(r_list)
+
+        # flags of longer features word[e:] + r. Only R which are suffixes
+        # of features have the trie node to walk from
+        flags = np.zeros(len(counts), dtype=np.int64)
+        nodes = r_node[r_idx]
+        edges = np.flatnonzero(nodes >= 0)
+        longer_flags_from = self._feature_trie.longer_flags_from
+        flags[edges] = [longer_flags_from(node, words[i]) for node, i
+                        in zip(nodes[edges].tolist(), word_idx[edges].tolist())]
+        longer_pos = (flags & _FeatureTrie.POS) > 0
+        longer_neg = (flags & _FeatureTrie.NEG) > 0
+
+        def sum_by_word(mask):
+            return np.bincount(word_idx[mask], weights=counts[mask], minlength=n).astype(np.int64)
+
+        # same with _predict
+        cls = r_class[r_idx]
+        cls = np.where((cls != _END) & (longer_pos | longer_neg), -1, cls)
+        pos = sum_by_word(cls == _POS)
+        common = sum_by_word(cls == _COMMON)
+        neg = sum_by_word(cls == _NEG)
+        unk = sum_by_word(cls == _UNK)
+        end = sum_by_word(cls == _END)
+
+        # same with _get_nonempty_features
+        nonempty = (in_pos[r_idx] & ~longer_pos) | (in_neg[r_idx] & ~longer_neg)
+        n_features = np.bincount(word_idx[nonempty], minlength=n)
+
+        # number of distinct first characters of R
+        mask = (r_class[r_idx] != _END) & (~(in_pos | in_common)[r_idx] | ~longer_pos)
+        keys = np.unique(word_idx[mask] * 0x110000 + first_char[r_idx[mask]])
+        n_first_chars = np.bincount(keys // 0x110000, minlength=n)
+
+        base = pos + neg
+        sum_ = pos + common + neg + unk + end
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = np.where(base == 0, 0., (pos - neg) / base)
+            end_ratio = end / sum_
+            support_ = pos + common + end
+            ratio = support_ / sum_
+        support = np.where(score >= min_noun_score, pos + end + common, neg + end + common)
+
+        # exception cases of predict
+        exceptional = n_features <= self.min_num_of_features
+        frequent = (end > self.max_frequency_when_noun_is_eojeol) & (pos >= neg)
+        covered = ((common > 0) | (pos > 0)) & (end_ratio >= 0.3) & (common >= neg)
+        various = (n_first_chars >= 2)
+        use_ratio = exceptional & (sum_ > 0) & ~frequent & (covered | various)
+        zero_score = exceptional & ((sum_ == 0) | (~frequent & ~(covered | various)))
+
+        supports = np.where(use_ratio, support_, support)
+        scores = np.where(use_ratio, ratio, np.where(zero_score, 0., score))
+        return supports, scores
+
+    def _gather_features(self, words):
+        """It returns (word index, R index, count) of edges of words and list of R"""
+        if isinstance(self.lrgraph, CompactLRGraph):
+            return self._gather_compact_features(words)
+
+        lr = self.lrgraph._lr
+        r_to_idx = {}
+        word_idx, r_idx, counts = [], [], []
+        for i, word in enumerate(words):
+            for r, count in lr.get(word, {}).items():
+                idx = r_to_idx.get(r, -1)
+                if idx < 0:
+                    idx = r_to_idx[r] = len(r_to_idx)
+                word_idx.append(i)
+                r_idx.append(idx)
+                counts.append(count)
+
+        r_list = [None] * len(r_to_idx)
+        for r, idx in r_to_idx.items():
+            r_list[idx] = r
+
+        return (np.asarray(word_idx, dtype=np.int64), np.asarray(r_idx, dtype=np.int64),
+            np.asarray(counts, dtype=np.int64), r_list)
+
+    def _gather_compact_features(self, words):
+        graph = self.lrgraph
+        l_idx = np.asarray([graph._l_to_idx.get(word, -1) for word in words], dtype=np.int64)
+        found = np.flatnonzero(l_idx >= 0)
+        begin = graph._l_indptr[l_idx[found]]
+        lengths = graph._l_indptr[l_idx[found] + 1] - begin
+
+        # edge ids of the rows of found words
+        offsets = np.cumsum(lengths) - lengths
+        edges = np.arange(lengths.sum(), dtype=np.int64) + np.repeat(begin - offsets, lengths)
+        word_idx = np.repeat(found, lengths)
+        counts = graph._counts[edges].astype(np.int64)
+
+        # removed pairs remain as zero counts
+        nonzero = counts > 0
+        word_idx, counts = word_idx[nonzero], counts[nonzero]
+        r_ids, r_idx = np.unique(graph._r_ids[edges[nonzero]], return_inverse=True)
+        r_list = [graph._r_list[r] for r in r_ids.tolist()]
+        return word_idx, r_idx.astype(np.int64), counts, r_list
+
+    def _classify_features(self, r_list):
+        """It returns the class, memberships, trie node and first character of each R"""
+        r_class = np.full(len(r_list), _UNK, dtype=np.int8)
+        in_pos = np.zeros(len(r_list), dtype=bool)
+        in_neg = np.zeros(len(r_list), dtype=bool)
+        in_common = np.zeros(len(r_list), dtype=bool)
+        r_node = np.zeros(len(r_list), dtype=np.int64)
+        first_char = np.zeros(len(r_list), dtype=np.int64)
+        for i, r in enumerate(r_list):
+            in_pos[i] = r in self._pos_features
+            in_neg[i] = r in self._neg_features
+            in_common[i] = r in self._common_features
+            r_node[i] = self._feature_trie.suffix_node(r)
+            if not r:
+                r_class[i] = _END
+                continue
+            first_char[i] = ord(r[0])
+            if in_common[i]:
+                r_class[i] = _COMMON
+            elif in_pos[i]:
+                r_class[i] = _POS
+            elif in_neg[i]:
+                r_class[i] = _NEG
+        return r_class, in_pos, in_neg, in_common, r_node, first_char
+
     def _noun_candidates_from_positive_features(self, condition=None):
 
         def satisfy(word, e):
@@ -431,14 +918,37 @@ class LRNounExtractor_v2:
         return N_from_J
 
     def _batch_predicting_nouns(self,
-        noun_candidates, min_noun_score=0.3):
+        noun_candidates, min_noun_score=0.3, n_jobs=1):
+
+        if n_jobs == -1:
+            n_jobs = cpu_count()
+
+        words = sorted(noun_candidates, key=lambda x:-len(x))
+        if n_jobs > 1:
+            prediction_scores = self._parallel_predicting_nouns(words, min_noun_score, n_jobs)
+        else:
+            prediction_scores, _ = self._predict_and_remove_eojeols(
+                words, min_noun_score, verbose=self.verbose)
+
+        if self.verbose:
+            print('\r[Noun Extractor] batch prediction was completed for {} words'.format(
+                len(words)), flush=True)
+
+        return prediction_scores
+
+    def _predict_and_remove_eojeols(self, words, min_noun_score, verbose=False):
+        """It predicts words in order, and removes eojeols covered by nouns from lrgraph.
+        It returns prediction scores and the list of removed (eojeol, count)"""
 
         prediction_scores = {}
+        removals = []
 
-        n = len(noun_candidates)
-        for i, word in enumerate(sorted(noun_candidates, key=lambda x:-len(x))):
+        n = len(words)
+        count_word = self.instrument.count
+        for i, word in enumerate(words):
+            count_word('words')
 
-            if self.verbose and i % 1000 == 999:
+            if verbose and i % 1000 == 999:
                 percentage = '%.3f' % (100 * (i+1) / n)
                 print('\r  -- batch prediction {} % of {} words'.format(
                     percentage, n), flush=True, end='')
@@ -454,40 +964,105 @@ class LRNounExtractor_v2:
                     # remove all eojeols that including word at left-side.
                     # we have to assume that pos, neg features are incomplete
                     self.lrgraph.remove_eojeol(word+r, count)
+                    removals.append((word+r, count))
                     # if (r == '' or
                     #    (r in self._pos_features) or
                     #    (r in self._common_features)):
                     #    self.lrgraph.remove_eojeol(word+r, count)
 
-        if self.verbose:
-            print('\r[Noun Extractor] batch prediction was completed for {} words'.format(
-                n), flush=True)
-
-        return prediction_scores
-
-    def extract_compounds(self, candidates, prediction_scores, min_noun_score=0.3):
+        return prediction_scores, removals
+
+    def _prediction_worker(self):
+        """It returns a copy of extractor which has only the features and
+        the parameters used in predict, to be sent to worker processes"""
+        predictor = LRNounExtractor_v2.__new__(LRNounExtractor_v2)
+        for attr in ['min_num_of_features', 'max_frequency_when_noun_is_eojeol',
+            '_pos_features', '_neg_features', '_common_features', '_feature_trie']:
+            setattr(predictor, attr, getattr(self, attr))
+        predictor.verbose = False
+        predictor.instrument = check_instrument(None)
+        predictor.lrgraph = None
+        return predictor
+
+    def _parallel_predicting_nouns(self, words, min_noun_score, n_jobs):
+        # Prediction of a word reads only the R of the word, and the removed eojeols
+        # begin with the word. Both depend only on the words which have same first
+        # syllable, so each group is predicted independently in the sequential order
+        groups = defaultdict(list)
+        for word in words:
+            groups[word[0]].append(word)
+        groups = sorted(groups.values(), key=lambda x:-len(x))
+
+        # the L-R graph of a group contains only the words of the group
+        def group_lrgraph(group):
+            get_r = self.lrgraph.get_r
+            lrgraph = {word:dict(get_r(word, -1)) for word in group}
+            return LRGraph({word:rdict for word, rdict in lrgraph.items() if rdict})
+
+        scores = {}
+        pool = Pool(n_jobs, _init_noun_prediction_worker, (self._prediction_worker(),))
+        try:
+            args = ((group, group_lrgraph(group), min_noun_score) for group in groups)
+            for i, (scores_, removals) in enumerate(
+                pool.imap_unordered(_predict_nouns_in_worker, args)):
+                scores.update(scores_)
+                self.instrument.count('words', len(scores_))
+                for eojeol, count in removals:
+                    self.lrgraph.remove_eojeol(eojeol, count)
+                if self.verbose:
+                    percentage = '%.3f' % (100 * len(scores) / len(words))
+                    print('\r  -- batch prediction {} % of {} words'.format(
+                        percentage, len(words)), flush=True, end='')
+        finally:
+            pool.close()
+            pool.join()
+
+        # same order with sequential prediction
+        return {word:scores[word] for word in words}
+
+    def extract_compounds(self, candidates, prediction_scores, min_noun_score=0.3, n_jobs=1):
+        """
+        :param n_jobs: int
+            Number of worker processes for compound segmentation.
+            If n_jobs = -1, it uses all cores
+        """
 
         noun_scores = {noun:len(noun) for noun, score in prediction_scores.items()
                        if score[1] > min_noun_score and len(noun) > 1}
 
-        self._compound_decomposer = MaxScoreTokenizer(scores=noun_scores)
+        # the decomposer and the compound trie share a trie
+        noun_trie = ScoreTrie(noun_scores)
+        self._compound_decomposer = MaxScoreTokenizer(scores=noun_trie)
+        self._compound_trie = _CompoundTrie(noun_trie)
 
         candidates = {l:rdict.get('', 0) for l,rdict in self.lrgraph._lr_origin.items()
             if (len(l) >= 4) and not (l in noun_scores)}
 
+        if n_jobs == -1:
+            n_jobs = cpu_count()
+
         n = len(candidates)
         compounds_scores = {}
         compounds_counts = {}
         compounds_components = {}
 
-        for i, (word, count) in enumerate(sorted(candidates.items(), key=lambda x:-len(x[0]))):
+        sorted_candidates = sorted(candidates.items(), key=lambda x:-len(x[0]))
+        if n_jobs > 1:
+            segmentations = self._parallel_segmenting_compounds(
+                [word for word, _ in sorted_candidates], n_jobs)
+
+        # counts and removal of eojeols are updated in order
+        self.instrument.count('candidates', n)
+        for i, (word, count) in enumerate(sorted_candidates):
 
             if self.verbose and i % 1000 == 999:
                 percentage = '%.2f' % (100 * i / n)
                 print('\r  -- check compound {} %'.format(percentage), flush=True, end='')
 
-            tokens = self._compound_decomposer.tokenize(word, flatten=False)[0]
-            compound_parts = self._parse_compound(tokens)
+            if n_jobs > 1:
+                compound_parts = segmentations[word]
+            else:
+                compound_parts = self._compound_trie.segment(word, self._pos_features)
 
             if compound_parts:
 
@@ -523,6 +1098,25 @@ class LRNounExtractor_v2:
 
         return compounds
 
+    def _parallel_segmenting_compounds(self, words, n_jobs):
+        # segmentation of a word is independent to the others.
+        # words are grouped by first syllable to make batches
+        groups = defaultdict(list)
+        for word in words:
+            groups[word[0]].append(word)
+        groups = sorted(groups.values(), key=lambda x:-len(x))
+
+        segmentations = {}
+        pool = Pool(n_jobs, _init_compound_segmentation_worker,
+            (self._compound_trie, self._pos_features))
+        try:
+            for segmentations_ in pool.imap_unordered(_segment_compounds_in_worker, groups):
+                segmentations.update(segmentations_)
+        finally:
+            pool.close()
+            pool.join()
+        return segmentations
+
     def decompose_compound(self, word):
 
         tokens = self._compound_decomposer.tokenize(word, flatten=False)[0]
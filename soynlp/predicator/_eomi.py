@@ -3,13 +3,19 @@ from collections import namedtuple
 from soynlp.hangle import decompose
 from soynlp.lemmatizer import lemma_candidate
 from soynlp.lemmatizer import _conjugate_stem
+from soynlp.utils import check_instrument
 
 EomiScore = namedtuple('EomiScore', 'frequency score')
 
 class EomiExtractor:
 
     def __init__(self, lrgraph, stems, nouns,
-        min_num_of_features=5, verbose=True, logpath=None):
+        min_num_of_features=5, verbose=True, logpath=None, instrument=None):
+        """
+        :param instrument: soynlp.utils.Instrument
+            It measures 'eomi_prediction' and 'eomi_lemmatization' stages
+            and counts 'words'. Default is no-op instrument
+        """
 
         self.lrgraph = lrgraph
         self._stems = stems
@@ -17,6 +23,7 @@ class EomiExtractor:
         self.min_num_of_features = min_num_of_features
         self.verbose = verbose
         self.logpath = logpath
+        self.instrument = check_instrument(instrument)
         self._eomis = None
 
     @property
@@ -44,8 +51,9 @@ class EomiExtractor:
         # base prediction
         candidates = self._candidates_from_stem_surfaces(condition)
 
-        prediction_scores = self._batch_prediction(
-            candidates, min_eomi_score, self.min_num_of_features)
+        with self.instrument.stage('eomi_prediction'):
+            prediction_scores = self._batch_prediction(
+                candidates, min_eomi_score, self.min_num_of_features)
 
         eomi_surfaces = {eomi:score for eomi, score in prediction_scores.items()
             if (score[1] >= min_eomi_score)}
@@ -55,7 +63,8 @@ class EomiExtractor:
             self._print(message, replace=False, newline=True)
 
         self.lrgraph.reset_lrgraph()
-        lemmas = self._eomi_lemmatize(eomi_surfaces)
+        with self.instrument.stage('eomi_lemmatization'):
+            lemmas = self._eomi_lemmatize(eomi_surfaces)
 
         lemmas = {eomi:score for eomi, score in lemmas.items()
             if (score[0] >= min_eomi_frequency) and (score[1] >= min_eomi_score)}
@@ -176,7 +185,9 @@ class EomiExtractor:
         prediction_scores = {}
 
         n = len(eomi_candidates)
+        count_word = self.instrument.count
         for i, r in enumerate(sorted(eomi_candidates, key=lambda x:-len(x))):
+            count_word('words')
 
             if self.verbose and i % 10000 == 9999:
                 percentage = '%.2f' % (100 * (i+1) / n)
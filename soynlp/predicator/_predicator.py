@@ -19,6 +19,7 @@ from soynlp.hangle import character_is_complete_korean
 from soynlp.utils import EojeolCounter
 from soynlp.utils import get_process_memory
 from soynlp.utils import LRGraph
+from soynlp.utils import check_instrument
 from soynlp.utils.utils import installpath
 from soynlp.lemmatizer import conjugate
 from soynlp.lemmatizer import lemma_candidate
@@ -37,7 +38,12 @@ class PredicatorExtractor:
 
     def __init__(self, nouns, josas=None, adjectives=None,
         verbs=None, eomis=None, extract_eomi=False, extract_stem=False,
-        verbose=True, ensure_normalized=False):
+        verbose=True, ensure_normalized=False, instrument=None):
+        """
+        :param instrument: soynlp.utils.Instrument
+            It measures 'eojeol_counting', 'eomi_extraction', 'stem_extraction'
+            and 'predicator_extraction' stages. Default is no-op instrument
+        """
 
         if not josas:
             josas = self._load_default_josa()
@@ -58,6 +64,7 @@ class PredicatorExtractor:
         self.extract_eomi = extract_eomi
         self.extract_stem = extract_stem
         self.ensure_normalized = ensure_normalized
+        self.instrument = check_instrument(instrument)
 
         self._stem_surfaces = self._transform_stem_as_surfaces()
         self.eojeol_counter = None
@@ -142,12 +149,13 @@ class PredicatorExtractor:
         min_num_of_features=5, min_eomi_score=0.3, min_eomi_frequency=1,
         # Stem extractor
         min_num_of_unique_R_char=10, min_entropy_of_R_char=0.5,
-        min_entropy_of_R=1.5, min_stem_score=0.7, min_stem_frequency=100):
+        min_entropy_of_R=1.5, min_stem_score=0.7, min_stem_frequency=100,
+        n_jobs=1):
 
         self.train(inputs, min_eojeol_frequency, filtering_checkpoint,
             min_num_of_features, min_eomi_score, min_eomi_frequency,
             min_num_of_unique_R_char, min_entropy_of_R_char,
-            min_entropy_of_R, min_stem_score, min_stem_frequency)
+            min_entropy_of_R, min_stem_score, min_stem_frequency, n_jobs)
 
         predicators = self.extract(
             candidates, min_predicator_frequency)
@@ -158,7 +166,13 @@ class PredicatorExtractor:
         min_num_of_features=5, min_eomi_score=0.3, min_eomi_frequency=1,
         # Stem extractor
         min_num_of_unique_R_char=10, min_entropy_of_R_char=0.5,
-        min_entropy_of_R=1.5, min_stem_score=0.7, min_stem_frequency=100):
+        min_entropy_of_R=1.5, min_stem_score=0.7, min_stem_frequency=100,
+        n_jobs=1):
+        """
+        :param n_jobs: int
+            Number of worker processes for eojeol counting.
+            Used only when inputs are sentences
+        """
 
         # handle inputs
         if isinstance(inputs, LRGraph):
@@ -169,7 +183,7 @@ class PredicatorExtractor:
                 inputs, min_eojeol_frequency)
         else:
             self._train_with_sentences(inputs,
-                min_eojeol_frequency, filtering_checkpoint)
+                min_eojeol_frequency, filtering_checkpoint, n_jobs)
 
         # prepare predicator lrgraph
         if self.extract_eomi or self.extract_stem:
@@ -177,22 +191,24 @@ class PredicatorExtractor:
 
         # extract eomi & stem
         if self.extract_eomi:
-            self._extract_eomi(lrgraph, min_num_of_features,
-                min_eomi_score, min_eomi_frequency)
+            with self.instrument.stage('eomi_extraction'):
+                self._extract_eomi(lrgraph, min_num_of_features,
+                    min_eomi_score, min_eomi_frequency)
 
         if self.extract_stem:
             if self.extract_eomi:
                 lrgraph.reset_lrgraph()
-            self._extract_stem(lrgraph, min_num_of_unique_R_char,
-                min_entropy_of_R_char, min_entropy_of_R,
-                min_stem_score, min_stem_frequency)
+            with self.instrument.stage('stem_extraction'):
+                self._extract_stem(lrgraph, min_num_of_unique_R_char,
+                    min_entropy_of_R_char, min_entropy_of_R,
+                    min_stem_score, min_stem_frequency)
 
         if self.verbose:
             message = 'has been trained'
             self._print(message, replace=False, newline=True)
 
     def _train_with_sentences(self, sentences, min_eojeol_frequency=2,
-        filtering_checkpoint=100000):
+        filtering_checkpoint=100000, n_jobs=1):
 
         check = filtering_checkpoint > 0
 
@@ -201,7 +217,8 @@ class PredicatorExtractor:
             self._print(message, replace=False, newline=False)
 
         if self.ensure_normalized:
-            preprocess = lambda x:x
+            # identity function of EojeolCounter, which is picklable for workers
+            preprocess = None
         else:
             preprocess = normalize_sent_for_lrgraph
 
@@ -210,7 +227,9 @@ class PredicatorExtractor:
             sentences,
             min_count = min_eojeol_frequency,
             verbose = self.verbose,
-            preprocess = preprocess
+            preprocess = preprocess,
+            n_jobs = n_jobs,
+            instrument = self.instrument
         )
 
         self._train_with_eojeol_counter(eojeol_counter)
@@ -239,8 +258,9 @@ class PredicatorExtractor:
         # reset covered eojeol count
         self._num_of_covered_eojeols = 0
 
-        predicators = self._extract_predicator(
-            candidates, min_predicator_frequency)
+        with self.instrument.stage('predicator_extraction'):
+            predicators = self._extract_predicator(
+                candidates, min_predicator_frequency)
 
         adjectives, verbs = self._separate_adjective_verb(predicators)
 
@@ -270,7 +290,8 @@ class PredicatorExtractor:
             nouns = self._nouns,
             min_num_of_features = min_num_of_features,
             verbose = self.verbose,
-            logpath = None
+            logpath = None,
+            instrument = self.instrument
         )
 
         extracted_eomis = eomi_extractor.extract(
@@ -358,8 +379,10 @@ class PredicatorExtractor:
         lemmas = {}
         eomi_to_word_count = defaultdict(lambda: [])
         num_eojeol = len(eojeol_counter)
+        count_eojeol = self.instrument.count
 
         for i, (eojeol, count) in enumerate(eojeol_counter.items()):
+            count_eojeol('eojeols')
             if self.verbose and i % 5000 == 4999:
                 message = 'lemmatizing {} / {} words'.format(i+1, num_eojeol)
                 self._print(message, replace=True, newline=False)
@@ -4,4 +4,8 @@ from ._tokenizer import MaxLRScoreTokenizer
 from ._tokenizer import RegexTokenizer
 from ._normalizer import normalize
 from ._noun_tokenizer import NounLMatchTokenizer
-from ._noun_tokenizer import NounMatchTokenizer
\ No newline at end of file
+from ._noun_tokenizer import NounMatchTokenizer
+from ._trie import ScoreTrie
+from ._cache import EojeolCache
+from ._batch import tokenize_batch
+from ._batch import tokenize_corpus
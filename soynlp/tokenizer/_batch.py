@@ -0,0 +1,136 @@
+from collections import deque
+from itertools import islice
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+import os
+
+
+_worker_tokenizer = None
+_worker_kwargs = None
+
+def _init_tokenizer_worker(tokenizer, kwargs):
+    # tokenizer with its dictionary is passed once when the worker process is created.
+    # With fork, it is shared with the parent process without pickling.
+    # With spawn (macOS, Windows), tokenizer and kwargs are pickled
+    global _worker_tokenizer, _worker_kwargs
+    _worker_tokenizer = tokenizer
+    _worker_kwargs = kwargs
+
+def _tokenize_in_worker(sents):
+    return [_worker_tokenizer.tokenize(sent, **_worker_kwargs) for sent in sents]
+
+def _iter_chunks(sents, chunksize):
+    if hasattr(sents, 'iter_batch'):
+        yield from sents.iter_batch(chunksize)
+        return None
+    sents = iter(sents)
+    while True:
+        chunk = list(islice(sents, chunksize))
+        if not chunk:
+            break
+        yield chunk
+
+def tokenize_batch(tokenizer, sents, n_jobs=1, chunksize=1000, **kwargs):
+    """It yields tokenizer.tokenize(sent, **kwargs) of each sentence in order.
+
+    :param tokenizer: tokenizer of soynlp.tokenizer
+        Any object which has tokenize(sentence) method
+    :param sents: iterable of str
+        For example, list of str or DoublespaceLineCorpus
+    :param n_jobs: int
+        The number of worker processes. If n_jobs = -1, it uses all cores
+    :param chunksize: int
+        The number of sentences sent to a worker at once.
+        At most 2 * n_jobs chunks are read ahead of the yielded sentences
+    :param kwargs: arguments of tokenizer.tokenize. For example, flatten=False
+        With spawn start method, tokenizer and kwargs should be picklable
+
+    Usage
+    -----
+        >>> from soynlp.tokenizer import tokenize_batch
+        >>> tokenizer = LTokenizer(scores, cache_size=100000)
+        >>> for tokens in tokenize_batch(tokenizer, corpus, n_jobs=4):
+        >>>     ...
+    """
+
+    if n_jobs == -1:
+        n_jobs = cpu_count()
+
+    if n_jobs <= 1:
+        for sent in sents:
+            yield tokenizer.tokenize(sent, **kwargs)
+        return None
+
+    # Pool.imap reads all input at once. A bounded window of chunks keeps
+    # memory constant for large corpus, and results are yielded in order
+    max_pending = 2 * n_jobs
+    pending = deque()
+    pool = Pool(n_jobs, _init_tokenizer_worker, (tokenizer, kwargs))
+    try:
+        for chunk in _iter_chunks(sents, chunksize):
+            pending.append(pool.apply_async(_tokenize_in_worker, (chunk,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+        pool.close()
+    finally:
+        # workers are terminated if the generator is closed before the end
+        pool.terminate()
+        pool.join()
+
+def tokenize_corpus(tokenizer, corpus, output_path=None, n_jobs=1,
+    chunksize=1000, sep=' ', verbose=False, **kwargs):
+    """It tokenizes all sentences in corpus.
+
+    :param tokenizer: tokenizer of soynlp.tokenizer
+    :param corpus: iterable of str
+        For example, list of str or DoublespaceLineCorpus
+    :param output_path: str or None
+        If None, it returns list of tokenized sentences.
+        Else, it writes tokens of each sentence as a line and returns
+        the number of sentences. Tokens should be flattened str
+    :param n_jobs: int
+        The number of worker processes. If n_jobs = -1, it uses all cores
+    :param chunksize: int
+        The number of sentences sent to a worker at once
+    :param sep: str
+        Separator of tokens in output file
+    :param verbose: Boolean
+        If True, it shows the number of tokenized sentences
+    :param kwargs: arguments of tokenizer.tokenize
+
+    Usage
+    -----
+        >>> from soynlp.tokenizer import tokenize_corpus
+        >>> corpus = DoublespaceLineCorpus(corpus_path, iter_sent=True)
+        >>> tokenize_corpus(tokenizer, corpus, 'tokenized.txt', n_jobs=4)
+        $ 223357
+    """
+
+    tokenized = tokenize_batch(tokenizer, corpus, n_jobs, chunksize, **kwargs)
+
+    if output_path is None:
+        tokens_list = []
+        for i, tokens in enumerate(tokenized):
+            tokens_list.append(tokens)
+            if verbose and (i + 1) % chunksize == 0:
+                print('\rtokenizing ... {} sents'.format(i + 1), end='', flush=True)
+        if verbose:
+            print('\rtokenizing was done. {} sents'.format(len(tokens_list)), flush=True)
+        return tokens_list
+
+    dirname = os.path.dirname(output_path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    num_sents = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for tokens in tokenized:
+            f.write('{}\n'.format(sep.join(tokens)))
+            num_sents += 1
+            if verbose and num_sents % chunksize == 0:
+                print('\rtokenizing ... {} sents'.format(num_sents), end='', flush=True)
+    if verbose:
+        print('\rtokenizing was done. {} sents'.format(num_sents), flush=True)
+    return num_sents
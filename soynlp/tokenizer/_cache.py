@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+
+class EojeolCache:
+    """Bounded LRU cache of tokenization results keyed on eojeol.
+    Korean text repeats same eojeols, so tokenizers look up the cache
+    before segmenting an eojeol. Tokenizers call validate with version of
+    their ScoreTrie, so updated scores are never served from stale results.
+
+    :param max_size: int
+        Maximum number of cached eojeols. The least recently used one is removed
+
+    Usage
+    -----
+        >>> tokenizer = MaxScoreTokenizer(scores, cache_size=100000)
+        >>> tokenizer.tokenize('데이터는 데이터센터의 데이터')
+        >>> tokenizer.cache.hits, tokenizer.cache.misses
+        $ (1, 3)
+        >>> tokenizer.cache.hit_rate
+        $ 0.25
+    """
+
+    def __init__(self, max_size=100000):
+        if max_size <= 0:
+            raise ValueError('max_size should be positive integer')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.version = None
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def hit_rate(self):
+        n = self.hits + self.misses
+        return self.hits / n if n > 0 else 0.0
+
+    def lookup(self, key, func, *args):
+        """It returns cached result of key, or caches func(*args)"""
+        items = self._items
+        try:
+            value = items[key]
+        except KeyError:
+            self.misses += 1
+            value = func(*args)
+            items[key] = value
+            if len(items) > self.max_size:
+                items.popitem(last=False)
+            return value
+        self.hits += 1
+        items.move_to_end(key)
+        return value
+
+    def validate(self, version):
+        """It clears cached results if version of scores has changed"""
+        if version != self.version:
+            self._items.clear()
+            self.version = version
+
+    def clear(self):
+        """It removes cached results. Hit and miss counts are kept"""
+        self._items.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._items),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate
+        }
+
+
+def check_cache(cache_size):
+    """It returns EojeolCache if cache_size > 0, else None"""
+    if not cache_size:
+        return None
+    return EojeolCache(cache_size)
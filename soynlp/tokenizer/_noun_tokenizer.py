@@ -1,9 +1,20 @@
 from ._tokenizer import MaxScoreTokenizer
+from ._trie import ScoreTrie
 
 class NounLMatchTokenizer:
 
     def __init__(self, nouns):
-        self._nouns  = nouns
+        self.nouns = nouns
+
+    @property
+    def nouns(self):
+        """ScoreTrie of nouns. It can be updated as dict"""
+        return self._trie
+
+    @nouns.setter
+    def nouns(self, nouns):
+        """nouns is collection of str, dict or ScoreTrie. It is copied to ScoreTrie"""
+        self._trie = nouns if isinstance(nouns, ScoreTrie) else ScoreTrie(nouns)
 
     def __call__(self, sentence, compose_compound=True):
         return self.tokenize(sentence, compose_compound)
@@ -33,16 +44,9 @@ class NounLMatchTokenizer:
             e = sum((len(noun) for noun in nouns_))
             return nouns_, token[e:]
 
-        nouns = []
-        n = len(token)
-
         # string match for generating candidats
-        for b in range(n):
-            for e in range(b, n+1):
-                subword = token[b:e]
-                if subword in self._nouns:
-                    # (word, begin, length)
-                    nouns.append((subword, b, e - b))
+        # (word, begin, length)
+        nouns = [(token[b:e], b, e - b) for b, e, _ in self._trie.matches(token)]
 
         # sort. fisrt order: begin index, second order: length (desc)
         nouns = sorted(nouns, key=lambda x:(x[1], -x[2]))
@@ -65,8 +69,24 @@ class NounLMatchTokenizer:
 
 class NounMatchTokenizer:
 
-    def __init__(self, noun_scores):
-        self._tokenizer = MaxScoreTokenizer(scores=noun_scores)
+    def __init__(self, noun_scores, cache_size=0):
+        """
+        :param cache_size: int
+            If cache_size > 0, the noun matching of eojeols is cached in LRU EojeolCache
+        """
+        self._tokenizer = MaxScoreTokenizer(scores=noun_scores, cache_size=cache_size)
+
+    @property
+    def cache(self):
+        return self._tokenizer.cache
+
+    @property
+    def noun_scores(self):
+        return self._tokenizer.scores
+
+    @noun_scores.setter
+    def noun_scores(self, noun_scores):
+        self._tokenizer.scores = noun_scores
 
     def __call__(self, sentence, flatten=True, compose_compound=True):
         return self.tokenize(sentence, flatten, compose_compound)
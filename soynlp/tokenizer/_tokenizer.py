@@ -3,9 +3,19 @@ import sys
 if sys.version_info <= (2,7):
     reload(sys)
     sys.setdefaultencoding('utf-8')
+from collections.abc import Mapping
 from pprint import pprint
 import re
 import numpy as np
+from ._cache import check_cache
+from ._trie import ScoreTrie
+
+
+def _as_score_trie(scores):
+    """It copies scores dict to ScoreTrie. A given ScoreTrie is used as it is"""
+    if isinstance(scores, ScoreTrie):
+        return scores
+    return ScoreTrie(scores if scores else {})
 
 
 class RegexTokenizer:
@@ -86,29 +96,41 @@ class RegexTokenizer:
 
 class LTokenizer:
     
-    def __init__(self, scores=None, default_score=0.0):
-        self._scores = scores if scores else {}
+    def __init__(self, scores=None, default_score=0.0, cache_size=0):
+        """
+        :param scores: dict or ScoreTrie
+            dict is copied to ScoreTrie, so changing the dict after construction
+            does not change tokenization. Update tokenizer.scores instead
+        :param cache_size: int
+            If cache_size > 0, L-R split of eojeols is cached in LRU EojeolCache
+        """
+        self.cache = check_cache(cache_size)
+        self.scores = scores
         self._ds = default_score
 
+    @property
+    def scores(self):
+        """ScoreTrie of L scores. It can be updated as dict"""
+        return self._trie
+
+    @scores.setter
+    def scores(self, scores):
+        self._trie = _as_score_trie(scores)
+        if self.cache is not None:
+            self.cache.clear()
+
     def __call__(self, sentence, tolerance=0.0, flatten=True, remove_r=False):
         return self.tokenize(sentence, tolerance, flatten, remove_r)
 
     def tokenize(self, sentence, tolerance=0.0, flatten=True, remove_r=False):
-        
-        def token_to_lr(token, tolerance=0.0):
-            length = len(token)
-            if length <= 2: return (token, '')
-            candidates = [(token[:e], token[e:]) for e in range(2, length + 1)]
-            candidates = [(self._scores.get(t[0], self._ds), t[0], t[1]) for t in candidates]
-            if tolerance > 0:
-                max_score = max([c[0] for c in candidates])
-                candidates = [c for c in candidates if (max_score - c[0]) <= tolerance]
-                best = sorted(candidates, key=lambda x:len(x[1]), reverse=True)[0]
-            else:
-                best = sorted(candidates, key=lambda x:(x[0], len(x[1])), reverse=True)[0]
-            return (best[1], best[2])
 
-        tokens = [token_to_lr(token, tolerance) for token in sentence.split()]
+        if self.cache is None:
+            tokens = [self._token_to_lr(token, tolerance) for token in sentence.split()]
+        else:
+            self.cache.validate(self._trie.version)
+            lookup, token_to_lr = self.cache.lookup, self._token_to_lr
+            tokens = [lookup((token, tolerance), token_to_lr, token, tolerance)
+                      for token in sentence.split()]
         
         if remove_r:
             tokens = [token[0] for token in tokens]
@@ -117,20 +139,137 @@ class LTokenizer:
             tokens = [subtoken for token in tokens for subtoken in token if subtoken]
         
         return tokens
+
+    def _token_to_lr(self, token, tolerance=0.0):
+        length = len(token)
+        if length <= 2: return (token, '')
+        e = self._select_l(self._l_candidates(token, length), tolerance)
+        return (token[:e], token[e:])
+
+    def _l_candidates(self, token, length):
+        """It returns (end of L, score) in order of end. L is at least two characters.
+        Prefixes not in scores have default score, so only the longest of them is candidate"""
+        candidates = [(e, score) for e, score in self._trie.prefixes(token) if e >= 2]
+        i, e_default = len(candidates), length
+        while i > 0 and candidates[i - 1][0] == e_default:
+            i -= 1
+            e_default -= 1
+        if e_default >= 2:
+            candidates.insert(i, (e_default, self._ds))
+        return candidates
+
+    def _select_l(self, candidates, tolerance):
+        """It selects the longest L of max score, or the longest L of which
+        score is at most tolerance lower than max score"""
+        if tolerance > 0:
+            max_score = max([score for _, score in candidates])
+            for e, score in reversed(candidates):
+                if (max_score - score) <= tolerance:
+                    return e
+        best_e, best_score = candidates[0]
+        for e, score in candidates:
+            if score >= best_score:
+                best_e, best_score = e, score
+        return best_e
+
+    def token_to_lr_batch(self, tokens, tolerance=0.0):
+        """It returns list of (L, R) of tokens. Each distinct token is split once,
+        and the best L of all tokens are selected with NumPy at once.
+
+        :param tokens: list of str
+            Eojeols. For example, words of sentences in corpus
+        :param tolerance: float
+            Same with tokenize
+
+        Usage
+        -----
+            >>> ltokenizer.token_to_lr_batch(['데이터는', '데이터센터의', '데이데이'])
+            $ [('데이터', '는'), ('데이터', '센터의'), ('데이', '데이')]
+        """
+
+        index = {}
+        for token in tokens:
+            if len(token) > 2 and not (token in index):
+                index[token] = len(index)
+        if not index:
+            return [(token, '') for token in tokens]
+
+        idx, ends, scores = [], [], []
+        for token, i in index.items():
+            for e, score in self._l_candidates(token, len(token)):
+                idx.append(i)
+                ends.append(e)
+                scores.append(score)
+        idx = np.asarray(idx, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float64)
+
+        if tolerance > 0:
+            max_scores = np.full(len(index), -np.inf)
+            np.maximum.at(max_scores, idx, scores)
+            selectable = np.flatnonzero((max_scores[idx] - scores) <= tolerance)
+            order = selectable[np.lexsort((ends[selectable], idx[selectable]))]
+        else:
+            order = np.lexsort((ends, scores, idx))
+
+        # the last candidate of each token is the best
+        sorted_idx = idx[order]
+        last = np.flatnonzero(np.append(sorted_idx[1:] != sorted_idx[:-1], True))
+        best_ends = np.zeros(len(index), dtype=np.int64)
+        best_ends[sorted_idx[last]] = ends[order[last]]
+        best_ends = best_ends.tolist()
+
+        lr = {token:(token[:best_ends[i]], token[best_ends[i]:]) for token, i in index.items()}
+        return [lr.get(token, (token, '')) for token in tokens]
     
 
 class MaxScoreTokenizer:
-    
-    def __init__(self, scores=None, max_length=10, default_score=0.0):
-        self._scores = scores if scores else {}
+    """Tokenizer which selects the subwords of each eojeol greedily in order of
+    (score, length, begin index) without overlapping. Substrings not in scores
+    have default_score, and the uncovered characters become subtokens.
+
+    Usage
+    -----
+        >>> tokenizer = MaxScoreTokenizer({'데이터':0.4, '데이':0.35, '데이터센터':0.38})
+        >>> tokenizer.tokenize('데이터센터의 데이터')
+        $ ['데이터', '센터의', '데이터']
+    """
+
+    def __init__(self, scores=None, max_length=10, default_score=0.0, cache_size=0):
+        """
+        :param scores: dict or ScoreTrie
+            dict is copied to ScoreTrie, so changing the dict after construction
+            does not change tokenization. Update tokenizer.scores instead
+        :param cache_size: int
+            If cache_size > 0, subtokens of eojeols are cached in LRU EojeolCache
+        """
+        self.cache = check_cache(cache_size)
+        self.scores = scores
         self._max_length = max_length
         self._ds = default_score
 
+    @property
+    def scores(self):
+        """ScoreTrie of subword scores. It can be updated as dict"""
+        return self._trie
+
+    @scores.setter
+    def scores(self, scores):
+        self._trie = _as_score_trie(scores)
+        if self.cache is not None:
+            self.cache.clear()
+
     def __call__(self, sentence, flatten=True):
         return self.tokenize(sentence, flatten)
 
     def tokenize(self, sentence, flatten=True):
-        tokens = [self._recursive_tokenize(token) for token in sentence.split()]
+        if self.cache is None:
+            tokens = [self._recursive_tokenize(token) for token in sentence.split()]
+        else:
+            self.cache.validate(self._trie.version)
+            # copy cached lists. unflattened tokens are returned to user
+            lookup, tokenize = self.cache.lookup, self._recursive_tokenize
+            tokens = [list(lookup(token, tokenize, token)) for token in sentence.split()]
         if flatten:
             tokens = [subtoken[0] for token in tokens for subtoken in token]
         return tokens
@@ -144,12 +283,10 @@ class MaxScoreTokenizer:
         if range_l == 0:
             range_l = min(self._max_length, length)
 
-        scores = self._initialize(token, range_l, length)
+        result = self._find(token, range_l, length)
         if debug:
-            pprint(scores)
-        
-        result = self._find(scores)
-        
+            pprint(result)
+
         adds = self._add_inter_subtokens(token, result)
         
         if result[-1][2] != length:
@@ -160,45 +297,66 @@ class MaxScoreTokenizer:
             
         return sorted(result + adds, key=lambda x:x[1])
 
-    def _initialize(self, token, range_l, length):
-        scores = []
-        for b in range(0, length - 1):
-            for r in range(2, range_l + 1):
-                e = b + r
-                
-                if e > length: 
-                    continue
-                
-                subtoken = token[b:e]
-                score = self._scores.get(subtoken, self._ds)
-                scores.append((subtoken, b, e, score, r))
-                
-        return sorted(scores, key=lambda x:(-x[3], -x[4], x[1]))
-
-    def _find(self, scores):
-        result = []
-        num_iter = 0
-        
-        while scores:
-            word, b, e, score, r = scores.pop(0)
-            result.append((word, b, e, score, r))
-
-            if not scores:
+    def _find(self, token, range_l, length):
+        """It selects subwords of length 2 ~ range_l in order of
+        (-score, -length, begin) without overlapping.
+
+        Every substring not in scores has default score, so the substrings
+        are selected in three passes without sorting all of them.
+        Substrings of which score is higher than default score are sorted and
+        selected first. Then the substrings with default score are selected
+        in order of (-length, begin), and the lower ones at last.
+        Occupied characters are the bits of an integer.
+        """
+
+        ds = self._ds
+        scored = {}
+        higher, lower = [], []
+        for b, e, score in self._trie.matches(token, range_l):
+            if e - b < 2:
+                continue
+            scored[(b, e)] = score
+            if score > ds:
+                higher.append((-score, b - e, b, e))
+            elif score < ds:
+                lower.append((-score, b - e, b, e))
+
+        occupied = 0
+        selected = []
+
+        higher.sort()
+        for score, _, b, e in higher:
+            mask = ((1 << (e - b)) - 1) << b
+            if not (occupied & mask):
+                occupied |= mask
+                selected.append((b, e, -score))
+
+        full = (1 << length) - 1
+        for r in range(range_l, 1, -1):
+            # stop when no two adjacent characters are free
+            free = full & ~occupied
+            if not (free & (free >> 1)):
                 break
+            mask = (1 << r) - 1
+            for b in range(length - r + 1):
+                if occupied & (mask << b):
+                    continue
+                score = scored.get((b, b + r), ds)
+                if score != ds:
+                    continue
+                occupied |= mask << b
+                selected.append((b, b + r, score))
 
-            removals = []
-            for i, (_1, b_, e_, _2, _3) in enumerate(scores):
-                if (b_ < e and b < e_) or (b_ < e and e_ > b):
-                    removals.append(i)
-
-            for i in reversed(removals):
-                del scores[i]
+        lower.sort()
+        for score, _, b, e in lower:
+            mask = ((1 << (e - b)) - 1) << b
+            if not (occupied & mask):
+                occupied |= mask
+                selected.append((b, e, -score))
 
-            num_iter += 1
-            if num_iter > 100: break
+        selected.sort()
+        return [(token[b:e], b, e, score, e - b) for b, e, score in selected]
 
-        return sorted(result, key=lambda x:x[1])
-    
     def _add_inter_subtokens(self, token, result):
         adds = []        
         for i, base in enumerate(result[:-1]):
@@ -215,13 +373,13 @@ class MaxScoreTokenizer:
     def _add_first_subtoken(self, token, result):
         e = result[0][1]
         subtoken = token[0:e]
-        score = self._scores.get(subtoken, self._ds)
+        score = self._trie.get(subtoken, self._ds)
         return [(subtoken, 0, e, score, e)]
     
     def _add_last_subtoken(self, token, result):
         b = result[-1][2]
         subtoken = token[b:]
-        score = self._scores.get(subtoken, self._ds)
+        score = self._trie.get(subtoken, self._ds)
         return [(subtoken, b, len(token), score, len(subtoken))]
 
 class MaxLRScoreTokenizer:
@@ -229,9 +387,13 @@ class MaxLRScoreTokenizer:
                  preference_l=None, preference_r=None,
                  lrgraph=None, tokenizer_builder=None,
                  max_lscore_difference=0.3, max_lscore_diffratio=0.5, # Expansion L
-                 ensurable_score_l=0.5, ensurable_score_lr_diff=0.3   # R overlap L
+                 ensurable_score_l=0.5, ensurable_score_lr_diff=0.3,  # R overlap L
+                 cache_size=0
                 ):
 
+        # tokenized eojeols without debug information
+        self.cache = check_cache(cache_size)
+
         # Normalize L-R graph to prob graph
         def norm(rdict):
             sum_ = sum(rdict.values())
@@ -247,10 +409,10 @@ class MaxLRScoreTokenizer:
         if not Dl: Dl = {}
         if not Dr: Dr = {}
 
-        if not type(Dl) == dict:
+        if not isinstance(Dl, Mapping):
             Dl = {l:1.0 for l in Dl}
         self.Dl.update(Dl)
-        if not type(Dr) == dict:
+        if not isinstance(Dr, Mapping):
             Dr = {r:1.0 for r in Dr}
         self.Dr.update(Dr)
 
@@ -265,8 +427,6 @@ class MaxLRScoreTokenizer:
             if not (r in self.Dr):
                 self.Dr[r] = 1.0
 
-        self.lmax = max((len(w) for w in self.Dl)) if self.Dl else 0
-        self.rmax = max((len(w) for w in self.Dr)) if self.Dr else 0
         self.base_tokenizer = MaxScoreTokenizer(scores=self.Dr)
         
         self.max_lscore_difference = max_lscore_difference
@@ -274,11 +434,48 @@ class MaxLRScoreTokenizer:
         self.ensurable_score_l = ensurable_score_l
         self.ensurable_score_lr_diff = ensurable_score_lr_diff
 
+    @property
+    def Dl(self):
+        """ScoreTrie of L scores. It can be updated as dict"""
+        return self._trie_l
+
+    @Dl.setter
+    def Dl(self, Dl):
+        self._trie_l = _as_score_trie(Dl)
+        if self.cache is not None:
+            self.cache.clear()
+
+    @property
+    def Dr(self):
+        """ScoreTrie of R scores, shared with base_tokenizer"""
+        return self._trie_r
+
+    @Dr.setter
+    def Dr(self, Dr):
+        self._trie_r = _as_score_trie(Dr)
+        if hasattr(self, 'base_tokenizer'):
+            self.base_tokenizer.scores = self._trie_r
+        if self.cache is not None:
+            self.cache.clear()
+
+    @property
+    def lmax(self):
+        return self._trie_l.max_length
+
+    @property
+    def rmax(self):
+        return self._trie_r.max_length
+
     def __call__(self, sent, debug=True, flatten=True):
         return self.tokenize(sent, debug, flatten)
 
     def tokenize(self, sent, debug=False, flatten=True):
-        sent_ = [self._tokenize(t, debug) for t in sent.split() if t]
+        if self.cache is None or debug:
+            sent_ = [self._tokenize(t, debug) for t in sent.split() if t]
+        else:
+            self.cache.validate((self._trie_l.version, self._trie_r.version))
+            lookup, tokenize = self.cache.lookup, self._tokenize
+            sent_ = [list(lookup(t, tokenize, t)) for t in sent.split() if t]
         if flatten:
             sent_ = [word for words in sent_ for word in words]
         return sent_
@@ -305,30 +502,26 @@ class MaxLRScoreTokenizer:
         return candidates
 
     def _initialize_L(self, t):
-        n = len(t)
         candidates = []
-        for b in range(n):
-            for e in range(b+1, min(n, b+self.lmax)+1):
-                l = t[b:e]
-                if not (l in self.Dl):
-                    continue
-                candidates.append([l,     # 0
-                                   b,     # 1                  
-                                   e,     # 2
-                                   e-b    # 3
-                                  ])
+        for b, e, _ in self._trie_l.matches(t, self.lmax):
+            candidates.append([t[b:e],  # 0
+                               b,       # 1
+                               e,       # 2
+                               e-b      # 3
+                              ])
         return candidates
 
     def _initialize_LR(self, t, candidates):
-        n = len(t)
         expanded = []
+        r_ends = {}
         for (l, b, e, len_l) in candidates:
-            for len_r in range(min(self.rmax, n-e)+1):
+            if e not in r_ends:
+                r_ends[e] = [e] + [end for end, _ in self._trie_r.prefixes(t, e, self.rmax)]
+            for end in r_ends[e]:
+                len_r = end - e
                 if len_l == 1 and len_r == 0:
                     continue
-                r = t[e:e+len_r]
-                if r and not (r in self.Dr):
-                    continue
+                r = t[e:end]
                 expanded.append([l,
                                  r,
                                  b,
@@ -0,0 +1,249 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from collections.abc import MutableMapping
+import os
+
+import numpy as np
+
+
+class ScoreTrie(MutableMapping):
+    """Trie of scored words. It is a {word: score} mapping, and finds
+    all words starting at each position of a token in one walk without
+    slicing the substrings.
+
+    Nodes are integer ids in breadth-first order, so the children of a node
+    are consecutive nodes sorted by character. Parent node and code point of
+    character of each node are int32 arrays, and the children of node are
+    nodes from begin[node] to begin[node+1]. A child is found by binary search
+    of the character. Score of a node is None if no word ends at the node.
+    Nodes inserted after building are appended to the arrays and their
+    (parent node, character) are stored in a dict.
+
+    A trie can be shared by tokenizers. Each tokenizer copies scores dict
+    to its own ScoreTrie, or uses the given ScoreTrie as it is.
+    Setting or deleting a word increases version, and tokenizers clear
+    their EojeolCache when the version has changed. Deleted words keep
+    their nodes, so max_length is an upper bound of word length.
+
+    Usage
+    -----
+        >>> trie = ScoreTrie({'데이터':0.4, '데이':0.35, '데이터센터':0.38})
+        >>> trie.matches('데이터센터에서', max_length=10)
+        $ [(0, 2, 0.35), (0, 3, 0.4), (0, 5, 0.38)]
+        >>> trie.prefixes('데이터센터에서', begin=0)
+        $ [(2, 0.35), (3, 0.4), (5, 0.38)]
+        >>> tokenizer = MaxScoreTokenizer(scores=trie)
+        >>> trie['센터'] = 0.3  # tokenizer uses the updated score
+        >>> trie.save('scores.npz')
+    """
+
+    def __init__(self, scores=None):
+        """
+        :param scores: dict or iterable of str
+            {word: score}. If it is not dict, score of every word is 1.0
+        """
+        if not scores:
+            scores = {}
+        elif not isinstance(scores, Mapping):
+            scores = {word:1.0 for word in scores}
+        self._build(scores)
+        self.version = 0
+
+    def _build(self, scores):
+        """It builds the nodes of words in breadth-first order.
+        The words of node are words[lo:hi], which have the prefix of length depth"""
+        words = sorted(scores)
+        parents, chars, begin = array('i', [-1]), array('i', [0]), array('i')
+        self._scores = [None]
+        ranges = [(0, len(words), 0)]
+        for node, (lo, hi, depth) in enumerate(ranges):
+            begin.append(len(ranges))
+            if lo < hi and len(words[lo]) == depth:
+                self._scores[node] = scores[words[lo]]
+                lo += 1
+            while lo < hi:
+                char = words[lo][depth]
+                end = lo + 1
+                while end < hi and words[end][depth] == char:
+                    end += 1
+                parents.append(node)
+                chars.append(ord(char))
+                self._scores.append(None)
+                ranges.append((lo, end, depth + 1))
+                lo = end
+        begin.append(len(ranges))
+        self._parents = parents
+        self._chars = chars
+        self._begin = begin
+        self._inserted = {}
+        self._num_words = len(words)
+        self.max_length = max((len(word) for word in words), default=0)
+
+    def _child(self, node, char):
+        begin = self._begin
+        if node < len(begin) - 1:
+            code = ord(char)
+            b, e = begin[node], begin[node+1]
+            child = bisect_left(self._chars, code, b, e)
+            if child < e and self._chars[child] == code:
+                return child
+        if self._inserted:
+            return self._inserted.get((node, char))
+        return None
+
+    def _insert(self, word, score):
+        node = 0
+        for char in word:
+            child = self._child(node, char)
+            if child is None:
+                child = len(self._scores)
+                self._inserted[(node, char)] = child
+                self._parents.append(node)
+                self._chars.append(ord(char))
+                self._scores.append(None)
+            node = child
+        if self._scores[node] is None:
+            self._num_words += 1
+        self._scores[node] = score
+        self.max_length = max(self.max_length, len(word))
+
+    def _find(self, word):
+        child = self._child
+        node = 0
+        for char in word:
+            node = child(node, char)
+            if node is None:
+                return -1
+        return node
+
+    def _word(self, node):
+        chars = []
+        while node > 0:
+            chars.append(chr(self._chars[node]))
+            node = self._parents[node]
+        return ''.join(reversed(chars))
+
+    def __getitem__(self, word):
+        node = self._find(word)
+        if node < 0 or self._scores[node] is None:
+            raise KeyError(word)
+        return self._scores[node]
+
+    def get(self, word, default=None):
+        node = self._find(word)
+        if node < 0:
+            return default
+        score = self._scores[node]
+        return default if score is None else score
+
+    def __setitem__(self, word, score):
+        if score is None:
+            raise ValueError('score should not be None')
+        self._insert(word, score)
+        self.version += 1
+
+    def __delitem__(self, word):
+        node = self._find(word)
+        if node < 0 or self._scores[node] is None:
+            raise KeyError(word)
+        self._scores[node] = None
+        self._num_words -= 1
+        self.version += 1
+
+    def __contains__(self, word):
+        node = self._find(word)
+        return node >= 0 and self._scores[node] is not None
+
+    def __iter__(self):
+        for node, score in enumerate(self._scores):
+            if score is not None:
+                yield self._word(node)
+
+    def __len__(self):
+        return self._num_words
+
+    def prefixes(self, token, begin=0, max_length=0):
+        """It returns (end, score) of the words token[begin:end] in order of end.
+        If max_length > 0, the words are at most max_length long"""
+        child, scores = self._child, self._scores
+        if max_length > 0:
+            token = token[begin:begin + max_length]
+        elif begin > 0:
+            token = token[begin:]
+        prefixes = []
+        node = 0
+        end = begin
+        for char in token:
+            node = child(node, char)
+            if node is None:
+                break
+            end += 1
+            if scores[node] is not None:
+                prefixes.append((end, scores[node]))
+        return prefixes
+
+    def matches(self, token, max_length=0):
+        """It returns (begin, end, score) of all words in token in order of (begin, end).
+        If max_length > 0, the words are at most max_length long"""
+        child, scores = self._child, self._scores
+        if max_length <= 0:
+            max_length = len(token)
+        matches = []
+        for b in range(len(token)):
+            node = 0
+            e = b
+            for char in token[b:b + max_length]:
+                node = child(node, char)
+                if node is None:
+                    break
+                e += 1
+                if scores[node] is not None:
+                    matches.append((b, e, scores[node]))
+        return matches
+
+    def _compile(self):
+        """It returns the parent node and the code point of character of each node"""
+        return (np.frombuffer(self._parents, dtype=np.int32).copy(),
+            np.frombuffer(self._chars, dtype=np.int32).copy())
+
+    def _set_compiled(self, parents, chars, scores):
+        """It rebuilds the trie from the arrays of any order of nodes"""
+        parents, chars = parents.tolist(), chars.tolist()
+        def word(node):
+            chars_ = []
+            while node > 0:
+                chars_.append(chr(chars[node]))
+                node = parents[node]
+            return ''.join(reversed(chars_))
+        self._build({word(node):score for node, score in enumerate(scores) if score is not None})
+
+    def __getstate__(self):
+        parents, chars = self._compile()
+        return {'parents': parents, 'chars': chars, 'scores': self._scores}
+
+    def __setstate__(self, state):
+        self._set_compiled(state['parents'], state['chars'], state['scores'])
+        self.version = 0
+
+    def save(self, path):
+        """It saves the compiled arrays as NumPy npz format.
+        Scores are stored as float64"""
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        parents, chars = self._compile()
+        has_score = np.asarray([score is not None for score in self._scores], dtype=bool)
+        scores = np.asarray([0.0 if score is None else score for score in self._scores],
+            dtype=np.float64)
+        with open(path, 'wb') as f:
+            np.savez(f, parents=parents, chars=chars, scores=scores, has_score=has_score)
+
+    def load(self, path):
+        with np.load(path) as data:
+            scores = [score if has_score else None for score, has_score
+                in zip(data['scores'].tolist(), data['has_score'].tolist())]
+            self._set_compiled(data['parents'], data['chars'], scores)
+        # tokenizers sharing this trie clear their cache
+        self.version += 1
+        return self
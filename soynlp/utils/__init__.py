@@ -7,13 +7,27 @@ from .utils import check_corpus
 from .utils import DoublespaceLineCorpus
 from .utils import EojeolCounter
 from .utils import LRGraph
+from .compact import CompactCounter
+from .compact import CompactLRGraph
+from .sketch import CountMinSketch
+from .sketch import HeavyHitterCounter
 from .math import svd
+from .instrument import Instrument
+from .instrument import Recorder
+from .instrument import JsonLogHandler
+from .instrument import check_instrument
 
 __all__ = [
     # utils
-    'get_available_memory', 'get_process_memory', 'check_dirs'
+    'get_available_memory', 'get_process_memory', 'check_dirs',
     'sort_by_alphabet', 'most_similar', 'DoublespaceLineCorpus',
     'EojeolCounter', 'LRGraph',
+    # compact data structure
+    'CompactCounter', 'CompactLRGraph',
+    # approximate counting
+    'CountMinSketch', 'HeavyHitterCounter',
     # math
-    'svd'
+    'svd',
+    # instrumentation
+    'Instrument', 'Recorder', 'JsonLogHandler', 'check_instrument'
 ]
\ No newline at end of file
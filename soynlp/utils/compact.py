@@ -0,0 +1,530 @@
+import mmap
+import os
+import zipfile
+from collections.abc import Mapping
+import numpy as np
+from .utils import EojeolCounter
+from .utils import LRGraph
+
+
+class CompactCounter:
+    """Read-only dict-like {str: int} counter with compact memory layout.
+
+    All keys are sorted and concatenated into one utf-8 encoded byte string.
+    Each key is interned as an integer id (its position in the sorted keys),
+    and the counts are stored in a NumPy array indexed by the id.
+    Lookup is a binary search over the sorted keys, so it costs O(log n)
+    but a key takes only (utf-8 bytes + 8 byte offset + count bytes) memory.
+    For many keys, get_counts and indices search all of them at once
+    with numpy.searchsorted.
+
+    Usage
+    -----
+        >>> counter = CompactCounter({'아이': 3, '아이오': 2})
+        >>> counter['아이']
+        $ 3
+        >>> counter.get('어른', 0)
+        $ 0
+    """
+
+    def __init__(self, counter=None, dtype=None):
+        """
+        :param counter: dict or CompactCounter
+            {str: int} counter
+        :param dtype: numpy.dtype
+            Type of count array. If None, it uses numpy.int32 when all counts
+            are smaller than 2^31, else numpy.int64
+        """
+        if counter is None:
+            counter = {}
+
+        # utf-8 encoding keeps the order of unicode code points
+        items = sorted((key.encode('utf-8'), count) for key, count in counter.items())
+        keys = [key for key, _ in items]
+        counts = [count for _, count in items]
+        del items
+
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        if keys:
+            np.cumsum([len(key) for key in keys], out=offsets[1:])
+
+        if dtype is None:
+            dtype = np.int32 if (not counts or max(counts) < 2 ** 31) else np.int64
+
+        self._set_arrays(b''.join(keys), offsets, np.asarray(counts, dtype=dtype))
+
+    def _set_arrays(self, buffer, offsets, counts):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._counts = counts
+        # memoryview indexing returns python int, which is faster than numpy scalar
+        self._offsets_view = memoryview(offsets)
+        self._n = len(counts)
+        self._keys = None
+
+    def __getstate__(self):
+        return {'buffer': self._buffer[:],
+                'offsets': np.asarray(self._offsets),
+                'counts': np.asarray(self._counts)}
+
+    def __setstate__(self, state):
+        self._set_arrays(state['buffer'], state['offsets'], state['counts'])
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, key):
+        return self.index(key) >= 0
+
+    def __getitem__(self, key):
+        idx = self.index(key)
+        if idx < 0:
+            raise KeyError(key)
+        return int(self._counts[idx])
+
+    def __iter__(self):
+        for idx in range(self._n):
+            yield self.key(idx)
+
+    def get(self, key, default=None):
+        idx = self.index(key)
+        return default if idx < 0 else int(self._counts[idx])
+
+    def index(self, key):
+        """It returns interned id of key. If key does not exist, it returns -1"""
+        key = key.encode('utf-8')
+        buffer, offsets = self._buffer, self._offsets_view
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if buffer[offsets[mid]:offsets[mid+1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and buffer[offsets[lo]:offsets[lo+1]] == key:
+            return lo
+        return -1
+
+    def _key_array(self):
+        # fixed width byte strings of sorted keys for numpy.searchsorted.
+        # It is built at the first bulk lookup, and not pickled or saved
+        if self._keys is None:
+            offsets = np.asarray(self._offsets)
+            lengths = np.diff(offsets)
+            width = max(1, int(lengths.max(initial=0)))
+            buffer = np.frombuffer(self._buffer, dtype=np.uint8)
+            positions = np.arange(width)
+            mask = positions < lengths[:, None]
+            keys = np.zeros((self._n, width), dtype=np.uint8)
+            keys[mask] = buffer[(offsets[:-1, None] + positions)[mask]]
+            self._keys = keys.view('S{}'.format(width)).ravel()
+        return self._keys
+
+    def indices(self, keys):
+        """It returns numpy.ndarray of interned ids of keys.
+        Ids of the keys which do not exist are -1.
+        It is a vectorized version of index with numpy.searchsorted"""
+        if len(keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        array = self._key_array()
+        queries = np.asarray([key.encode('utf-8') for key in keys])
+        idxs = np.searchsorted(array, queries)
+        found = idxs < self._n
+        found[found] = array[idxs[found]] == queries[found]
+        return np.where(found, idxs, -1)
+
+    def get_counts(self, keys, default=0):
+        """It returns numpy.ndarray of counts of keys.
+        The count of the keys which do not exist is default
+
+        Usage
+        -----
+            >>> counter = CompactCounter({'아이': 3, '아이오': 2})
+            >>> counter.get_counts(['아이오', '어른', '아이'])
+            $ array([2, 0, 3])
+        """
+        idxs = self.indices(keys)
+        counts = np.full(len(idxs), default, dtype=np.int64)
+        found = idxs >= 0
+        counts[found] = self._counts[idxs[found]]
+        return counts
+
+    def key(self, idx):
+        """It returns str key of interned id"""
+        offsets = self._offsets_view
+        return self._buffer[offsets[idx]:offsets[idx+1]].decode('utf-8')
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return iter(self._counts.tolist())
+
+    def items(self):
+        return zip(self, self._counts.tolist())
+
+    @property
+    def counts(self):
+        """numpy.ndarray of counts, ordered by interned id"""
+        return self._counts
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def save(self, path):
+        """It writes three files; {path}.keys is utf-8 encoded string table,
+        {path}.offsets.npy and {path}.counts.npy are NumPy arrays"""
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        with open(path + '.keys', 'wb') as f:
+            f.write(self._buffer)
+        np.save(path + '.offsets.npy', np.asarray(self._offsets))
+        np.save(path + '.counts.npy', np.asarray(self._counts))
+
+    def load(self, path, use_mmap=True):
+        """It loads the files written by save(path).
+        If use_mmap is True, the files are memory-mapped as read-only.
+        Loading is near-instant, and processes that load the same files
+        share one physical copy through the page cache"""
+        if not use_mmap:
+            with open(path + '.keys', 'rb') as f:
+                buffer = f.read()
+            offsets = np.load(path + '.offsets.npy')
+            counts = np.load(path + '.counts.npy')
+        else:
+            buffer = b''
+            if os.path.getsize(path + '.keys') > 0:
+                with open(path + '.keys', 'rb') as f:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = np.load(path + '.offsets.npy', mmap_mode='r')
+            counts = np.load(path + '.counts.npy', mmap_mode='r')
+        self._set_arrays(buffer, offsets, counts)
+
+
+def _string_ranks(strings):
+    """It returns the rank of each string in sorted order"""
+    ranks = np.empty(len(strings), dtype=np.int64)
+    ranks[sorted(range(len(strings)), key=strings.__getitem__)] = np.arange(len(strings))
+    return ranks
+
+
+class _CompactLRView(Mapping):
+    """Read-only {str: {str: int}} view of CompactLRGraph.
+    It supports the access patterns of LRGraph._lr, _rl and _lr_origin"""
+
+    def __init__(self, graph, origin=False, reverse=False):
+        self._graph = graph
+        self._origin = origin
+        self._reverse = reverse
+
+    def _counts(self):
+        graph = self._graph
+        if not self._origin:
+            return graph._counts
+        if graph._counts_origin is None:
+            return np.zeros(0, dtype=graph._counts.dtype)
+        return graph._counts_origin
+
+    def _row(self, key):
+        graph = self._graph
+        counts = self._counts()
+        if len(counts) == 0:
+            return None
+        if self._reverse:
+            idx = graph._r_to_idx.get(key, -1) if key else -1
+            if idx < 0:
+                return None
+            edges = graph._rl_edges[graph._r_indptr[idx]:graph._r_indptr[idx+1]]
+            ids, strings = graph._edge_to_l(edges), graph._l_list
+        else:
+            idx = graph._l_to_idx.get(key, -1)
+            if idx < 0:
+                return None
+            edges = slice(graph._l_indptr[idx], graph._l_indptr[idx+1])
+            ids, strings = graph._r_ids[edges], graph._r_list
+        counts = counts[edges]
+        return {strings[i]:c for i, c in zip(ids.tolist(), counts.tolist()) if c > 0}
+
+    def __getitem__(self, key):
+        row = self._row(key)
+        if not row:
+            raise KeyError(key)
+        return row
+
+    def __contains__(self, key):
+        return bool(self._row(key))
+
+    def _keys(self):
+        graph = self._graph
+        counts = self._counts()
+        if len(counts) == 0:
+            return []
+        positive = np.flatnonzero(counts > 0)
+        if self._reverse:
+            positive = positive[graph._r_ids[positive] != graph._empty_r_idx]
+            idxs, strings = graph._r_ids[positive], graph._r_list
+        else:
+            idxs, strings = graph._edge_to_l(positive), graph._l_list
+        return [strings[i] for i in np.unique(idxs).tolist()]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+
+class CompactLRGraph(LRGraph):
+    """LRGraph with integer ids of L and R strings and CSR arrays of counts.
+
+    (L, R) pairs are edges sorted by L. Their R ids and counts are stored
+    in NumPy arrays, and edges of i-th L are l_indptr[i] ~ l_indptr[i+1].
+    The reverse adjacency is a permutation of edges sorted by R, so each count
+    is stored once. Edges of each L and R are sorted by count in descending
+    order and ties by string, so get_r and get_l sort only the rows changed
+    after the last reset. Removed counts are set to zero, and reset_lrgraph
+    restores only the changed edges from the original count array.
+    The set of (L, R) pairs is fixed, so add_lr_pair can only increase
+    the count of an existing pair.
+
+    _lr, _rl and _lr_origin are read-only views for the code which uses
+    the nested dict of LRGraph.
+
+    Usage
+    -----
+        >>> lrgraph = CompactLRGraph(eojeol_counter.to_lrgraph())
+        >>> lrgraph = eojeol_counter.to_lrgraph(compact=True)
+        >>> lrgraph.get_r('아이오아이', topk=3)
+        $ [('의', 221), ('', 144), ('는', 82)]
+    """
+
+    def __init__(self, lrgraph=None, sents=None, l_max_length=10, r_max_length=9):
+        """
+        :param lrgraph: dict of dict or LRGraph
+        """
+        assert l_max_length > 1 and type(l_max_length) == int
+        assert r_max_length > 0 and type(r_max_length) == int
+
+        if isinstance(lrgraph, LRGraph):
+            l_max_length = lrgraph.l_max_length
+            r_max_length = lrgraph.r_max_length
+            lrgraph = lrgraph._lr
+
+        self.l_max_length = l_max_length
+        self.r_max_length = r_max_length
+
+        if sents:
+            if lrgraph:
+                raise ValueError(
+                    'Inserted lrgraph will be ignored. Insert only one (lrgraph, sents)')
+            lrgraph = self._construct_graph(sents)
+        self._build(lrgraph if lrgraph else {})
+
+    def _build(self, lrgraph):
+        l_list = []
+        r_to_idx = {}
+        r_ids, counts, l_indptr = [], [], [0]
+        for l, rdict in lrgraph.items():
+            l_list.append(l)
+            for r, count in rdict.items():
+                idx = r_to_idx.get(r, -1)
+                if idx < 0:
+                    idx = r_to_idx[r] = len(r_to_idx)
+                r_ids.append(idx)
+                counts.append(count)
+            l_indptr.append(len(r_ids))
+
+        r_list = [None] * len(r_to_idx)
+        for r, idx in r_to_idx.items():
+            r_list[idx] = r
+
+        self._build_arrays(l_list, r_list, l_indptr, r_ids, counts)
+
+    def _build_arrays(self, l_list, r_list, l_indptr, r_ids, counts):
+        counts = np.asarray(counts)
+        counts_dtype = np.int32 if (len(counts) == 0 or counts.max() < 2 ** 31) else np.int64
+        l_indptr = np.asarray(l_indptr, dtype=np.int64)
+        r_ids = np.asarray(r_ids, dtype=np.int32)
+        counts = counts.astype(counts_dtype)
+
+        # sort edges of each L by count and R, as same as LRGraph.get_r
+        rows = np.repeat(np.arange(len(l_list)), np.diff(l_indptr))
+        order = np.lexsort((_string_ranks(r_list)[r_ids], -counts, rows))
+        self._set_arrays(l_list, r_list, l_indptr, r_ids[order], counts[order])
+
+    def _set_arrays(self, l_list, r_list, l_indptr, r_ids, counts, counts_origin=True):
+        self._l_list = l_list
+        self._r_list = r_list
+        self._l_to_idx = {l:idx for idx, l in enumerate(l_list)}
+        self._r_to_idx = {r:idx for idx, r in enumerate(r_list)}
+        self._empty_r_idx = self._r_to_idx.get('', -1)
+        self._l_indptr = l_indptr
+        self._r_ids = r_ids
+        self._counts = counts
+        self._counts_origin = counts.copy() if counts_origin is True else counts_origin
+        # edges, L and R changed after the last reset
+        self._changed_edges = []
+        self._changed_l = set()
+        self._changed_r = set()
+
+        # reverse adjacency sorted by R, count and L, except empty R.
+        # The order of L ties is as same as LRGraph.get_l
+        rows = np.repeat(np.arange(len(l_list)), np.diff(l_indptr))
+        edges = np.lexsort((_string_ranks(l_list)[rows], -counts, r_ids))
+        edges = edges[r_ids[edges] != self._empty_r_idx]
+        num_of_l = np.bincount(r_ids[edges], minlength=len(r_list))
+        self._r_indptr = np.zeros(len(r_list) + 1, dtype=np.int64)
+        np.cumsum(num_of_l, out=self._r_indptr[1:])
+        self._rl_edges = edges.astype(np.int32 if len(r_ids) < 2 ** 31 else np.int64)
+
+    def _edge_to_l(self, edges):
+        return np.searchsorted(self._l_indptr, edges, side='right') - 1
+
+    def _find_edge(self, l, r):
+        l_idx = self._l_to_idx.get(l, -1)
+        r_idx = self._r_to_idx.get(r, -1)
+        if l_idx < 0 or r_idx < 0:
+            return -1
+        b = self._l_indptr[l_idx]
+        position = np.flatnonzero(self._r_ids[b:self._l_indptr[l_idx+1]] == r_idx)
+        return int(b + position[0]) if len(position) > 0 else -1
+
+    def _items(self, ids, counts, strings):
+        return [(strings[i], c) for i, c in zip(ids.tolist(), counts.tolist()) if c > 0]
+
+    def _sorted_items(self, ids, counts, strings, topk):
+        items = self._items(ids, counts, strings)
+        items.sort(key=lambda x:(-x[1], x[0]))
+        if topk > 0:
+            items = items[:topk]
+        return items
+
+    @property
+    def _lr(self):
+        return _CompactLRView(self)
+
+    @property
+    def _rl(self):
+        return _CompactLRView(self, reverse=True)
+
+    @property
+    def _lr_origin(self):
+        if self._counts_origin is None:
+            return None
+        return _CompactLRView(self, origin=True)
+
+    def reset_lrgraph(self):
+        if (self._counts_origin is None) or (not self._changed_edges):
+            return None
+        edges = np.unique(np.asarray(self._changed_edges, dtype=np.int64))
+        self._counts[edges] = self._counts_origin[edges]
+        self._changed_edges = []
+        self._changed_l = set()
+        self._changed_r = set()
+
+    def add_lr_pair(self, l, r, count=1):
+        """It increases the count of existing (l, r) pair.
+        If (l, r) is not in the graph, it raises ValueError, because
+        the CSR arrays cannot insert a new pair. Use LRGraph instead"""
+        edge = self._find_edge(l, r)
+        if edge < 0:
+            raise ValueError('CompactLRGraph cannot add new pair ({}, {}). '\
+                'Only the counts of existing pairs can be changed'.format(l, r))
+        self._counts[edge] += count
+        self._changed_edges.append(edge)
+        self._changed_l.add(l)
+        self._changed_r.add(r)
+
+    def remove_lr_pair(self, l, r, count=1):
+        edge = self._find_edge(l, r)
+        if edge < 0:
+            return
+        self._counts[edge] = max(0, self._counts[edge] - count)
+        self._changed_edges.append(edge)
+        self._changed_l.add(l)
+        self._changed_r.add(r)
+
+    def get_r(self, l, topk=10):
+        idx = self._l_to_idx.get(l, -1)
+        if idx < 0:
+            return []
+        b, e = self._l_indptr[idx], self._l_indptr[idx+1]
+        if l in self._changed_l:
+            return self._sorted_items(self._r_ids[b:e], self._counts[b:e], self._r_list, topk)
+        if topk > 0:
+            e = min(e, b + topk)
+        return self._items(self._r_ids[b:e], self._counts[b:e], self._r_list)
+
+    def get_l(self, r, topk=10):
+        idx = self._r_to_idx.get(r, -1) if r else -1
+        if idx < 0:
+            return []
+        b, e = self._r_indptr[idx], self._r_indptr[idx+1]
+        if r in self._changed_r:
+            edges = self._rl_edges[b:e]
+            return self._sorted_items(self._edge_to_l(edges), self._counts[edges], self._l_list, topk)
+        if topk > 0:
+            e = min(e, b + topk)
+        edges = self._rl_edges[b:e]
+        return self._items(self._edge_to_l(edges), self._counts[edges], self._l_list)
+
+    def freeze(self):
+        """Remove original counts. Be careful.
+        When you excute freeze, you cannot reset_lrgraph anynore.
+        save, copy_compatified_lrgraph_origin and to_EojeolCounter(reset_lrgraph=True)
+        need the original counts, so they raise ValueError after freeze."""
+        self._counts_origin = None
+        self._changed_edges = []
+
+    def _check_origin(self, method):
+        if self._counts_origin is None:
+            raise ValueError('{} needs the original counts, '\
+                'but they were removed by freeze()'.format(method))
+        return self._counts_origin
+
+    def copy_compatified_lrgraph_origin(self):
+        """It returns original CompactLRGraph which cannot be reset"""
+        lr_graph = CompactLRGraph(
+            l_max_length = self.l_max_length,
+            r_max_length = self.r_max_length)
+        counts_origin = self._check_origin('copy_compatified_lrgraph_origin')
+        lr_graph._set_arrays(self._l_list, self._r_list, self._l_indptr,
+            self._r_ids, counts_origin.copy(), counts_origin=None)
+        return lr_graph
+
+    def to_EojeolCounter(self, reset_lrgraph=False):
+        if reset_lrgraph:
+            counts = self._check_origin('to_EojeolCounter(reset_lrgraph=True)')
+        else:
+            counts = self._counts
+        ls = self._edge_to_l(np.arange(len(counts))).tolist()
+        l_list, r_list = self._l_list, self._r_list
+        counter = {}
+        for l, r, count in zip(ls, self._r_ids.tolist(), counts.tolist()):
+            if count > 0:
+                counter[l_list[l] + r_list[r]] = count
+        eojeol_counter = EojeolCounter(None)
+        eojeol_counter._counter = counter
+        eojeol_counter._count_sum = sum(counter.values())
+        return eojeol_counter
+
+    def save(self, path, binary=False):
+        """It saves the original graph. See LRGraph.save"""
+        self._check_origin('save')
+        super().save(path, binary)
+
+    def _save_binary(self, path):
+        # edges of the original graph
+        self._write_binary(path, self._l_list, self._r_list,
+            self._l_indptr, self._r_ids, self._counts_origin)
+
+    def load(self, path):
+        """It loads text or binary file. The format is detected automatically.
+        Binary file is loaded without building dict"""
+        if zipfile.is_zipfile(path):
+            self._build_arrays(*self._read_binary(path))
+            return None
+        lrgraph = LRGraph(l_max_length=self.l_max_length, r_max_length=self.r_max_length)
+        lrgraph.load(path)
+        self._build(lrgraph._lr)
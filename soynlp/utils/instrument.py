@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import time
+
+import psutil
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null_stage = _NullStage()
+
+
+class Instrument:
+    """No-op instrumentation. It is the default instrument of extractors,
+    so instrumented code costs a method call when instrumentation is disabled.
+
+    Extractors report their progress with three methods.
+
+        >>> with instrument.stage('noun_prediction'):
+        >>>     for word in words:
+        >>>         instrument.count('words')
+        >>> instrument.event('features_appended', num_features=10)
+
+    Subclass this to send the progress to other backends.
+    """
+
+    enabled = False
+
+    def stage(self, name):
+        """It returns a context manager which measures the stage"""
+        return _null_stage
+
+    def count(self, name, n=1):
+        """It adds n to counter name"""
+        pass
+
+    def event(self, name, **fields):
+        """It emits a user defined event"""
+        pass
+
+    def close(self):
+        pass
+
+
+def check_instrument(instrument):
+    """It returns no-op Instrument if instrument is None"""
+    if instrument is None:
+        return Instrument()
+    if not isinstance(instrument, Instrument):
+        raise ValueError('instrument should be an instance of soynlp.utils.Instrument')
+    return instrument
+
+
+class _Stage:
+    def __init__(self, recorder, name):
+        self._recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        recorder = self._recorder
+        recorder._stages.append(self.name)
+        self.path = '/'.join(recorder._stages)
+        self._counters = dict(recorder.counters)
+        self._begin = time.perf_counter()
+        recorder._emit('stage_begin', stage=self.path)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        recorder = self._recorder
+        elapsed = time.perf_counter() - self._begin
+        counts = {name:count - self._counters.get(name, 0)
+                  for name, count in recorder.counters.items()
+                  if count != self._counters.get(name, 0)}
+        throughput = {name:count / elapsed for name, count in counts.items() if elapsed > 0}
+        recorder.timers[self.path] = recorder.timers.get(self.path, 0) + elapsed
+        recorder._sample_memory()
+        recorder._emit('stage_end', stage=self.path, elapsed=elapsed,
+            counts=counts, throughput=throughput, failed=exc_type is not None,
+            rss=recorder.rss, peak_rss=recorder.peak_rss)
+        recorder._stages.pop()
+        return False
+
+
+class Recorder(Instrument):
+    """Instrumentation with stage timers, item counters and throughput.
+    Resident set size (RSS) of the process is sampled on a timer thread,
+    so the measured code does not call psutil.
+
+    Every event is a dict with 'event', 'time' (unix time) and 'elapsed'
+    (seconds since the recorder was created), and is passed to each handler.
+
+        stage_begin : stage
+        stage_end   : stage, elapsed, counts, throughput, failed, rss, peak_rss
+        sample      : stage, counts, rss, peak_rss (every interval seconds)
+        others      : fields of Instrument.event
+
+    Nested stages are joined with '/', and RSS is in bytes.
+
+    :param handlers: list of callable
+        Each handler takes an event dict. For example, JsonLogHandler
+    :param interval: float
+        Sampling interval (seconds) of RSS and progress. If interval <= 0,
+        RSS is sampled only at the end of stages
+
+    Usage
+    -----
+        >>> from soynlp.utils import Recorder, JsonLogHandler
+        >>> recorder = Recorder(handlers=[JsonLogHandler('extraction.log')])
+        >>> noun_extractor = LRNounExtractor_v2(instrument=recorder)
+        >>> nouns = noun_extractor.train_extract(corpus)
+        >>> recorder.close()
+        >>> recorder.timers
+        $ {'train': 13.2, 'train/eojeol_counting': 11.5, 'extract': 20.1, ...}
+    """
+
+    enabled = True
+
+    def __init__(self, handlers=None, interval=1.0):
+        self.handlers = list(handlers) if handlers else []
+        self.interval = interval
+        self.counters = {}
+        self.timers = {}
+        self.rss = 0
+        self.peak_rss = 0
+        self._stages = []
+        self._process = psutil.Process(os.getpid())
+        self._lock = threading.Lock()
+        self._begin = time.time()
+        self._sample_memory()
+
+        self._stop = threading.Event()
+        self._sampler = None
+        if interval > 0:
+            self._sampler = threading.Thread(target=self._run_sampler, daemon=True)
+            self._sampler.start()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def event(self, name, **fields):
+        self._emit(name, **fields)
+
+    def _sample_memory(self):
+        try:
+            self.rss = self._process.memory_info().rss
+        except psutil.Error:
+            return None
+        self.peak_rss = max(self.peak_rss, self.rss)
+
+    def _run_sampler(self):
+        while not self._stop.wait(self.interval):
+            self._sample_memory()
+            stages = self._stages
+            self._emit('sample', stage='/'.join(stages) if stages else None,
+                counts=dict(self.counters), rss=self.rss, peak_rss=self.peak_rss)
+
+    def _emit(self, name, **fields):
+        if not self.handlers:
+            return None
+        now = time.time()
+        event = {'event': name, 'time': now, 'elapsed': now - self._begin}
+        event.update(fields)
+        # handlers are called from the sampler thread too
+        with self._lock:
+            for handler in self.handlers:
+                handler(event)
+
+    def close(self):
+        """It stops the sampler thread and closes the handlers which have close method"""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        self._sample_memory()
+        for handler in self.handlers:
+            if hasattr(handler, 'close'):
+                handler.close()
+
+    def summary(self):
+        return {
+            'timers': dict(self.timers),
+            'counters': dict(self.counters),
+            'peak_rss': self.peak_rss
+        }
+
+
+class JsonLogHandler:
+    """It writes each event as a line of JSON.
+
+    :param path: str or file-like object
+        If str, the file is opened with append mode
+    """
+
+    def __init__(self, path):
+        if isinstance(path, str):
+            self._file = open(path, 'a', encoding='utf-8')
+            self._own_file = True
+        else:
+            self._file = path
+            self._own_file = False
+
+    def __call__(self, event):
+        self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._own_file and not self._file.closed:
+            self._file.close()
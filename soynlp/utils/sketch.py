@@ -0,0 +1,175 @@
+import math
+import zlib
+import numpy as np
+
+
+class CountMinSketch:
+    """Count-Min sketch for str keys.
+
+    Estimated count is never smaller than true count, and
+    estimate <= true count + epsilon * N with probability 1 - delta,
+    where epsilon = e / width, delta = exp(-depth) and N is sum of all counts.
+
+    Keys are hashed with crc32 and adler32 (double hashing), so the sketch
+    is deterministic across processes and can be merged.
+    """
+
+    def __init__(self, width=2**20, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth, dtype=np.int64).reshape(-1, 1)
+        self.num_of_counts = 0
+
+    def _columns(self, keys):
+        """It returns (depth, len(keys)) shape column indices"""
+        h1, h2 = [], []
+        for key in keys:
+            key = key.encode('utf-8')
+            h1.append(zlib.crc32(key))
+            h2.append(zlib.adler32(key) | 1)
+        h1 = np.asarray(h1, dtype=np.int64)
+        h2 = np.asarray(h2, dtype=np.int64)
+        return (h1 + self._rows * h2) % self.width
+
+    def add(self, keys, counts):
+        """
+        :param keys: list of str
+        :param counts: list of int
+        """
+        if not keys:
+            return
+        columns = self._columns(keys)
+        counts = np.asarray(counts, dtype=np.int64)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], counts)
+        self.num_of_counts += int(counts.sum())
+
+    def estimate(self, keys):
+        """It returns numpy.ndarray of estimated counts of keys"""
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(keys)
+        return self.table[self._rows, columns].min(axis=0)
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    def merge(self, other):
+        if (self.width != other.width) or (self.depth != other.depth):
+            raise ValueError('Sketches of different shape cannot be merged')
+        self.table += other.table
+        self.num_of_counts += other.num_of_counts
+
+
+class HeavyHitterCounter:
+    """Bounded-memory approximate counter with Count-Min sketch and
+    a Space-Saving style table of heavy hitters.
+
+    Every count is added to the Count-Min sketch. The table keeps at most
+    capacity keys with the largest counts. When the table is full, the keys
+    with small counts are evicted and the eviction threshold is raised.
+    A new key enters the table only when its estimated count in the sketch
+    exceeds the threshold, so evicted keys do not lose their counts.
+
+    Counts are overestimates, and the overestimation is bounded by
+    error_bound with probability confidence.
+
+    Usage
+    -----
+        >>> counter = HeavyHitterCounter.from_memory_budget(megabytes=100)
+        >>> counter.update({'아이': 3, '아이오': 2})
+        >>> counter.items(min_count=2)
+        $ {'아이': 3, '아이오': 2}
+        >>> counter.error_bound, counter.confidence
+    """
+
+    def __init__(self, capacity=100000, width=2**20, depth=4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self._table = {}
+        self._threshold = 0
+
+    @classmethod
+    def from_memory_budget(cls, megabytes, depth=4, bytes_per_key=200):
+        """Half of the memory budget is used for the sketch, and the other half
+        is used for the table. A table entry is assumed to use bytes_per_key"""
+        budget = megabytes * 1024 * 1024 / 2
+        width = max(1, int(budget / (8 * depth)))
+        capacity = max(1, int(budget / bytes_per_key))
+        return cls(capacity, width, depth)
+
+    def __len__(self):
+        return len(self._table)
+
+    def update(self, counter):
+        """
+        :param counter: dict
+            {str: int}, exact counts of a chunk of stream
+        """
+        keys = list(counter.keys())
+        self.sketch.add(keys, [counter[key] for key in keys])
+
+        table = self._table
+        new_keys = []
+        for key in keys:
+            if key in table:
+                table[key] += counter[key]
+            else:
+                new_keys.append(key)
+
+        # the estimation includes the counts of this chunk
+        estimations = self.sketch.estimate(new_keys).tolist()
+        for key, estimation in zip(new_keys, estimations):
+            if estimation > self._threshold:
+                table[key] = estimation
+
+        if len(table) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        # keep the largest half of capacity, and raise the threshold
+        # to the largest count of evicted keys
+        num_keep = max(1, self.capacity // 2)
+        counts = np.fromiter(self._table.values(), dtype=np.int64, count=len(self._table))
+        kth = len(counts) - num_keep
+        threshold = int(np.partition(counts, kth - 1)[kth - 1])
+        self._table = {key:count for key, count in self._table.items() if count > threshold}
+        self._threshold = max(self._threshold, threshold)
+
+    def get(self, key, default=0):
+        count = self._table.get(key, -1)
+        if count == -1:
+            return default
+        return min(count, int(self.sketch.estimate([key])[0]))
+
+    def items(self, min_count=1):
+        """It returns {key: count} of heavy hitters whose count >= min_count"""
+        keys = [key for key, count in self._table.items() if count >= min_count]
+        estimations = self.sketch.estimate(keys).tolist()
+        counts = {}
+        for key, estimation in zip(keys, estimations):
+            # both are overestimation. use tighter one
+            count = min(self._table[key], estimation)
+            if count >= min_count:
+                counts[key] = count
+        return counts
+
+    @property
+    def error_bound(self):
+        """Maximum overestimation of counts with probability confidence"""
+        return self.sketch.epsilon * self.sketch.num_of_counts
+
+    @property
+    def confidence(self):
+        return 1 - self.sketch.delta
+
+    @property
+    def threshold(self):
+        """Keys whose estimated count is not larger than threshold may be missed"""
+        return self._threshold
@@ -1,10 +1,21 @@
 # -*- encoding:utf8 -*-
 
+import gzip
+import io
+import mmap
 import os
 import psutil
 import sys
+import zipfile
 from collections import defaultdict
+from collections import deque
+from collections.abc import Mapping
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+import numpy as np
 from sklearn.metrics import pairwise_distances
+from .sketch import HeavyHitterCounter
+from .instrument import check_instrument
 
 
 installpath = os.path.sep.join(
@@ -97,88 +108,299 @@ def check_corpus(corpus):
         raise ValueError('Input corpus must be longer than 0')
     return True
 
-class DoublespaceLineCorpus:    
-    def __init__(self, corpus_fname, num_doc = -1, num_sent = -1, iter_sent = False, skip_header = 0):
+def _seek_forward(f, offset):
+    """It moves the position of binary file f to offset.
+    A decompressing stream which is not seekable is read until offset"""
+    if f.seekable():
+        f.seek(offset)
+        return
+    while offset > 0:
+        num_read = len(f.read(min(offset, 1 << 20)))
+        if num_read == 0:
+            break
+        offset -= num_read
+
+class DoublespaceLineCorpus:
+    """Corpus of which a line is a document and sentences are separated by double space.
+
+    Byte offsets of documents and the number of sentences in each document are
+    indexed once. With save_index=True, the index is persisted as
+    {corpus_fname}.index.npz, and it is rebuilt when the size or the modified
+    time of the corpus file has changed.
+    With the index, len(corpus) is O(1), corpus[i] reads only one line,
+    and corpus.split(n) returns n shard views for parallel consumers.
+
+    gzip (.gz) and zstandard (.zst) compressed files are read as streams.
+    zstandard is an optional dependency. With use_mmap=True, plain text file
+    is memory-mapped and decoded lazily.
+
+    Usage
+    -----
+        >>> corpus = DoublespaceLineCorpus(corpus_fname, iter_sent=True)
+        >>> len(corpus)
+        >>> corpus[3]
+        >>> for shard in corpus.split(4):
+        >>>     for sent in shard:
+        >>>         # do something
+        >>> for sents in corpus.iter_batch(batch_size=1000):
+        >>>     # do something
+    """
+
+    def __init__(self, corpus_fname, num_doc = -1, num_sent = -1, iter_sent = False,
+        skip_header = 0, save_index = False, use_mmap = False):
+        """
+        :param save_index: Boolean
+            If True, the index is saved as {corpus_fname}.index.npz next to
+            the corpus file, and it is reused by the next DoublespaceLineCorpus.
+            If False or the file cannot be written, the index is kept only in memory.
+            The saved index is loaded in both cases
+        :param use_mmap: Boolean
+            If True, the file is memory-mapped, and only yielded documents or
+            sentences are decoded from the mapped buffer.
+            It is not available for compressed file
+        """
+        if use_mmap and (corpus_fname.endswith('.gz') or
+            corpus_fname.endswith('.zst') or corpus_fname.endswith('.zstd')):
+            raise ValueError('use_mmap is not available for compressed file {}'.format(corpus_fname))
+
         self.corpus_fname = corpus_fname
         self.num_doc = 0
         self.num_sent = 0
         self.iter_sent = iter_sent
         self.skip_header = skip_header
+        self.save_index = save_index
+        self.use_mmap = use_mmap
+        self._index = None
+        # [begin, end) document range of shard view. None means whole corpus
+        self._doc_range = None
+        self._begin_offset = 0
         if (num_doc > 0) or (num_sent > 0):
             self.num_doc, self.num_sent = self._check_length(num_doc, num_sent)
 
+    def __getstate__(self):
+        # saved index is loaded again from sidecar file when it is needed.
+        # shard views iterate without index, so they do not carry the index of whole file
+        state = dict(self.__dict__)
+        if self.save_index or (self._doc_range is not None):
+            state['_index'] = None
+        return state
+
+    @property
+    def index_fname(self):
+        return self.corpus_fname + '.index.npz'
+
+    def _get_index(self):
+        if self._index is None:
+            self._index = self._load_index()
+        if self._index is None:
+            self._index = self._build_index()
+            if self.save_index:
+                self._save_index(self._index)
+        return self._index
+
+    def _file_stat(self):
+        stat = os.stat(self.corpus_fname)
+        return np.asarray([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def _build_index(self):
+        """It returns (doc_offsets, sent_indptr).
+        doc_offsets[i] is byte offset of i-th document and doc_offsets[-1] is
+        the end of the file. Sentences of i-th document are
+        sent_indptr[i] ~ sent_indptr[i+1]. Header lines are also indexed"""
+        doc_offsets = [0]
+        num_sents = [0]
+        offset = 0
+        with self._open_binary() as f:
+            for line in f:
+                offset += len(line)
+                doc_offsets.append(offset)
+                doc = line.decode('utf-8')
+                num_sents.append(sum(1 for sent in doc.split('  ') if sent.strip()))
+        doc_offsets = np.asarray(doc_offsets, dtype=np.int64)
+        sent_indptr = np.cumsum(num_sents, dtype=np.int64)
+        return doc_offsets, sent_indptr
+
+    def _save_index(self, index):
+        doc_offsets, sent_indptr = index
+        try:
+            with open(self.index_fname, 'wb') as f:
+                np.savez(f, doc_offsets=doc_offsets,
+                    sent_indptr=sent_indptr, stat=self._file_stat())
+        except OSError:
+            pass
+
+    def _load_index(self):
+        if not os.path.exists(self.index_fname):
+            return None
+        try:
+            with np.load(self.index_fname) as index:
+                if not np.array_equal(index['stat'], self._file_stat()):
+                    return None
+                return index['doc_offsets'], index['sent_indptr']
+        except Exception:
+            return None
+
+    def _full_range(self):
+        if self._doc_range is not None:
+            return self._doc_range
+        doc_offsets, _ = self._get_index()
+        num_lines = len(doc_offsets) - 1
+        return min(self.skip_header, num_lines), num_lines
+
     def _check_length(self, num_doc, num_sent):
-        num_sent_ = 0
+        """It returns (number of docs, number of sents) under num_doc and num_sent limits"""
+        if (self._index is None) and ((num_doc > 0) or (num_sent > 0)):
+            self._index = self._load_index()
+            if self._index is None:
+                # counting first documents is cheaper than indexing whole file
+                return self._count_length(num_doc, num_sent)
 
-        # python version check
         try:
-            if sys.version.split('.')[0] == '2':
-                f = open(self.corpus_fname)
-            else:
-                f = open(self.corpus_fname, encoding= "utf-8")
+            _, sent_indptr = self._get_index()
         except Exception as e:
             print(e)
             return 0, 0
 
+        begin, end = self._full_range()
+        if (num_doc > 0) and (end - begin > num_doc):
+            end = begin + num_doc
+        num_sent_ = int(sent_indptr[end] - sent_indptr[begin])
+        if (num_sent > 0) and (num_sent_ > num_sent):
+            # the documents until the sentence count exceeds num_sent
+            end = int(np.searchsorted(sent_indptr, sent_indptr[begin] + num_sent, side='right'))
+            num_sent_ = num_sent
+        return end - begin, num_sent_
+
+    def _count_length(self, num_doc, num_sent):
+        num_sent_ = 0
         try:
-            # skip headers
-            for _ in range(self.skip_header):
-                next(f)
+            f = self._open()
         except Exception as e:
             print(e)
             return 0, 0
 
-        # check length
-        for doc_idx, doc in enumerate(f):
-            if (num_doc > 0) and (doc_idx >= num_doc):
-                return doc_idx, num_sent_
-            sents = doc.split('  ')
-            sents = [sent for sent in sents if sent.strip()]
-            num_sent_ += len(sents)
-            if (num_sent > 0) and (num_sent_ > num_sent):
-                return doc_idx+1, min(num_sent, num_sent_)
+        with f:
+            try:
+                # skip headers
+                for _ in range(self.skip_header):
+                    next(f)
+            except Exception as e:
+                print(e)
+                return 0, 0
+
+            # check length
+            doc_idx = -1
+            for doc_idx, doc in enumerate(f):
+                if (num_doc > 0) and (doc_idx >= num_doc):
+                    return doc_idx, num_sent_
+                sents = doc.split('  ')
+                sents = [sent for sent in sents if sent.strip()]
+                num_sent_ += len(sents)
+                if (num_sent > 0) and (num_sent_ > num_sent):
+                    return doc_idx+1, min(num_sent, num_sent_)
 
         return doc_idx+1, num_sent_
 
-    def __iter__(self):
-        try:
-            if sys.version.split('.')[0] == '2':
-                f = open(self.corpus_fname)
-            else:
-                f = open(self.corpus_fname, encoding='utf-8')
-        except Exception as e:
-            print(e)
+    def _open_binary(self):
+        fname = self.corpus_fname
+        if fname.endswith('.gz'):
+            return gzip.open(fname, 'rb')
+        if fname.endswith('.zst') or fname.endswith('.zstd'):
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError('zstandard is required to read {}. '\
+                    'Install it with pip install zstandard'.format(fname))
+            return io.BufferedReader(
+                zstandard.ZstdDecompressor().stream_reader(open(fname, 'rb')))
+        return open(fname, 'rb')
+
+    def _open(self, offset=0):
+        f = self._open_binary()
+        if offset > 0:
+            _seek_forward(f, offset)
+        # lines are separated only by '\n' as same as the index
+        return io.TextIOWrapper(f, encoding='utf-8', newline='\n')
+
+    def _doc_span(self):
+        """It returns (byte offset of first document, number of header lines to skip,
+        maximum number of documents). -1 means no limit"""
+        if self._doc_range is not None:
+            return self._begin_offset, 0, self._doc_range[1] - self._doc_range[0]
+        if self._index is not None:
+            begin, end = self._full_range()
+            return int(self._index[0][begin]), 0, end - begin
+        return 0, self.skip_header, -1
+
+    def _iter_text_docs(self, offset, num_skip):
+        with self._open(offset) as f:
+            try:
+                # skip headers
+                for _ in range(num_skip):
+                    next(f)
+            except Exception as e:
+                print(e)
+            for doc in f:
+                yield doc
+
+    def _iter_mmap_docs(self, offset, num_skip):
+        with open(self.corpus_fname, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            # the file can be closed after mapping
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with buffer:
+            buffer.seek(offset)
+            for doc_idx, doc in enumerate(iter(buffer.readline, b'')):
+                if doc_idx >= num_skip:
+                    yield doc
 
-        try:
-            # skip headers
-            for _ in range(self.skip_header):
-                next(f)
-        except Exception as e:
-            print(e)
+    def __iter__(self):
+        offset, num_skip, max_doc = self._doc_span()
+        if self.use_mmap:
+            # lines are bytes, and only yielded documents or sentences are decoded
+            docs = self._iter_mmap_docs(offset, num_skip)
+            decode = lambda doc: doc.decode('utf-8')
+            separator = b'  '
+        else:
+            docs = self._iter_text_docs(offset, num_skip)
+            decode = lambda doc: doc
+            separator = '  '
 
         # iteration
         num_sent, stop = 0, False
-        for doc_idx, doc in enumerate(f):
-            if stop:
+        for doc_idx, doc in enumerate(docs):
+            if stop or (max_doc >= 0 and doc_idx >= max_doc):
                 break
 
             # yield doc
             if not self.iter_sent:
-                yield doc.strip()
+                yield decode(doc).strip()
                 if (self.num_doc > 0) and ((doc_idx + 1) >= self.num_doc):
                     stop = True
                 continue
 
             # yield sents
-            for sent in doc.split('  '):
+            for sent in doc.split(separator):
                 if (self.num_sent > 0) and (num_sent >= self.num_sent):
                     stop = True
                     break
-                sent = sent.strip()
+                sent = decode(sent).strip()
                 if sent:
                     yield sent
                     num_sent += 1
 
+    def iter_batch(self, batch_size=1000):
+        """It yields lists of batch_size sentences if iter_sent is True else documents"""
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     def __len__(self):
         try:
             if self.num_doc == 0:
@@ -187,18 +409,164 @@ class DoublespaceLineCorpus:
         except:
             return -1
 
+    def __getitem__(self, i):
+        """It returns i-th sentence if iter_sent is True else i-th document"""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not (0 <= i < n):
+            raise IndexError('corpus index out of range')
+
+        doc_offsets, sent_indptr = self._get_index()
+        begin = self._full_range()[0]
+        if self.iter_sent:
+            sent_idx = sent_indptr[begin] + i
+            doc_idx = int(np.searchsorted(sent_indptr, sent_idx, side='right')) - 1
+        else:
+            doc_idx = begin + i
+
+        with self._open_binary() as f:
+            _seek_forward(f, int(doc_offsets[doc_idx]))
+            doc = f.read(int(doc_offsets[doc_idx + 1] - doc_offsets[doc_idx])).decode('utf-8')
+
+        if not self.iter_sent:
+            return doc.strip()
+        sents = [sent.strip() for sent in doc.split('  ') if sent.strip()]
+        return sents[sent_idx - sent_indptr[doc_idx]]
+
+    def split(self, n):
+        """It returns at most n shard views. Shards have (almost) same number of
+        sentences if iter_sent is True else documents, and are split at document
+        boundaries. Iterating all shards in order is same with iterating the corpus"""
+        doc_offsets, sent_indptr = self._get_index()
+        begin, _ = self._full_range()
+        num_doc, num_sent = self._check_length(self.num_doc, self.num_sent)
+        end = begin + num_doc
+
+        if self.iter_sent:
+            targets = sent_indptr[begin] + np.arange(1, n) * num_sent // n
+            bounds = np.searchsorted(sent_indptr[begin:end+1], targets, side='left') + begin
+        else:
+            bounds = begin + np.arange(1, n) * num_doc // n
+        bounds = np.unique(np.concatenate([[begin], bounds, [end]]))
+
+        shards = []
+        for b, e in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            shard = DoublespaceLineCorpus(self.corpus_fname, iter_sent=self.iter_sent,
+                skip_header=self.skip_header, save_index=self.save_index,
+                use_mmap=self.use_mmap)
+            shard._index = self._index
+            shard._doc_range = (b, e)
+            shard._begin_offset = int(doc_offsets[b])
+            shard.num_doc = e - b
+            # the last document may be cut by num_sent
+            shard.num_sent = int(min(sent_indptr[e], sent_indptr[begin] + num_sent) - sent_indptr[b])
+            shards.append(shard)
+        return shards
+
+def _prune_counter(counter, min_count):
+    """It removes keys whose count is smaller than min_count in place"""
+    removals = [key for key, count in counter.items() if count < min_count]
+    for key in removals:
+        del counter[key]
+
+def _identity(sent):
+    # default preprocess. Unlike lambda, it can be pickled for spawned workers
+    return sent
+
+def _count_eojeols(sents, preprocess, max_length, min_count=1, filtering_checkpoint=0):
+    counter = {}
+    for i_sent, sent in enumerate(sents):
+        sent = preprocess(sent)
+        if (min_count > 1 and
+            filtering_checkpoint > 0 and
+            i_sent > 0 and
+            i_sent % filtering_checkpoint == 0):
+            _prune_counter(counter, min_count)
+        for eojeol in sent.split():
+            if (not eojeol) or (len(eojeol) > max_length):
+                continue
+            counter[eojeol] = counter.get(eojeol, 0) + 1
+    return counter
+
+def _chunk_sents(sents, chunk_size):
+    chunk = []
+    for sent in sents:
+        chunk.append(sent)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+_worker_preprocess = None
+
+def _init_eojeol_counting_worker(preprocess):
+    # preprocess is passed once when the worker process is created.
+    # With spawn start method, it should be picklable (not lambda)
+    global _worker_preprocess
+    _worker_preprocess = preprocess
+
+def _count_eojeols_in_worker(args):
+    source, max_length, min_count, filtering_checkpoint = args
+    return _count_eojeols(source, _worker_preprocess,
+        max_length, min_count, filtering_checkpoint)
+
+def _encode_strings(strings):
+    """It returns utf-8 encoded uint8 array of '\\n' joined strings.
+    Eojeols, L and R do not have white space"""
+    return np.frombuffer('\n'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+def _decode_strings(array, num_strings):
+    if num_strings == 0:
+        return []
+    return array.tobytes().decode('utf-8').split('\n')
+
+def _prepare_dir(path):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+def _is_binary_file(path):
+    return zipfile.is_zipfile(path)
+
 class EojeolCounter:
     def __init__(self, sents=None, min_count=1, max_length=15,
-        filtering_checkpoint=0, verbose=False, preprocess=None):
+        filtering_checkpoint=0, verbose=False, preprocess=None, memory_budget=0,
+        n_jobs=1, instrument=None):
+        """
+        :param n_jobs: int
+            Number of worker processes. If n_jobs > 1, preprocessing and counting
+            run in the workers, and the partial counters are merged.
+            DoublespaceLineCorpus is split into shards by DoublespaceLineCorpus.split,
+            and each worker reads its own shard. Other sentence iterables are split
+            into chunks of filtering_checkpoint (default 10000) sents.
+            If n_jobs = -1, it uses all cores. It is ignored when memory_budget > 0.
+            With spawn start method (macOS, Windows), preprocess is pickled,
+            so it should be a module level function, not lambda
+        :param memory_budget: float
+            If memory_budget > 0, eojeols are counted approximately with
+            bounded memory (Mb) by Count-Min sketch and heavy hitter table.
+            filtering_checkpoint is used as chunk size (default 10000 sents).
+            The counts are overestimated at most by error_bound[0]
+            with probability error_bound[1].
+        :param instrument: soynlp.utils.Instrument
+            It measures 'eojeol_counting' stage and counts 'sents' (or 'parts'
+            when n_jobs > 1). Default is no-op instrument
+        """
 
         self.min_count = min_count
         self.max_length = max_length
         self.filtering_checkpoint = filtering_checkpoint
         self.verbose = verbose
+        self.memory_budget = memory_budget
+        self.n_jobs = cpu_count() if n_jobs == -1 else n_jobs
+        self.error_bound = None
+        self.instrument = check_instrument(instrument)
         self._coverage = 0.0
 
         if preprocess is None:
-            preprocess = lambda x:x
+            preprocess = _identity
         self.preprocess = preprocess
 
         if sents is not None:
@@ -215,22 +583,53 @@ class EojeolCounter:
     def __len__(self):
         return len(self._counter)
 
+    def __add__(self, other):
+        counter = EojeolCounter(None, self.min_count, self.max_length,
+            self.filtering_checkpoint, self.verbose, self.preprocess,
+            self.memory_budget, self.n_jobs)
+        counter.update(self)
+        counter.update(other)
+        return counter
+
+    def update(self, other):
+        """It adds the counts of other EojeolCounter or {eojeol: count} dict.
+        min_count filtering is not applied to the merged counter"""
+        if isinstance(other, EojeolCounter):
+            other = other._counter
+        _counter = self._counter
+        for eojeol, count in other.items():
+            _counter[eojeol] = _counter.get(eojeol, 0) + count
+        self._coverage = 0.0
+        self._set_count_sum()
+        return self
+
     def _set_count_sum(self):
         self._count_sum = sum(self._counter.values())
 
     def _counting_from_sents(self, sents):
         check_corpus(sents)
 
+        with self.instrument.stage('eojeol_counting'):
+            if self.memory_budget > 0:
+                return self._approximate_counting_from_sents(sents)
+
+            if self.n_jobs > 1:
+                return self._parallel_counting_from_sents(sents)
+
+            return self._serial_counting_from_sents(sents)
+
+    def _serial_counting_from_sents(self, sents):
+        count_sent = self.instrument.count
         _counter = {}
         for i_sent, sent in enumerate(sents):
+            count_sent('sents')
             sent = self.preprocess(sent)
             # filtering during eojeol counting
             if (self.min_count > 1 and
                 self.filtering_checkpoint > 0 and
                 i_sent > 0 and
                 i_sent % self.filtering_checkpoint == 0):
-                _counter = {k:v for k,v in _counter.items()
-                            if v >= self.min_count}
+                _prune_counter(_counter, self.min_count)
             # add eojeol count
             for eojeol in sent.split():
                 if (not eojeol) or (len(eojeol) > self.max_length):
@@ -241,12 +640,99 @@ class EojeolCounter:
                 print('\r[EojeolCounter] n eojeol = {} from {} sents. mem={} Gb{}'.format(
                     len(_counter), i_sent + 1, '%.3f'%get_process_memory(), ' '*20), flush=True, end='')
         # final filtering
-        _counter = {k:v for k,v in _counter.items() if v >= self.min_count}
+        _prune_counter(_counter, self.min_count)
         if self.verbose:
             print('\r[EojeolCounter] n eojeol = {} from {} sents. mem={} Gb{}'.format(
                 len(_counter), i_sent + 1, '%.3f'%get_process_memory(), ' '*20), flush=True)
         return _counter
 
+    def _parallel_counting_from_sents(self, sents):
+        if isinstance(sents, DoublespaceLineCorpus):
+            # each worker reads its own shard of the file,
+            # and prunes the counter at every filtering_checkpoint
+            args = [(shard, self.max_length, self.min_count, self.filtering_checkpoint)
+                    for shard in sents.split(self.n_jobs)]
+            checkpoint = 0
+        else:
+            # chunk size is equal to filtering_checkpoint. Pruning after merging
+            # each chunk is same with the pruning of serial counting
+            chunk_size = self.filtering_checkpoint if self.filtering_checkpoint > 0 else 10000
+            args = ((chunk, self.max_length, 1, 0)
+                    for chunk in _chunk_sents(sents, chunk_size))
+            checkpoint = self.filtering_checkpoint
+
+        _counter = {}
+        num_parts = 0
+
+        def merge(result):
+            nonlocal num_parts
+            # merge in corpus order to keep the insertion order of serial counting
+            partial = result.get()
+            for eojeol, count in partial.items():
+                _counter[eojeol] = _counter.get(eojeol, 0) + count
+            del partial
+            num_parts += 1
+            self.instrument.count('parts')
+            if self.min_count > 1 and checkpoint > 0:
+                _prune_counter(_counter, self.min_count)
+            if self.verbose:
+                print('\r[EojeolCounter] n eojeol = {} from {} parts. mem={} Gb{}'.format(
+                    len(_counter), num_parts, '%.3f'%get_process_memory(), ' '*20), flush=True, end='')
+
+        # Pool.imap consumes the whole chunk generator ahead of the workers.
+        # Here at most 2 * n_jobs chunks are read ahead of the merged ones
+        max_pending = 2 * self.n_jobs
+        pending = deque()
+        pool = Pool(self.n_jobs, _init_eojeol_counting_worker, (self.preprocess,))
+        try:
+            for arg in args:
+                pending.append(pool.apply_async(_count_eojeols_in_worker, (arg,)))
+                del arg
+                if len(pending) >= max_pending:
+                    merge(pending.popleft())
+            while pending:
+                merge(pending.popleft())
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+        _prune_counter(_counter, self.min_count)
+        if self.verbose:
+            print('\r[EojeolCounter] n eojeol = {}. mem={} Gb{}'.format(
+                len(_counter), '%.3f'%get_process_memory(), ' '*20), flush=True)
+        return _counter
+
+    def _approximate_counting_from_sents(self, sents):
+        heavy_hitters = HeavyHitterCounter.from_memory_budget(self.memory_budget)
+        chunk_size = self.filtering_checkpoint if self.filtering_checkpoint > 0 else 10000
+
+        count_sent = self.instrument.count
+        _counter = {}
+        for i_sent, sent in enumerate(sents):
+            count_sent('sents')
+            sent = self.preprocess(sent)
+            for eojeol in sent.split():
+                if (not eojeol) or (len(eojeol) > self.max_length):
+                    continue
+                _counter[eojeol] = _counter.get(eojeol, 0) + 1
+            # flush chunk counts to heavy hitter counter
+            if i_sent % chunk_size == chunk_size - 1:
+                heavy_hitters.update(_counter)
+                _counter = {}
+                if self.verbose:
+                    print('\r[EojeolCounter] n eojeol = {} from {} sents. mem={} Gb{}'.format(
+                        len(heavy_hitters), i_sent + 1, '%.3f'%get_process_memory(), ' '*20), flush=True, end='')
+        heavy_hitters.update(_counter)
+
+        _counter = heavy_hitters.items(min_count=self.min_count)
+        self.error_bound = (heavy_hitters.error_bound, heavy_hitters.confidence)
+        if self.verbose:
+            print('\r[EojeolCounter] n eojeol = {} from {} sents. error bound={} with prob {}{}'.format(
+                len(_counter), i_sent + 1, '%.1f' % self.error_bound[0],
+                '%.3f' % self.error_bound[1], ' '*20), flush=True)
+        return _counter
+
     @property
     def coverage(self):
         return self._coverage
@@ -278,8 +764,17 @@ class EojeolCounter:
     def items(self):
         return self._counter.items()
 
-    def to_lrgraph(self, l_max_length=10, r_max_length=9, ignore_one_syllable=False):
-        return self._to_lrgraph(self._counter, l_max_length, r_max_length)
+    def to_lrgraph(self, l_max_length=10, r_max_length=9, ignore_one_syllable=False,
+        compact=False):
+        """
+        :param compact: Boolean
+            If True, it returns soynlp.utils.CompactLRGraph
+        """
+        lrgraph = self._to_lrgraph(self._counter, l_max_length, r_max_length)
+        if compact:
+            from .compact import CompactLRGraph
+            lrgraph = CompactLRGraph(lrgraph)
+        return lrgraph
 
     def _to_lrgraph(self, counter, l_max_length=10, r_max_length=9, ignore_one_syllable=False):
         _lrgraph = defaultdict(lambda: defaultdict(int))
@@ -296,24 +791,96 @@ class EojeolCounter:
             l_max_length=l_max_length, r_max_length=r_max_length)
         return lrgraph
 
-    def save(self, path):
-        dirname = os.path.dirname(path)
-        if dirname and not os.path.exists(dirname):
-            os.makedirs(dirname)
+    def save(self, path, binary=False):
+        """
+        :param path: str
+            File path
+        :param binary: Boolean
+            If True, it saves the counter as NumPy npz format with
+            a string table of eojeols and a count array.
+            Else, it saves 'eojeol count' text lines
+        """
+        _prepare_dir(path)
+        items = sorted(self._counter.items(), key=lambda x:(-x[1], x[0]))
+        if binary:
+            with open(path, 'wb') as f:
+                np.savez(f,
+                    eojeols = _encode_strings([eojeol for eojeol, _ in items]),
+                    counts = np.asarray([count for _, count in items], dtype=np.int64))
+            return None
         with open(path, 'w', encoding='utf-8') as f:
-            for eojeol, count in sorted(self._counter.items(), key=lambda x:(-x[1], x[0])):
+            for eojeol, count in items:
                 f.write('{} {}\n'.format(eojeol, count))
 
     def load(self, path):
+        """It loads text or binary file. The format is detected automatically"""
         self._coverage = 0.0
         self._counter = {}
-        with open(path, encoding='utf-8') as f:
-            for line in f:
-                word, count = line.split()
-                self._counter[word] = int(count)
+        if _is_binary_file(path):
+            with np.load(path) as data:
+                counts = data['counts'].tolist()
+                eojeols = _decode_strings(data['eojeols'], len(counts))
+            self._counter = dict(zip(eojeols, counts))
+        else:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    word, count = line.split()
+                    self._counter[word] = int(count)
         self._count_sum = sum(self._counter.values())
 
+class _LROriginView(Mapping):
+    """Read-only {l: {r: count}} view of original LRGraph.
+    Rows without changes are the rows of LRGraph._lr, and the other rows
+    are merged with LRGraph._lr_delta"""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, l):
+        rdict = self._graph._lr.get(l, {})
+        delta = self._graph._lr_delta.get(l)
+        if delta:
+            rdict = dict(rdict)
+            for r, count in delta.items():
+                count += rdict.get(r, 0)
+                if count > 0:
+                    rdict[r] = count
+                else:
+                    rdict.pop(r, None)
+        if not rdict:
+            raise KeyError(l)
+        return rdict
+
+    def __contains__(self, l):
+        try:
+            self[l]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        lr, delta = self._graph._lr, self._graph._lr_delta
+        for l in lr:
+            if l in self:
+                yield l
+        for l in delta:
+            if (l not in lr) and (l in self):
+                yield l
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
 class LRGraph:
+    """L-R graph of eojeols.
+
+    Changes by remove_lr_pair and add_lr_pair are recorded in _lr_delta as
+    {l: {r: count to add when reset}}. reset_lrgraph applies only the recorded
+    changes, and _lr_origin is a read-only view of the original graph.
+
+    Sorted neighbor lists of get_r and get_l are cached, and the lists of
+    changed l and r are removed from the cache. Ties of count are sorted by
+    string, because reset_lrgraph does not keep the insertion order of pairs.
+    """
 
     def __init__(self, lrgraph=None, sents=None, l_max_length=10, r_max_length=9):
 
@@ -333,8 +900,32 @@ class LRGraph:
         else:
             self._lr, self._rl = {}, {}
 
-        self._lr_origin = {l:{r:c for r,c in rdict.items()}
-                           for l,rdict in self._lr.items()}
+        self._lr_delta = {}
+        self._clear_sorted_cache()
+
+    def _clear_sorted_cache(self):
+        self._sorted_r = {}
+        self._sorted_l = {}
+
+    def _invalidate_sorted_cache(self, l, r):
+        self._sorted_r.pop(l, None)
+        self._sorted_l.pop(r, None)
+
+    @property
+    def _lr_origin(self):
+        if self._lr_delta is None:
+            return None
+        return _LROriginView(self)
+
+    def _record_delta(self, l, r, count):
+        if self._lr_delta is None:
+            return
+        rdict = self._lr_delta.setdefault(l, {})
+        count += rdict.get(r, 0)
+        if count == 0:
+            rdict.pop(r, None)
+        else:
+            rdict[r] = count
 
     def _construct_graph(self, sents):
         lrgraph = defaultdict(lambda: defaultdict(int))
@@ -372,18 +963,38 @@ class LRGraph:
         return lrgraph, rlgraph
 
     def reset_lrgraph(self):
-        if not self._lr_origin:
+        if not self._lr_delta:
             return None
 
-        self._lr, self._rl = self._check_lrgraph(
-            {l:{r:c for r,c in rdict.items()}
-             for l, rdict in self._lr_origin.items()}
-        )
+        # it costs O(number of changed pairs)
+        for l, delta in self._lr_delta.items():
+            for r, count in delta.items():
+                self._invalidate_sorted_cache(l, r)
+                rdict = self._lr.setdefault(l, {})
+                count += rdict.get(r, 0)
+                if count > 0:
+                    rdict[r] = count
+                else:
+                    rdict.pop(r, None)
+                if not rdict:
+                    self._lr.pop(l)
+                if not r:
+                    continue
+                ldict = self._rl.setdefault(r, {})
+                if count > 0:
+                    ldict[l] = count
+                else:
+                    ldict.pop(l, None)
+                if not ldict:
+                    self._rl.pop(r)
+        self._lr_delta = {}
 
     def add_lr_pair(self, l, r, count=1):
         self._lr[l][r] += count
         if r:
             self._rl[r][l] += count
+        self._record_delta(l, r, -count)
+        self._invalidate_sorted_cache(l, r)
 
     def add_eojeol(self, eojeol, count=1):
         for i in range(1, len(eojeol) + 1):
@@ -394,6 +1005,8 @@ class LRGraph:
         if l in self._lr:
             rdict = self._lr[l]
             if r in rdict:
+                self._record_delta(l, r, min(count, rdict[r]))
+                self._invalidate_sorted_cache(l, r)
                 rdict[r] -= count
                 if rdict[r] <= 0:
                     rdict.pop(r)
@@ -414,24 +1027,26 @@ class LRGraph:
             self.remove_lr_pair(l, r, count)
 
     def get_r(self, l, topk=10):
-        rlist = sorted(self._lr.get(l, {}).items(), key=lambda x:-x[1])
-        if topk > 0:
-            rlist = rlist[:topk]
-        return rlist
+        rlist = self._sorted_r.get(l)
+        if rlist is None:
+            rlist = sorted(self._lr.get(l, {}).items(), key=lambda x:(-x[1], x[0]))
+            self._sorted_r[l] = rlist
+        return rlist[:topk] if topk > 0 else rlist[:]
 
     def get_l(self, r, topk=10):
-        llist = sorted(self._rl.get(r, {}).items(), key=lambda x:-x[1])
-        if topk > 0:
-            llist = llist[:topk]
-        return llist
+        llist = self._sorted_l.get(r)
+        if llist is None:
+            llist = sorted(self._rl.get(r, {}).items(), key=lambda x:(-x[1], x[0]))
+            self._sorted_l[r] = llist
+        return llist[:topk] if topk > 0 else llist[:]
 
     def freeze(self):
-        """Remove self._lr_origin. Be careful.
+        """Remove self._lr_delta. Be careful.
         When you excute freeze, you cannot reset_lrgraph anynore."""
-        self._lr_origin = None
+        self._lr_delta = None
 
     def copy_compatified_lrgraph_origin(self):
-        """It returns original LRGraph which has no self._lr_origin"""
+        """It returns new LRGraph of which graph is the original graph of this"""
         lr_graph = LRGraph(
             l_max_length = self.l_max_length,
             r_max_length = self.r_max_length)
@@ -452,17 +1067,85 @@ class LRGraph:
         eojeol_counter._count_sum = sum(counter.values())
         return eojeol_counter
 
-    def save(self, path):
-        dirname = os.path.dirname(path)
-        if dirname and not os.path.exists(dirname):
-            os.makedirs(dirname)
+    def save(self, path, binary=False):
+        """
+        :param path: str
+            File path
+        :param binary: Boolean
+            If True, it saves the original graph as NumPy npz format with
+            string tables of L and R, and CSR arrays of (L, R) counts.
+            Else, it saves 'l r count' text lines
+        """
+        _prepare_dir(path)
+        if binary:
+            self._save_binary(path)
+            return None
         with open(path, 'w', encoding='utf-8') as f:
             for l, rdict in sorted(self._lr_origin.items()):
                 for r, c in sorted(rdict.items()):
                     f.write('{} {} {}\n'.format(l, r, c))
 
+    def _save_binary(self, path):
+        l_list, r_to_idx = [], {}
+        l_indptr, r_ids, counts = [0], [], []
+        for l, rdict in self._lr_origin.items():
+            l_list.append(l)
+            for r, count in rdict.items():
+                idx = r_to_idx.get(r, -1)
+                if idx < 0:
+                    idx = r_to_idx[r] = len(r_to_idx)
+                r_ids.append(idx)
+                counts.append(count)
+            l_indptr.append(len(r_ids))
+        self._write_binary(path, l_list, sorted(r_to_idx, key=r_to_idx.get),
+            l_indptr, r_ids, counts)
+
+    def _write_binary(self, path, l_list, r_list, l_indptr, r_ids, counts):
+        with open(path, 'wb') as f:
+            np.savez(f,
+                l_strings = _encode_strings(l_list),
+                r_strings = _encode_strings(r_list),
+                l_indptr = np.asarray(l_indptr, dtype=np.int64),
+                r_ids = np.asarray(r_ids, dtype=np.int32),
+                counts = np.asarray(counts, dtype=np.int64),
+                max_length = np.asarray([self.l_max_length, self.r_max_length]))
+
+    def _read_binary(self, path):
+        """It returns (l_list, r_list, l_indptr, r_ids, counts)"""
+        with np.load(path) as data:
+            l_indptr = data['l_indptr']
+            r_ids = data['r_ids']
+            counts = data['counts']
+            l_list = _decode_strings(data['l_strings'], len(l_indptr) - 1)
+            r_list = _decode_strings(data['r_strings'], int(r_ids.max()) + 1 if len(r_ids) else 0)
+            self.l_max_length, self.r_max_length = data['max_length'].tolist()
+        return l_list, r_list, l_indptr, r_ids, counts
+
+    def _load_binary(self, path):
+        l_list, r_list, l_indptr, r_ids, counts = self._read_binary(path)
+        lr = {}
+        rl = defaultdict(dict)
+        r_ids, counts = r_ids.tolist(), counts.tolist()
+        for i, l in enumerate(l_list):
+            b, e = l_indptr[i], l_indptr[i+1]
+            rdict = {r_list[idx]:count for idx, count in zip(r_ids[b:e], counts[b:e])}
+            lr[l] = rdict
+        # build reverse graph directly with the same insertion order of _check_lrgraph
+        for l, rdict in lr.items():
+            for r, count in rdict.items():
+                if r:
+                    rl[r][l] = count
+        self._lr, self._rl = lr, dict(rl)
+        self._lr_delta = {}
+        self._clear_sorted_cache()
+
     def load(self, path):
-        self._lr_origin = {}
+        """It loads text or binary file. The format is detected automatically"""
+        if _is_binary_file(path):
+            self._load_binary(path)
+            return None
+
+        lr = {}
         with open(path, encoding='utf-8') as f:
             l = ''
             rdict = {}
@@ -470,7 +1153,7 @@ class LRGraph:
                 sep = line.split()
                 if not (sep[0] == l):
                     if rdict:
-                        self._lr_origin[l] = rdict
+                        lr[l] = rdict
                         rdict = {}
                 l = sep[0]
                 if len(sep) == 2:
@@ -480,7 +1163,7 @@ class LRGraph:
                 else:
                     raise ValueError('Wrong lr-graph format: {}'.format(line))
             if rdict:
-                self._lr_origin[l] = rdict
-        self._lr, self._rl = self._check_lrgraph(
-            {l:{r:c for r,c in rdict.items()}
-             for l,rdict in self._lr_origin.items()})
+                lr[l] = rdict
+        self._lr, self._rl = self._check_lrgraph(lr)
+        self._lr_delta = {}
+        self._clear_sorted_cache()
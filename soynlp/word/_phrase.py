@@ -1,17 +1,20 @@
 from collections import namedtuple
 from math import log
+from soynlp.utils import check_instrument
 
 NgramScore = namedtuple('NgramScore', 'frequency score')
 
 class Bigram:
     def __init__(self, sentences=None, min_frequency=5, verbose=True, score='frequency',
-        filtering_checkpoint=100000, tokenizer=None, ngram_selector=None):
+        filtering_checkpoint=100000, tokenizer=None, ngram_selector=None, instrument=None):
 
         """
         Attribute:
         ----------
         score : str or functional
             Scoring method. choice in ['frequency', 'pmi', 'mikolov']
+        instrument : soynlp.utils.Instrument
+            It measures 'train' stage and counts 'sents'. Default is no-op instrument
         """
 
         if tokenizer is None:
@@ -26,6 +29,7 @@ class Bigram:
         self.filtering_checkpoint = filtering_checkpoint
         self.tokenizer = tokenizer
         self.ngram_selector = ngram_selector
+        self.instrument = check_instrument(instrument)
         self._counter = None
 
     @property
@@ -33,14 +37,20 @@ class Bigram:
         return self._counter
 
     def train(self, sentences):
+        with self.instrument.stage('train'):
+            self._train(sentences)
+
+    def _train(self, sentences):
 
         def to_bigram(words):
             bigrams = [(w0, w1) for w0, w1 in zip(words, words[1:])]
             return bigrams
 
         self._counter = {}
+        count_sent = self.instrument.count
 
         for i_sent, sent in enumerate(sentences):
+            count_sent('sents')
 
             if self.filtering_checkpoint > 0 and i_sent % self.filtering_checkpoint == 0:
                 self._counter = {bigram:freq for bigram, freq
@@ -1,13 +1,21 @@
 # -*- encoding:utf8 -*-
 
 from collections import defaultdict
+from collections import deque
 from collections import namedtuple
+import json
 import math
+from multiprocessing import cpu_count
+from multiprocessing import Pool
 import numpy as np
+import os
 import pickle
 import sys
 from soynlp.utils import get_process_memory
 from soynlp.utils import check_corpus
+from soynlp.utils import CompactCounter
+from soynlp.utils import HeavyHitterCounter
+from soynlp.utils import check_instrument
 
 Scores = namedtuple('Scores', 'cohesion_forward cohesion_backward left_branching_entropy right_branching_entropy left_accessor_variety right_accessor_variety leftside_frequency rightside_frequency')
 
@@ -21,6 +29,162 @@ def _entropy(dic):
         entropy += prob * math.log(prob)
     return -1 * entropy
 
+def _count_sent(sent, L, R, aL, aR, max_left_length, max_right_length):
+    if sys.version_info.major == 2:
+        words = map(unicode, sent.strip().split())
+    else:
+        words = sent.split()
+
+    for word in words:
+        if (not word) or (len(word) <= 1):
+            continue
+        word_len = len(word)
+        for i in range(1, min(max_left_length + 1, word_len)+1):
+            L[word[:i]] += 1
+        for i in range(1, min(max_right_length + 1, word_len)):
+            R[word[-i:]] += 1
+
+    if len(words) <= 1:
+        return
+    for left_word, word, right_word in zip([words[-1]]+words[:-1], words, words[1:]+[words[0]]):
+        aL['%s %s' % (word, right_word[0])] += 1
+        aR['%s %s' % (left_word[-1], word)] += 1
+
+        word_len = len(word)
+        for i in range(1, min(max_right_length + 1, word_len)):
+            aL['%s %s' % (word[-i:], right_word[0])] += 1
+        for i in range(1, min(max_left_length + 1, word_len)):
+            aR['%s %s' % (left_word[-1], word[:i])] += 1
+
+def _count_shard(args):
+    """Count L, R, aL, aR of a shard of sentences. It is executed in worker process"""
+    sents, max_left_length, max_right_length = args
+    L, R, aL, aR = defaultdict(int), defaultdict(int), defaultdict(int), defaultdict(int)
+    for sent in sents:
+        _count_sent(sent, L, R, aL, aR, max_left_length, max_right_length)
+    return dict(L), dict(R), dict(aL), dict(aR)
+
+def _segment_entropy(counts, indptr):
+    """Entropy of each segment counts[indptr[i]:indptr[i+1]]. All segments must not be empty"""
+    counts = np.asarray(counts, dtype=np.float64)
+    lengths = np.diff(indptr)
+    if lengths.shape[0] == 0:
+        return np.zeros(0, dtype=np.float64)
+    sums = np.add.reduceat(counts, indptr[:-1])
+    probs = counts / np.repeat(sums, lengths)
+    return -1 * np.add.reduceat(probs * np.log(probs), indptr[:-1])
+
+def _merge_lr_table(table_l, table_r):
+    table = {word:(v, table_r.get(word, 0)) for word, v in table_l.items()}
+    for word, v in table_r.items():
+        if word in table_l: continue
+        table[word] = (0, v)
+    return table
+
+class _ExtensionIndex:
+    """CSR-style index of extensions grouped by root word.
+
+    For left-side extensions, root of R subword 'cw' is 'w' and
+    root of aR subword 'c w' is 'w'. For right-side extensions,
+    root of L subword 'wc' is 'w' and root of aL subword 'w c' is 'w'.
+
+    Extensions are not stored as str. Each extension of roots[i] is the root
+    and a character, and the code points of the characters are
+    chars[indptr[i]:indptr[i+1]]. is_a marks the extensions from aR (aL) and
+    their frequencies are counts[indptr[i]:indptr[i+1]]
+    """
+
+    def __init__(self, counter, counter_a, left):
+        self.left = left
+        # extensions inserted by WordExtractor.update after building
+        self.appended = {}
+        self.is_stale = False
+
+        root_to_idx = {}
+        root_ids, chars, is_a, counts = [], [], [], []
+        for begin, counter_ in [(1, counter), (2, counter_a)]:
+            for ext, count in counter_.items():
+                root = ext[begin:] if left else ext[:-begin]
+                if not root:
+                    continue
+                idx = root_to_idx.get(root, -1)
+                if idx == -1:
+                    idx = len(root_to_idx)
+                    root_to_idx[root] = idx
+                root_ids.append(idx)
+                chars.append(ord(ext[0] if left else ext[-1]))
+                is_a.append(begin == 2)
+                counts.append(count)
+
+        root_ids = np.asarray(root_ids, dtype=np.int64)
+        order = np.argsort(root_ids, kind='stable')
+        indptr = np.zeros(len(root_to_idx) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(root_ids, minlength=len(root_to_idx)), out=indptr[1:])
+
+        self.roots = list(root_to_idx)
+        self.root_to_idx = root_to_idx
+        self.root_lengths = np.asarray([len(root) for root in self.roots], dtype=np.int64)
+        self.indptr = indptr
+        self.chars = np.asarray(chars, dtype=np.int32)[order]
+        self.is_a = np.asarray(is_a, dtype=np.bool_)[order]
+        self.counts = np.asarray(counts, dtype=np.int64)[order]
+
+    def extensions(self, idx):
+        """It returns the extensions of roots[idx] as list of str"""
+        root, b, e = self.roots[idx], self.indptr[idx], self.indptr[idx+1]
+        chars, is_a = self.chars[b:e].tolist(), self.is_a[b:e].tolist()
+        if self.left:
+            return [chr(c) + ' ' + root if a else chr(c) + root for c, a in zip(chars, is_a)]
+        return [root + ' ' + chr(c) if a else root + chr(c) for c, a in zip(chars, is_a)]
+
+    def get(self, root, counter, counter_a):
+        """It returns {extension: frequency} of root.
+        If the index is stale, frequencies are read from counter and counter_a"""
+        idx = self.root_to_idx.get(root, -1)
+        if idx == -1:
+            extensions, counts = [], []
+        else:
+            extensions = self.extensions(idx)
+            counts = self.counts[self.indptr[idx]:self.indptr[idx+1]].tolist()
+        if not self.is_stale:
+            return dict(zip(extensions, counts))
+        extensions = extensions + self.appended.get(root, [])
+        return {ext:(counter_a[ext] if ' ' in ext else counter[ext]) for ext in extensions}
+
+    def append(self, ext, is_a):
+        """It appends a new extension. Frequencies in the index become stale"""
+        begin = 2 if is_a else 1
+        root = ext[begin:] if self.left else ext[:-begin]
+        if not root:
+            return
+        self.appended.setdefault(root, []).append(ext)
+        self.is_stale = True
+
+    def mark_stale(self):
+        self.is_stale = True
+
+def _as_defaultdict(counter):
+    if isinstance(counter, CompactCounter):
+        counter = counter.items()
+    return defaultdict(int, counter)
+
+def _get_counts(counter, keys):
+    """It returns numpy.ndarray of counts of keys. CompactCounter looks up
+    all keys at once, and missing keys are 0"""
+    if isinstance(counter, CompactCounter):
+        return counter.get_counts(keys)
+    return np.fromiter((counter.get(key, 0) for key in keys), dtype=np.int64, count=len(keys))
+
+def _split_into_shards(sents, shard_size):
+    shard = []
+    for sent in sents:
+        shard.append(sent)
+        if len(shard) >= shard_size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
 
 class WordExtractor:
     
@@ -30,7 +194,12 @@ class WordExtractor:
                 max_droprate_cohesion=0.98, max_droprate_leftside_frequency=0.98,
                 min_left_branching_entropy=0.0, min_right_branching_entropy=0.0,
                 min_left_accessor_variety=0, min_right_accessor_variety=0,
-                remove_subwords=False):
+                remove_subwords=False, compact_counter=False, instrument=None):
+        """
+        :param instrument: soynlp.utils.Instrument
+            It measures 'train', 'update' and 'word_scores' stages and counts
+            'sents' and 'words'. Default is no-op instrument
+        """
         self.max_left_length = max_left_length
         self.max_right_length = max_right_length
         self.min_frequency = min_frequency
@@ -49,12 +218,43 @@ class WordExtractor:
         self.min_left_accessor_variety = min_left_accessor_variety
         self.min_right_accessor_variety = min_right_accessor_variety
         self.remove_subwords = remove_subwords
+        self.compact_counter = compact_counter
+        self.counting_error_bounds = None
+        self.instrument = check_instrument(instrument)
+        self._reset_cache()
         
         if sents:
             self.train(sents)
         
-    def train(self, sents, num_for_pruning = 0, cumulate=True):
+    def train(self, sents, num_for_pruning = 0, cumulate=True, n_jobs=1, shard_size=100000,
+        memory_budget=0):
+        """
+        :param sents: iterable of str or DoublespaceLineCorpus
+        :param num_for_pruning: int
+            L and R are pruned with min_frequency at every num_for_pruning sentences.
+            When n_jobs > 1, the merged counters are pruned at the first shard
+            boundary after every num_for_pruning sentences
+        :param cumulate: Boolean
+            If True, it adds counts to previously trained L, R, aL, aR
+        :param n_jobs: int
+            Number of worker processes. If n_jobs > 1, sentences are split into
+            shards of shard_size sentences, each shard is counted in a worker process,
+            and the partial counters are merged in order. At most 2 * n_jobs shards
+            are read ahead of merging. With num_for_pruning = 0, the merged counters
+            are pruned only at the end, so the scores are same with serial training.
+            If n_jobs = -1, it uses all cores.
+        :param shard_size: int
+            Number of sentences in a shard. Used only when n_jobs > 1
+        :param memory_budget: float
+            If memory_budget > 0, L, R, aL, aR are counted approximately with
+            bounded memory (Mb) by Count-Min sketch and heavy hitter tables.
+            Counts of each chunk of num_for_pruning sentences (default 10000)
+            are flushed to the tables. The counts are overestimated at most by
+            counting_error_bounds[name][0] with probability counting_error_bounds[name][1].
+            It is serial, and n_jobs is ignored.
+        """
         check_corpus(sents)
+        self._reset_cache()
 
         def prune_extreme_case():
             self.L = defaultdict(lambda: 0, {w:f for w,f in self.L.items() if f >= self.min_frequency})
@@ -64,56 +264,246 @@ class WordExtractor:
             self._aR = defaultdict(lambda: 0, {w:f for w,f in self._aR.items() if f > 1})
 
         if cumulate:
-            self.L = defaultdict(int, self.L)
-            self.R = defaultdict(int, self.R)
-            self._aL = defaultdict(int, self._aL)
-            self._aR = defaultdict(int, self._aR)
+            self.L = _as_defaultdict(self.L)
+            self.R = _as_defaultdict(self.R)
+            self._aL = _as_defaultdict(self._aL)
+            self._aR = _as_defaultdict(self._aR)
         else:
             self.L = defaultdict(int)
             self.R = defaultdict(int)
             self._aL = defaultdict(int)
             self._aR = defaultdict(int)
 
-        for num_sent, sent in enumerate(sents):
-            if sys.version_info.major == 2:
-                words = map(unicode, sent.strip().split())
+        if n_jobs == -1:
+            n_jobs = cpu_count()
+
+        with self.instrument.stage('train'):
+            if memory_budget > 0:
+                self._train_approximately(sents, memory_budget,
+                    num_for_pruning if num_for_pruning > 0 else 10000)
+            elif n_jobs > 1:
+                self._train_parallel(sents, n_jobs, shard_size,
+                    num_for_pruning, prune_extreme_case)
             else:
-                words = sent.split()
+                count_sents = self.instrument.count
+                for num_sent, sent in enumerate(sents):
+                    count_sents('sents')
+                    _count_sent(sent, self.L, self.R, self._aL, self._aR,
+                        self.max_left_length, self.max_right_length)
+
+                    if (num_for_pruning > 0) and ( num_sent % num_for_pruning == 0):
+                        prune_extreme_case()
+                    if (self.verbose > 0) and ( num_sent % self.verbose == 0):
+                        sys.stdout.write('\rtraining ... (%d in %d sents) use memory %.3f Gb' % (num_sent, len(sents), get_process_memory()))
+
+            prune_extreme_case()
+            prune_extreme_case_a()
+            self.L = dict(self.L)
+            self.R = dict(self.R)
+            self._aL = dict(self._aL)
+            self._aR = dict(self._aR)
+            if self.compact_counter:
+                self.compact()
+            if (self.verbose > 0):
+                print('\rtraining was done. used memory %.3f Gb' % (get_process_memory()))
+
+    def compact(self):
+        """It converts L, R, aL, aR to CompactCounter.
+        CompactCounter stores substrings in a sorted string table and counts
+        in NumPy arrays, so it uses a small fraction of memory of dict.
+        It is executed after training, so the peak memory of training is
+        not reduced. Use memory_budget of train to bound it"""
+        self.L = CompactCounter(self.L)
+        self.R = CompactCounter(self.R)
+        self._aL = CompactCounter(self._aL)
+        self._aR = CompactCounter(self._aR)
+
+    def _reset_cache(self):
+        self._extension_index = None
+        self._word_scores = None
+        self._dirty_words = set()
+        self._dirty_first_chars = set()
+        self._dirty_last_chars = set()
+        # counts of subwords which are less than min count in update.
+        # train and load discard them as pruning does
+        self._pending = {'L': {}, 'R': {}, 'aL': {}, 'aR': {}}
+        self._num_pending_sents = 0
+
+    def update(self, sents, num_for_pruning=100000):
+        """Add a batch of sentences to the trained counters.
+
+        Counts of subwords less than min_frequency (2 for aL and aR) are
+        kept as pending counts, and a subword is inserted to the counters when
+        its cumulated count reaches the threshold. Pending counts are discarded
+        at every num_for_pruning updated sentences, as train prunes L and R,
+        and train or load also discards them.
+
+        Starting from an empty WordExtractor, update(a); update(b) gives
+        the same counters with train(a + b) if len(a + b) < num_for_pruning.
+        After train(a), the counts less than min_frequency in a are already
+        pruned, so train(a); update(b) may be different with train(a + b).
+
+        Only the words affected by the batch are marked as dirty.
+        Then word_scores() recomputes cohesion, branching entropy and
+        accessor variety of the dirty words and reuses the others.
 
-            for word in words:
-                if (not word) or (len(word) <= 1):
+        :param sents: list of str
+            A batch of sentences
+        :param num_for_pruning: int
+            Pending counts are discarded when the number of sentences given to update
+            since the last discarding reaches num_for_pruning. If 0, they are never discarded
+        """
+        with self.instrument.stage('update'):
+            self._update(sents, num_for_pruning)
+
+    def _update(self, sents, num_for_pruning):
+        self.instrument.count('sents', len(sents))
+        L, R, aL, aR = _count_shard((sents, self.max_left_length, self.max_right_length))
+
+        # incremental update works with dict counters
+        if isinstance(self.L, CompactCounter):
+            self.L, self.R = self.L.to_dict(), self.R.to_dict()
+            self._aL, self._aR = self._aL.to_dict(), self._aR.to_dict()
+
+        def add(counter, pending, batch, min_count):
+            # the counts of existing subwords only increase,
+            # so only the new subwords have to be pruned
+            updated, inserted = [], []
+            for w, f in batch.items():
+                if w in counter:
+                    counter[w] += f
+                    updated.append(w)
                     continue
-                word_len = len(word)
-                for i in range(1, min(self.max_left_length + 1, word_len)+1):
-                    self.L[word[:i]] += 1
-                for i in range(1, min(self.max_right_length + 1, word_len)):
-                    self.R[word[-i:]] += 1
+                count = pending.pop(w, 0) + f
+                if count < min_count:
+                    pending[w] = count
+                    continue
+                counter[w] = count
+                updated.append(w)
+                inserted.append(w)
+            return updated, inserted
 
-            if len(words) <= 1:
-                continue
-            for left_word, word, right_word in zip([words[-1]]+words[:-1], words, words[1:]+[words[0]]):
-                self._aL['%s %s' % (word, right_word[0])] += 1
-                self._aR['%s %s' % (left_word[-1], word)] += 1
-
-                word_len = len(word)
-                for i in range(1, min(self.max_right_length + 1, word_len)):
-                    self._aL['%s %s' % (word[-i:], right_word[0])] += 1
-                for i in range(1, min(self.max_left_length + 1, word_len)):
-                    self._aR['%s %s' % (left_word[-1], word[:i])] += 1
-
-            if (num_for_pruning > 0) and ( num_sent % num_for_pruning == 0):
-                prune_extreme_case()
+        pending = self._pending
+        L_updated, L_inserted = add(self.L, pending['L'], L, self.min_frequency)
+        R_updated, R_inserted = add(self.R, pending['R'], R, self.min_frequency)
+        aL_updated, aL_inserted = add(self._aL, pending['aL'], aL, 2)
+        aR_updated, aR_inserted = add(self._aR, pending['aR'], aR, 2)
+        del L, R, aL, aR
+
+        self._num_pending_sents += len(sents)
+        if (num_for_pruning > 0) and (self._num_pending_sents >= num_for_pruning):
+            for pending_ in pending.values():
+                pending_.clear()
+            self._num_pending_sents = 0
+
+        dirty = self._dirty_words
+        for w in L_updated:
+            dirty.add(w)
+            if len(w) == 1:
+                self._dirty_first_chars.add(w)
+            else:
+                dirty.add(w[:-1])
+        for w in R_updated:
+            dirty.add(w)
+            if len(w) == 1:
+                self._dirty_last_chars.add(w)
+            else:
+                dirty.add(w[1:])
+        dirty.update(w[:-2] for w in aL_updated)
+        dirty.update(w[2:] for w in aR_updated)
+
+        if self._extension_index is not None:
+            left_index, right_index = self._extension_index
+            left_index.mark_stale()
+            right_index.mark_stale()
+            for w in R_inserted:
+                left_index.append(w, False)
+            for w in aR_inserted:
+                left_index.append(w, True)
+            for w in L_inserted:
+                right_index.append(w, False)
+            for w in aL_inserted:
+                right_index.append(w, True)
+
+        if self.verbose > 0:
+            print('\rupdated with %d sents. %d words are dirty' % (len(sents), len(dirty)))
+
+    def _train_approximately(self, sents, memory_budget, chunk_size):
+        names = ['L', 'R', 'aL', 'aR']
+        heavy_hitters = [HeavyHitterCounter.from_memory_budget(memory_budget / 4)
+                         for _ in names]
+        # counters are used as buffer of a chunk. cumulated counts are flushed first
+        buffers = [self.L, self.R, self._aL, self._aR]
+
+        def flush():
+            for counter, buffer in zip(heavy_hitters, buffers):
+                counter.update(buffer)
+                buffer.clear()
+
+        count_sents = self.instrument.count
+        for num_sent, sent in enumerate(sents):
+            count_sents('sents')
+            _count_sent(sent, self.L, self.R, self._aL, self._aR,
+                self.max_left_length, self.max_right_length)
+            if num_sent % chunk_size == chunk_size - 1:
+                flush()
             if (self.verbose > 0) and ( num_sent % self.verbose == 0):
                 sys.stdout.write('\rtraining ... (%d in %d sents) use memory %.3f Gb' % (num_sent, len(sents), get_process_memory()))
+        flush()
 
-        prune_extreme_case()
-        prune_extreme_case_a()
-        if (self.verbose > 0):
-            print('\rtraining was done. used memory %.3f Gb' % (get_process_memory()))
-        self.L = dict(self.L)
-        self.R = dict(self.R)
-        self._aL = dict(self._aL)
-        self._aR = dict(self._aR)
+        self.L, self.R, self._aL, self._aR = [
+            defaultdict(int, counter.items()) for counter in heavy_hitters]
+        self.counting_error_bounds = {name:(counter.error_bound, counter.confidence)
+            for name, counter in zip(names, heavy_hitters)}
+        if self.verbose > 0:
+            for name, (bound, confidence) in self.counting_error_bounds.items():
+                print('\rerror bound of %s = %.1f with prob %.3f' % (name, bound, confidence))
+
+    def _train_parallel(self, sents, n_jobs, shard_size, num_for_pruning, prune):
+        def merge(counter, partial):
+            for w, f in partial.items():
+                counter[w] += f
+
+        num_sent = 0
+        checkpoint = num_for_pruning
+
+        def merge_shard(num_sents_of_shard, result):
+            nonlocal num_sent, checkpoint
+            # merge in corpus order. Then the insertion order of merged counters
+            # is same with serial training, and so are the scores
+            L, R, aL, aR = result.get()
+            merge(self.L, L)
+            merge(self.R, R)
+            merge(self._aL, aL)
+            merge(self._aR, aR)
+            del L, R, aL, aR
+            self.instrument.count('shards')
+            num_sent += num_sents_of_shard
+            if (num_for_pruning > 0) and (num_sent >= checkpoint):
+                prune()
+                checkpoint = (num_sent // num_for_pruning + 1) * num_for_pruning
+            if self.verbose > 0:
+                sys.stdout.write('\rtraining ... (%d in %d sents) use memory %.3f Gb' % (
+                    num_sent, len(sents), get_process_memory()))
+
+        # Pool.imap reads all shards at once. At most 2 * n_jobs shards
+        # are read ahead of the merged shards
+        max_pending = 2 * n_jobs
+        pending = deque()
+        pool = Pool(n_jobs)
+        try:
+            for shard in _split_into_shards(sents, shard_size):
+                args = (shard, self.max_left_length, self.max_right_length)
+                pending.append((len(shard), pool.apply_async(_count_shard, (args,))))
+                del shard, args
+                if len(pending) >= max_pending:
+                    merge_shard(*pending.popleft())
+            while pending:
+                merge_shard(*pending.popleft())
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
 
     def extract(self, scores=None):
         if not scores:
@@ -140,27 +530,96 @@ class WordExtractor:
         return scores_
     
     def word_scores(self):
+        with self.instrument.stage('word_scores'):
+            scores = self._compute_word_scores()
+            self.instrument.count('words', len(scores))
+        return scores
+
+    def _compute_word_scores(self):
+        if self._word_scores is not None:
+            return self._update_word_scores()
+
         cps = self.all_cohesion_scores()
-        bes = self.all_branching_entropy()
-        avs = self.all_accessor_variety()
+        bes, avs = self._all_branching_scores()
         scores = {}
-        for word in self.words():
+        words = list(self.words())
+        l_freqs = _get_counts(self.L, words).tolist()
+        r_freqs = _get_counts(self.R, words).tolist()
+        for word, l_freq, r_freq in zip(words, l_freqs, r_freqs):
             cp = cps.get(word, (0, 0))
             be = bes.get(word, (0, 0))
             av = avs.get(word, (0, 0))
-            scores[word] = Scores(cp[0], cp[1], be[0], be[1], av[0], av[1], self.L.get(word, 0), self.R.get(word, 0))
-        return scores
+            scores[word] = Scores(cp[0], cp[1], be[0], be[1], av[0], av[1], l_freq, r_freq)
+
+        # cache scores for incremental update
+        self._word_scores = scores
+        self._dirty_words = set()
+        self._dirty_first_chars = set()
+        self._dirty_last_chars = set()
+        return dict(scores)
+
+    def _update_word_scores(self):
+        scores = self._word_scores
+        left_index, right_index = self._extension_indices()
+
+        def is_word(word):
+            return ((len(word) <= self.max_left_length and word in self.L) or
+                    (len(word) <= self.max_right_length and word in self.R))
+
+        def get_scores(index, word, max_length, counter, counter_a):
+            # same with _all_branching_scores, only roots shorter than max_length
+            if len(word) >= max_length:
+                return 0, 0
+            extension_frequency = index.get(word, counter, counter_a)
+            if not extension_frequency:
+                return 0, 0
+            return _entropy(extension_frequency), len(extension_frequency)
+
+        words = {word for word in self._dirty_words if is_word(word)}
+        for word in words:
+            cp = self.cohesion_score(word)
+            be_l, av_l = get_scores(left_index, word, self.max_right_length, self.R, self._aR)
+            be_r, av_r = get_scores(right_index, word, self.max_left_length, self.L, self._aL)
+            scores[word] = Scores(cp[0], cp[1], be_l, be_r, av_l, av_r, self.L.get(word, 0), self.R.get(word, 0))
+
+        # cohesion is normalized by the frequency of first (last) character
+        first_chars, last_chars = self._dirty_first_chars, self._dirty_last_chars
+        if first_chars or last_chars:
+            for word, score in scores.items():
+                if (word in words) or not (word[0] in first_chars or word[-1] in last_chars):
+                    continue
+                cp = self.cohesion_score(word)
+                scores[word] = score._replace(cohesion_forward=cp[0], cohesion_backward=cp[1])
+
+        if self.verbose > 0:
+            print('\rscores of %d dirty words were updated' % len(words))
+
+        self._dirty_words = set()
+        self._dirty_first_chars = set()
+        self._dirty_last_chars = set()
+        return dict(scores)
     
     def all_cohesion_scores(self):
-        cps = {}
-        words = self.words()
-        for i, word in enumerate(words):
-            if (self.verbose > 0) and (i % self.verbose == 0):
-                sys.stdout.write('\r cohesion probabilities ... (%d in %d)' % (i+1, len(words)))
-            cp = self.cohesion_score(word)
-            if (cp[0] == 0) and (cp[1] == 0):
-                continue
-            cps[word] = cp
+        # same with cohesion_score of each word, but the frequencies
+        # of all words are looked up at once
+        words = [word for word in self.words() if len(word) > 1]
+        lengths = np.asarray([len(word) for word in words], dtype=np.int64)
+
+        def get_cohesions(counter, words, chars):
+            freqs = _get_counts(counter, words).astype(np.float64)
+            char_freqs = _get_counts(counter, chars).astype(np.float64)
+            cohesions = np.zeros(len(words), dtype=np.float64)
+            # numpy.power with an array of exponents may differ from
+            # cohesion_score in the last digit, so exponent is a scalar
+            for length in np.unique(lengths).tolist():
+                mask = (lengths == length) & (freqs > 0)
+                cohesions[mask] = np.power(freqs[mask] / char_freqs[mask], 1 / (length - 1))
+            return cohesions.tolist()
+
+        l_cohesions = get_cohesions(self.L, words, [word[0] for word in words])
+        r_cohesions = get_cohesions(self.R, words, [word[-1] for word in words])
+        cps = {word:cp for word, cp in zip(words, zip(l_cohesions, r_cohesions))
+               if (cp[0] != 0) or (cp[1] != 0)}
         if (self.verbose > 0):
             print('\rall cohesion probabilities was computed. # words = %d' % len(cps))
         return cps
@@ -178,51 +637,83 @@ class WordExtractor:
         return (self.L.get(word, 0), self.R.get(word, 0))
     
     def all_branching_entropy(self, get_score=_entropy):
-        def parse_left(extension):
-            return extension[:-1]
-        def parse_right(extension):
-            return extension[1:]
-        def sort_by_length(counter):
-            sorted_by_length = defaultdict(lambda: [])
-            for w in counter.keys():
-                sorted_by_length[len(w)].append(w)
-            return sorted_by_length
-        def get_entropy_table(parse, sorted_by_length, sorted_by_length_a, max_length, counter, counter_a):
-            num_sum = sum((len(words) for length, words in sorted_by_length.items()))
-            be = {}
-            for word_len in range(2, max_length):
-                words = sorted_by_length.get(word_len, [])
-                extensions = defaultdict(lambda: [])
-                for word in words:
-                    extensions[parse(word)].append(word)
-                words_ = sorted_by_length_a.get(word_len+1, [])
-                for word in words_:
-                    extensions[parse(word.replace(' ',''))].append(word)
-                for root_word, extension_words in extensions.items():
-                    extension_frequency = {ext:counter_a.get(ext) if ' ' in ext else counter.get(ext) for ext in extension_words}
-                    be[root_word] = get_score(extension_frequency)
-            return be
-        def merge(be_l, be_r):
-            be = {word:(v, be_r.get(word, 0)) for word, v in be_l.items()}
-            for word, v in be_r.items():
-                if word in be_l: continue
-                be[word] = (0, v)
+        if get_score == _entropy:
+            be, _ = self._all_branching_scores(compute_accessor_variety=False)
             return be
+        if get_score == len:
+            _, av = self._all_branching_scores(compute_entropy=False)
+            return av
+
+        def get_table(index, max_length):
+            table = {}
+            for idx in np.where(index.root_lengths < max_length)[0]:
+                b, e = index.indptr[idx], index.indptr[idx+1]
+                extension_frequency = {ext:int(freq) for ext, freq in
+                    zip(index.extensions(idx), index.counts[b:e])}
+                table[index.roots[idx]] = get_score(extension_frequency)
+            return table
 
-        be_l = get_entropy_table(parse_right, sort_by_length(self.R), sort_by_length(self._aR), self.max_right_length+1, self.R, self._aR)
-        be_r = get_entropy_table(parse_left, sort_by_length(self.L), sort_by_length(self._aL), self.max_left_length+1, self.L, self._aL)
-        be = merge(be_l, be_r)
+        left_index, right_index = self._extension_indices(fresh=True)
+        be = _merge_lr_table(
+            get_table(left_index, self.max_right_length),
+            get_table(right_index, self.max_left_length))
         if self.verbose > 0:
-            print_head = 'branching entropies' if get_score == _entropy else 'accessor variety'
-            print('\rall %s was computed # words = %d' % (print_head, len(be)))
+            print('\rall scores was computed # words = %d' % len(be))
         return be
 
+    def _all_branching_scores(self, compute_entropy=True, compute_accessor_variety=True):
+        """It computes left/right branching entropy and accessor variety
+        of all words with one pass over CSR-style extension index.
+
+        Returns
+        -------
+        be : dict
+            {word: (left_branching_entropy, right_branching_entropy)}
+        av : dict
+            {word: (left_accessor_variety, right_accessor_variety)}
+        """
+
+        def get_tables(index, max_length):
+            # only roots shorter than max_length
+            mask = index.root_lengths < max_length
+            roots = [root for root, m in zip(index.roots, mask.tolist()) if m]
+            be, av = {}, {}
+            if compute_entropy:
+                be = dict(zip(roots, _segment_entropy(index.counts, index.indptr)[mask].tolist()))
+            if compute_accessor_variety:
+                av = dict(zip(roots, np.diff(index.indptr)[mask].tolist()))
+            return be, av
+
+        left_index, right_index = self._extension_indices(fresh=True)
+        be_l, av_l = get_tables(left_index, self.max_right_length)
+        be_r, av_r = get_tables(right_index, self.max_left_length)
+        be = _merge_lr_table(be_l, be_r)
+        av = _merge_lr_table(av_l, av_r)
+
+        if self.verbose > 0:
+            if compute_entropy:
+                print('\rall branching entropies was computed # words = %d' % len(be))
+            if compute_accessor_variety:
+                print('\rall accessor variety was computed # words = %d' % len(av))
+        return be, av
+
+    def _extension_indices(self, fresh=False):
+        """It builds the extension indices once after training and reuses them.
+        Then branching_entropy(word) and accessor_variety(word) look up only
+        the extensions of the word instead of scanning all of L, R, aL, aR.
+        If fresh is True, the index that became stale by update is rebuilt"""
+        if (self._extension_index is not None) and fresh and self._extension_index[0].is_stale:
+            self._extension_index = None
+        if self._extension_index is None:
+            left_index = _ExtensionIndex(self.R, self._aR, left=True)
+            right_index = _ExtensionIndex(self.L, self._aL, left=False)
+            self._extension_index = (left_index, right_index)
+        return self._extension_index
+
     def branching_entropy(self, word):
-        word_len = len(word)
-        lsb = { w:f for w,f in self.R.items() if ((len(w) - 1) == word_len) and (w[1:] == word) }
-        lsb.update({ w:f for w,f in self._aR.items() if ((len(w) - 2) == word_len) and (w[2:] == word) })
-        rsb = { w:f for w,f in self.L.items() if ((len(w) - 1) == word_len) and (w[:-1] == word) }
-        rsb.update({ w:f for w,f in self._aL.items() if ((len(w) - 2) == word_len) and (w[:-2] == word) })
+        left_index, right_index = self._extension_indices()
+        lsb = left_index.get(word, self.R, self._aR)
+        rsb = right_index.get(word, self.L, self._aL)
         be_l = 0 if not lsb else _entropy(lsb)
         be_r = 0 if not rsb else _entropy(rsb)
         return (be_l, be_r)
@@ -231,13 +722,9 @@ class WordExtractor:
         return self.all_branching_entropy(get_score=len)
 
     def accessor_variety(self, word):
-        word_len = len(word)
-        lsb = { w:f for w,f in self.R.items() if ((len(w) - 1) == word_len) and (w[1:] == word) }
-        lsb.update({ w:f for w,f in self._aR.items() if ((len(w) - 2) == word_len) and (w[2:] == word) })
-        rsb = { w:f for w,f in self.L.items() if ((len(w) - 1) == word_len) and (w[:-1] == word) }
-        rsb.update({ w:f for w,f in self._aL.items() if ((len(w) - 2) == word_len) and (w[:-2] == word) })
-        av_l = 0 if lsb == False else len(lsb)
-        av_r = 0 if rsb == False else len(rsb)
+        left_index, right_index = self._extension_indices()
+        av_l = len(left_index.get(word, self.R, self._aR))
+        av_r = len(right_index.get(word, self.L, self._aL))
         return (av_l, av_r)
 
     def words(self):
@@ -245,7 +732,15 @@ class WordExtractor:
         words.update({word for word in self.R.keys() if len(word) <= self.max_right_length})
         return words
 
-    def save(self, fname):
+    def save(self, fname, binary=False):
+        """
+        :param fname: str
+            File path of pickle format, or directory path of binary format
+        :param binary: Boolean
+            If True, it saves the model as binary format that can be memory-mapped.
+            The directory has configuration.json and a sorted string table
+            and count arrays for each of L, R, aL, aR.
+        """
         configuration = {
             'max_left_length': self.max_left_length,
             'max_right_length': self.max_right_length,
@@ -259,7 +754,8 @@ class WordExtractor:
             'min_right_branching_entropy': self.min_right_branching_entropy,
             'min_left_accessor_variety': self.min_left_accessor_variety,
             'min_right_accessor_variety': self.min_right_accessor_variety,
-            'remove_subwords': self.remove_subwords
+            'remove_subwords': self.remove_subwords,
+            'compact_counter': self.compact_counter
         }
         data = {
             'L': self.L,
@@ -267,6 +763,11 @@ class WordExtractor:
             'aL': self._aL,
             'aR': self._aR
         }
+
+        if binary:
+            self._save_binary(fname, configuration, data)
+            return None
+
         params = {
             'configuration': configuration,
             'data': data
@@ -274,9 +775,37 @@ class WordExtractor:
         with open(fname, 'wb') as f:
             pickle.dump(params, f)
 
-    def load(self, fname):
-        with open(fname, 'rb') as f:
-            params = pickle.load(f)
+    def _save_binary(self, dirname, configuration, data):
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        with open('%s/configuration.json' % dirname, 'w', encoding='utf-8') as f:
+            json.dump(configuration, f, indent=2)
+        for name, counter in data.items():
+            if not isinstance(counter, CompactCounter):
+                counter = CompactCounter(counter)
+            counter.save('%s/%s' % (dirname, name))
+
+    def load(self, fname, use_mmap=True):
+        """
+        :param fname: str
+            File path of pickle format, or directory path of binary format
+        :param use_mmap: Boolean
+            Used only for binary format. If True, the counters are memory-mapped,
+            so loading is near-instant and many processes share one copy
+            of the counters through the page cache.
+            The loaded counters are CompactCounter.
+        """
+        if os.path.isdir(fname):
+            with open('%s/configuration.json' % fname, encoding='utf-8') as f:
+                configuration = json.load(f)
+            data = {}
+            for name in ['L', 'R', 'aL', 'aR']:
+                data[name] = CompactCounter()
+                data[name].load('%s/%s' % (fname, name), use_mmap)
+            params = {'configuration': configuration, 'data': data}
+        else:
+            with open(fname, 'rb') as f:
+                params = pickle.load(f)
 
         configuration = params['configuration']
         self.max_left_length = configuration['max_left_length']
@@ -293,12 +822,14 @@ class WordExtractor:
         self.min_left_accessor_variety = configuration['min_left_accessor_variety']
         self.min_right_accessor_variety = configuration['min_right_accessor_variety']
         self.remove_subwords = configuration['remove_subwords']
+        self.compact_counter = configuration.get('compact_counter', False)
 
         data = params['data']
         self.L = data['L']
         self.R = data['R']
         self._aL = data['aL']
         self._aR = data['aR']
+        self._reset_cache()
 
         del params
         del configuration
@@ -1,10 +1,23 @@
 # -*- encoding:utf8 -*-
 
 import argparse
+import multiprocessing
 import sys
+from contextlib import contextmanager
 sys.path.append('../')
 import soynlp
 
+@contextmanager
+def spawn_start_method():
+    # spawn is the default start method of macOS and Windows.
+    # Arguments of worker processes are pickled
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+    try:
+        yield multiprocessing.get_context('spawn')
+    finally:
+        multiprocessing.set_start_method(start_method, force=True)
+
 def hangle_test():
     from soynlp.hangle import normalize
     from soynlp.hangle import compose
@@ -68,6 +81,9 @@ def tokenizer_test():
     from soynlp.tokenizer import LTokenizer
     from soynlp.tokenizer import MaxScoreTokenizer
     from soynlp.tokenizer import RegexTokenizer
+    from soynlp.tokenizer import ScoreTrie
+    from soynlp.tokenizer import tokenize_batch
+    import pickle
 
     regex_tokenizer = RegexTokenizer()
     if not (regex_tokenizer.tokenize('아라랄랄111이히힝ㅇㅇㅠㅠ우유우유ab!') 
@@ -86,14 +102,155 @@ def tokenizer_test():
         raise ValueError("ltokenizer.tokenize('데이터는 데이터센터의 데이데이', tolerance=0.05) == {}".format(
             ltokenizer.tokenize('데이터는 데이터센터의 데이데이', tolerance=0.05)))
 
+    for tolerance in [0.0, 0.05]:
+        eojeols = '데이터는 데이터센터의 데이데이 데이터'.split()
+        lr = ltokenizer.token_to_lr_batch(eojeols, tolerance)
+        if not (lr == [tuple(ltokenizer.tokenize(eojeol, tolerance, flatten=False)[0]) for eojeol in eojeols]):
+            raise ValueError('ltokenizer.token_to_lr_batch(tolerance={}) == {}'.format(tolerance, lr))
+
+    for eojeols in [[], ['데이', '는']]:
+        lr = ltokenizer.token_to_lr_batch(eojeols)
+        if not (lr == [(eojeol, '') for eojeol in eojeols]):
+            raise ValueError('ltokenizer.token_to_lr_batch({}) == {}'.format(eojeols, lr))
+
     maxscore_tokenizer = MaxScoreTokenizer({'데이터':0.4, '데이':0.35, '데이터센터':0.38})
     if not (maxscore_tokenizer.tokenize('데이터는 데이터센터의 데이데이') 
             == ['데이터', '는', '데이터', '센터의', '데이', '데이']):
         raise ValueError("maxscore_tokenizer.tokenize('데이터는 데이터센터의 데이데이') == {}".format(
             maxscore_tokenizer.tokenize('데이터는 데이터센터의 데이데이')))
 
+    # long eojeol is not truncated
+    long_eojeol = '데이터센터' * 50
+    if not (maxscore_tokenizer.tokenize(long_eojeol) == ['데이터', '센터'] * 50):
+        raise ValueError("maxscore_tokenizer.tokenize('데이터센터' * 50) == {}".format(
+            maxscore_tokenizer.tokenize(long_eojeol)))
+
+    # tokenizers share a pickled score trie
+    scores = {'데이터':0.4, '데이':0.35, '데이터센터':0.38}
+    trie = pickle.loads(pickle.dumps(ScoreTrie(scores)))
+    if not (dict(trie) == scores):
+        raise ValueError('dict(pickled ScoreTrie) == {}'.format(dict(trie)))
+    if not (LTokenizer(trie).tokenize('데이터는 데이터센터의 데이데이')
+            == ltokenizer.tokenize('데이터는 데이터센터의 데이데이')):
+        raise ValueError('LTokenizer with ScoreTrie is different with LTokenizer with dict')
+    if not (MaxScoreTokenizer(trie).tokenize('데이터는 데이터센터의 데이데이')
+            == maxscore_tokenizer.tokenize('데이터는 데이터센터의 데이데이')):
+        raise ValueError('MaxScoreTokenizer with ScoreTrie is different with MaxScoreTokenizer with dict')
+
+    # words inserted after building are found with the built words
+    trie['데이터베이스'] = 0.3
+    trie['데'] = 0.1
+    del trie['데이터센터']
+    updated_scores = {'데':0.1, '데이':0.35, '데이터':0.4, '데이터베이스':0.3}
+    if not (dict(trie) == updated_scores and dict(pickle.loads(pickle.dumps(trie))) == updated_scores):
+        raise ValueError('dict(updated ScoreTrie) == {}'.format(dict(trie)))
+    if not (trie.matches('데이터베이스의') == [(0, 1, 0.1), (0, 2, 0.35), (0, 3, 0.4), (0, 6, 0.3)]):
+        raise ValueError("updated ScoreTrie.matches('데이터베이스의') == {}".format(trie.matches('데이터베이스의')))
+
+    # eojeol cache
+    cached_tokenizer = MaxScoreTokenizer(scores, cache_size=10)
+    for _ in range(2):
+        if not (cached_tokenizer.tokenize('데이터는 데이터센터의 데이데이')
+                == maxscore_tokenizer.tokenize('데이터는 데이터센터의 데이데이')):
+            raise ValueError('MaxScoreTokenizer(cache_size=10) is different with no cache tokenizer')
+    if not (cached_tokenizer.cache.hits == 3 and cached_tokenizer.cache.misses == 3):
+        raise ValueError('EojeolCache (hits, misses) == {}'.format(
+            (cached_tokenizer.cache.hits, cached_tokenizer.cache.misses)))
+    cached_tokenizer.scores = {'데이터센터':0.5}
+    if not (len(cached_tokenizer.cache) == 0 and cached_tokenizer.tokenize('데이터센터의') == ['데이터센터', '의']):
+        raise ValueError('EojeolCache is not cleared when scores are changed')
+
+    # scores dict is copied, and tokenizer.scores is updated in place
+    for tokenizer in [MaxScoreTokenizer(scores, cache_size=10), LTokenizer(scores, cache_size=10)]:
+        if not (tokenizer.tokenize('데이터센터의') == ['데이터', '센터의']):
+            raise ValueError('{}.tokenize(데이터센터의) == {}'.format(
+                type(tokenizer).__name__, tokenizer.tokenize('데이터센터의')))
+        scores['데이터센터'] = 0.9
+        if not (tokenizer.tokenize('데이터센터의') == ['데이터', '센터의']):
+            raise ValueError('{} uses the changed scores dict'.format(type(tokenizer).__name__))
+        scores['데이터센터'] = 0.38
+        tokenizer.scores['데이터센터'] = 0.9
+        if not (tokenizer.tokenize('데이터센터의') == ['데이터센터', '의']):
+            raise ValueError('{} (or its cache) does not use updated tokenizer.scores'.format(
+                type(tokenizer).__name__))
+
+    # batch tokenization
+    sents = ['데이터는 데이터센터의 데이데이', '데이터센터', '센터의 데이터'] * 10
+    for n_jobs in [1, 2]:
+        tokenized = list(tokenize_batch(maxscore_tokenizer, sents, n_jobs=n_jobs, chunksize=4))
+        if not (tokenized == [maxscore_tokenizer.tokenize(sent) for sent in sents]):
+            raise ValueError('tokenize_batch(n_jobs={}) is different with tokenize'.format(n_jobs))
+    with spawn_start_method():
+        tokenized = list(tokenize_batch(cached_tokenizer, sents, n_jobs=2, chunksize=4))
+    if not (tokenized == [cached_tokenizer.tokenize(sent) for sent in sents]):
+        raise ValueError('tokenize_batch(n_jobs=2) with spawn start method is different with tokenize')
+
+    # at most 2 * n_jobs chunks are read ahead
+    num_read = [0]
+    def read(sents):
+        for sent in sents:
+            num_read[0] += 1
+            yield sent
+    tokenized = tokenize_batch(maxscore_tokenizer, read(sents * 100), n_jobs=2, chunksize=4)
+    next(tokenized)
+    tokenized.close()
+    if not (num_read[0] <= 4 * 4 + 1):
+        raise ValueError('tokenize_batch read {} sents before the first result'.format(num_read[0]))
+
     print('all tokenizer tests have been successed\n')
 
+def corpus_test(corpus_path):
+    print('DoublespaceLineCorpus test')
+    from soynlp import DoublespaceLineCorpus
+    import pickle
+    import soynlp.utils
+
+    missing_names = [name for name in soynlp.utils.__all__ if not hasattr(soynlp.utils, name)]
+    if missing_names:
+        raise ValueError('soynlp.utils.__all__ has undefined names {}'.format(missing_names))
+
+    for iter_sent in [False, True]:
+        corpus = DoublespaceLineCorpus(corpus_path, iter_sent=iter_sent)
+        items = list(corpus)
+        if not (len(corpus) == len(items)):
+            raise ValueError('DoublespaceLineCorpus length is different with the number of items')
+        if not (corpus[0] == items[0] and corpus[-1] == items[-1]):
+            raise ValueError('DoublespaceLineCorpus[i] is different with i-th item')
+        shards = corpus.split(3)
+        if not ([item for shard in shards for item in shard] == items):
+            raise ValueError('DoublespaceLineCorpus.split(3) shards are different with corpus')
+        pickled_shards = [pickle.loads(pickle.dumps(shard)) for shard in shards]
+        if not (all(shard._index is None for shard in pickled_shards) and
+                [item for shard in pickled_shards for item in shard] == items):
+            raise ValueError('pickled shards of DoublespaceLineCorpus.split(3) should not have index of corpus')
+        mmap_corpus = DoublespaceLineCorpus(corpus_path, iter_sent=iter_sent, use_mmap=True)
+        if not (list(mmap_corpus) == items):
+            raise ValueError('DoublespaceLineCorpus(use_mmap=True) is different with text mode')
+        mmap_shards = mmap_corpus.split(3)
+        if not (all(shard.use_mmap for shard in mmap_shards) and
+                [item for shard in mmap_shards for item in shard] == items):
+            raise ValueError('DoublespaceLineCorpus(use_mmap=True).split(3) shards are different with corpus')
+        if not ([item for batch in corpus.iter_batch(100) for item in batch] == items):
+            raise ValueError('DoublespaceLineCorpus.iter_batch(100) is different with corpus')
+    print('num doc = {}, num sent = {}'.format(corpus.num_doc, corpus.num_sent))
+
+    # index is saved next to corpus file only with save_index=True
+    import os
+    import shutil
+    import tempfile
+    with tempfile.TemporaryDirectory() as dirname:
+        corpus_copy = os.path.join(dirname, 'corpus.txt')
+        shutil.copyfile(corpus_path, corpus_copy)
+        corpus = DoublespaceLineCorpus(corpus_copy)
+        len(corpus.split(2))
+        if os.path.exists(corpus.index_fname):
+            raise ValueError('DoublespaceLineCorpus should not write index file by default')
+        corpus = DoublespaceLineCorpus(corpus_copy, save_index=True)
+        len(corpus.split(2))
+        if not os.path.exists(corpus.index_fname):
+            raise ValueError('DoublespaceLineCorpus(save_index=True) should write index file')
+    print('corpus test has been done\n\n')
+
 def word_extractor_test(corpus_path):
     print('WordExtractor test')
     from soynlp import DoublespaceLineCorpus
@@ -108,6 +265,143 @@ def word_extractor_test(corpus_path):
     topwords = sorted(word_scores, key=lambda x: -word_scores[x].cohesion_forward * word_scores[x].leftside_frequency)[:20]
     for word in topwords:
         print('word = {}, cohesion = {}'.format(word, word_scores[word].cohesion_forward))
+
+    parallel_extractor = WordExtractor()
+    parallel_extractor.train(corpus, n_jobs=2, shard_size=200)
+    if not (parallel_extractor.extract() == word_scores):
+        raise ValueError('WordExtractor.train(n_jobs=2) scores are different with serial training')
+    # pruned counts during merging are not larger than the exact counts
+    parallel_extractor.train(corpus, n_jobs=2, shard_size=200, num_for_pruning=400, cumulate=False)
+    if not all(0 < f <= word_extractor.L.get(w, 0) for w, f in parallel_extractor.L.items()):
+        raise ValueError('WordExtractor.train(n_jobs=2, num_for_pruning=400) counts are larger than exact counts')
+
+    # CompactCounter gives the same scores with dict counters.
+    # Branching entropy is summed in different order, so it may differ in the last digit
+    import math
+    compact_extractor = WordExtractor(verbose_points=0, compact_counter=True)
+    compact_extractor.train(corpus)
+    words = list(word_extractor.L) + ['없는단어']
+    if not (compact_extractor.L.get_counts(words).tolist() == [word_extractor.L.get(w, 0) for w in words]):
+        raise ValueError('CompactCounter.get_counts is different with dict.get')
+    if not (compact_extractor.all_cohesion_scores() == word_extractor.all_cohesion_scores()):
+        raise ValueError('WordExtractor cohesion scores with CompactCounter are different with dict')
+    compact_scores = compact_extractor.extract()
+    if not ((compact_scores.keys() == word_scores.keys()) and all(
+        all(math.isclose(a, b, abs_tol=1e-12) for a, b in zip(compact_scores[w], word_scores[w]))
+        for w in word_scores)):
+        raise ValueError('WordExtractor scores with CompactCounter are different with dict')
+
+    # branching entropy and accessor variety of a fixed corpus
+    # right extensions of '아이' are {가:2, 는:1, 의:1}, and left extension is '다 아이' of the previous sentence
+    fixed_extractor = WordExtractor(min_frequency=1, verbose_points=0)
+    fixed_extractor.train(['아이가 밥을 먹었다', '아이는 밥을 먹는다', '아이의 밥은 맛있다',
+                           '어른이 밥을 먹었다', '아이가 국을 먹었다'])
+    expected_scores = {
+        '아이': ((0.0, 1.0397207708399179), (1, 3)),
+        '밥': ((0.0, 0.5623351446188083), (0, 2)),
+        '먹': ((0.0, 0.5623351446188083), (1, 2)),
+        '먹었': ((0.0, 0.0), (1, 1))
+    }
+    be, av = fixed_extractor._all_branching_scores()
+    for word, (expected_be, expected_av) in expected_scores.items():
+        if not (all(math.isclose(a, b, abs_tol=1e-12) for a, b in zip(be[word], expected_be)) and av[word] == expected_av):
+            raise ValueError('WordExtractor branching scores of {} are {}, {}'.format(word, be[word], av[word]))
+
+    # extension index lookups of single word
+    left_index, right_index = fixed_extractor._extension_indices()
+    if not (right_index.get('아이', fixed_extractor.L, fixed_extractor._aL) == {'아이가': 2, '아이는': 1, '아이의': 1}
+            and left_index.get('아이', fixed_extractor.R, fixed_extractor._aR) == {'다 아이': 4}):
+        raise ValueError('WordExtractor extension index of 아이 is wrong')
+    for word, (expected_be, expected_av) in expected_scores.items():
+        if not (all(math.isclose(a, b, abs_tol=1e-12) for a, b in zip(fixed_extractor.branching_entropy(word), expected_be))
+                and fixed_extractor.accessor_variety(word) == expected_av):
+            raise ValueError('WordExtractor.branching_entropy({}) or accessor_variety is wrong'.format(word))
+    # the index becomes stale by update, and frequencies are read from counters
+    fixed_extractor.update(['아이도 밥을 먹었다', '아이도 국을 먹었다'])
+    if not (fixed_extractor.accessor_variety('아이') == (1, 4) and
+            right_index.get('아이', fixed_extractor.L, fixed_extractor._aL)['아이도'] == 2):
+        raise ValueError('WordExtractor extension index is not updated')
+
+    # update(a); update(b) from empty extractor is same with train(a + b)
+    sents = list(DoublespaceLineCorpus(corpus_path, num_doc=1000, iter_sent=True))
+    sents_a, sents_b = sents[:len(sents) // 2], sents[len(sents) // 2:]
+    updated_extractor = WordExtractor(verbose_points=0)
+    updated_extractor.update(sents_a)
+    updated_extractor.word_scores()
+    updated_extractor.update(sents_b)
+    trained_extractor = WordExtractor(verbose_points=0)
+    trained_extractor.train(sents_a + sents_b)
+    for name in ['L', 'R', '_aL', '_aR']:
+        if not (getattr(updated_extractor, name) == getattr(trained_extractor, name)):
+            raise ValueError('WordExtractor.update {} is different with train(a + b)'.format(name))
+    updated_scores = updated_extractor.word_scores()
+    trained_scores = trained_extractor.word_scores()
+    if not ((updated_scores.keys() == trained_scores.keys()) and all(
+        all(math.isclose(a, b, abs_tol=1e-12) for a, b in zip(updated_scores[w], trained_scores[w]))
+        for w in trained_scores)):
+        raise ValueError('WordExtractor.update scores are different with train(a + b)')
+
+    # pending counts are discarded at every num_for_pruning sentences
+    pruned_extractor = WordExtractor(verbose_points=0)
+    pruned_extractor.update(sents_a, num_for_pruning=len(sents_a))
+    if not any(updated_extractor._pending.values()) or any(pruned_extractor._pending.values()):
+        raise ValueError('WordExtractor.update(num_for_pruning) does not discard pending counts')
+
+    # binary save / load with and without mmap
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as dirname:
+        word_extractor.save(os.path.join(dirname, 'model'), binary=True)
+        for use_mmap in [True, False]:
+            loaded_extractor = WordExtractor()
+            loaded_extractor.load(os.path.join(dirname, 'model'), use_mmap=use_mmap)
+            for name in ['L', 'R', '_aL', '_aR']:
+                if not (dict(getattr(loaded_extractor, name).items()) == dict(getattr(word_extractor, name))):
+                    raise ValueError('WordExtractor binary save / load (use_mmap={}) {} is different'.format(
+                        use_mmap, name))
+            if not (loaded_extractor.all_cohesion_scores() == word_extractor.all_cohesion_scores()):
+                raise ValueError('WordExtractor cohesion scores are different after load (use_mmap={})'.format(use_mmap))
+            del loaded_extractor
+
+    # approximate counting. Counts are overestimated, and the overestimation is
+    # larger than error_bound with probability at most 1 - confidence
+    import numpy as np
+    from soynlp.utils import CountMinSketch
+    sketch = CountMinSketch(width=2**12, depth=4)
+    keys = list(word_extractor.L)
+    sketch.add(keys, [word_extractor.L[key] for key in keys])
+    errors = sketch.estimate(keys) - np.asarray([word_extractor.L[key] for key in keys])
+    if not ((errors >= 0).all() and (errors > sketch.epsilon * sketch.num_of_counts).mean() <= sketch.delta):
+        raise ValueError('CountMinSketch estimation error is out of bound')
+
+    approximate_extractor = WordExtractor(verbose_points=0)
+    approximate_extractor.train(corpus, memory_budget=0.5, num_for_pruning=1000)
+    for name in ['L', 'R', '_aL', '_aR']:
+        exact, approximate = getattr(word_extractor, name), getattr(approximate_extractor, name)
+        bound, confidence = approximate_extractor.counting_error_bounds[name.strip('_')]
+        errors = [approximate[w] - f for w, f in exact.items() if w in approximate]
+        if not (min(errors) >= 0 and sum(error > bound for error in errors) <= (1 - confidence) * len(errors)):
+            raise ValueError('Approximate {} counts are out of error bound'.format(name))
+        # heavy hitters keep the true top 20
+        if not all(w in approximate for w in sorted(exact, key=lambda w:-exact[w])[:20]):
+            raise ValueError('Approximate {} counts miss the true top 20'.format(name))
+
+    # instrumentation
+    import io
+    import json
+    from soynlp.utils import Recorder
+    from soynlp.utils import JsonLogHandler
+    log = io.StringIO()
+    recorder = Recorder(handlers=[JsonLogHandler(log)], interval=0)
+    instrumented_extractor = WordExtractor(verbose_points=0, instrument=recorder)
+    instrumented_extractor.train(corpus)
+    if not (instrumented_extractor.extract() == word_scores):
+        raise ValueError('WordExtractor scores are different when it is instrumented')
+    recorder.close()
+    events = [json.loads(line) for line in log.getvalue().split('\n') if line]
+    stages = [event['stage'] for event in events if event['event'] == 'stage_end']
+    if not (stages == ['train', 'word_scores'] and recorder.counters['sents'] == len(corpus)):
+        raise ValueError('Recorder events are wrong: {}'.format(stages))
     print('word extractor test has been done\n\n')
 
 def noun_extractor_test(corpus_path):
@@ -148,8 +442,188 @@ def noun_extractor_test(corpus_path):
     topwords = sorted(noun_scores_v2, key=lambda x: -noun_scores_v2[x].score * noun_scores_v2[x].frequency)[:20]
     for word in topwords:
         print('word = {}, score = {}'.format(word, noun_scores_v2[word].score))
+
+    parallel_noun_extractor_v2 = LRNounExtractor_v2(verbose=False)
+    parallel_noun_scores_v2 = parallel_noun_extractor_v2.train_extract(corpus, n_jobs=2)
+    parallel_noun_scores_v2 = {noun:score for noun, score in parallel_noun_scores_v2.items() if len(noun) > 1}
+    if not (parallel_noun_scores_v2 == noun_scores_v2):
+        raise ValueError('LRNounExtractor_v2.train_extract(n_jobs=2) is different with sequential extraction')
+
+    # workers receive only the features, not the extractor with its instrument
+    from soynlp.utils import Recorder
+    recorder = Recorder(interval=0.1)
+    with spawn_start_method():
+        spawn_noun_extractor_v2 = LRNounExtractor_v2(verbose=False, instrument=recorder)
+        spawn_noun_scores_v2 = spawn_noun_extractor_v2.train_extract(corpus, n_jobs=2)
+    recorder.close()
+    spawn_noun_scores_v2 = {noun:score for noun, score in spawn_noun_scores_v2.items() if len(noun) > 1}
+    if not (spawn_noun_scores_v2 == noun_scores_v2):
+        raise ValueError('LRNounExtractor_v2.train_extract(n_jobs=2) with spawn start method is different with sequential extraction')
+
+    words = list(noun_extractor_v2.lrgraph._lr)[:1000]
+    supports, scores = noun_extractor_v2.predict_batch(words)
+    for word, support, score in zip(words, supports.tolist(), scores.tolist()):
+        if not (noun_extractor_v2.predict(word) == (support, score)):
+            raise ValueError('LRNounExtractor_v2.predict_batch({}) is different with predict'.format(word))
+    for word in words:
+        compound_parts = noun_extractor_v2._compound_trie.segment(word, noun_extractor_v2._pos_features)
+        if not ((compound_parts if compound_parts else (word,)) == noun_extractor_v2.decompose_compound(word)):
+            raise ValueError('Compound segmentation of {} is different with decompose_compound'.format(word))
+
+    # longer features word[e:] + r in feature trie
+    from soynlp.noun._noun_ver2 import _FeatureTrie
+    feature_trie = _FeatureTrie({'는', '이는', '에서', '에서는'}, {'했다', '었다'}, {'이'})
+    POS, NEG, COMMON = _FeatureTrie.POS, _FeatureTrie.NEG, _FeatureTrie.COMMON
+    expected_flags = {('아이', '는'): POS, ('서울에', '서'): POS, ('서울에', '서는'): POS,
+        ('했', '다'): NEG, ('없', '다'): 0, ('아', '가'): 0, ('선이', ''): COMMON, ('이에', '서'): POS}
+    for (word, r), flags in expected_flags.items():
+        if not (feature_trie.longer_flags(word, r) == flags):
+            raise ValueError('_FeatureTrie.longer_flags({}, {}) == {}'.format(
+                word, r, feature_trie.longer_flags(word, r)))
+    feature_sets = [(POS, noun_extractor_v2._pos_features), (NEG, noun_extractor_v2._neg_features),
+                    (COMMON, noun_extractor_v2._common_features)]
+    for word in words[:300]:
+        for r, _ in noun_extractor_v2.lrgraph.get_r(word, -1):
+            flags = sum(flag for flag, features in feature_sets
+                        if any(word[e:] + r in features for e in range(len(word))))
+            if not (noun_extractor_v2._feature_trie.longer_flags(word, r) == flags):
+                raise ValueError('_FeatureTrie.longer_flags({}, {}) is different with feature sets'.format(word, r))
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as dirname:
+        parallel_noun_extractor_v2.save(dirname)
+        loaded_noun_extractor_v2 = LRNounExtractor_v2(verbose=False)
+        loaded_noun_extractor_v2.load(dirname)
+        if not ({noun:score for noun, score in loaded_noun_extractor_v2.nouns.items()
+                 if len(noun) > 1} == noun_scores_v2):
+            raise ValueError('LRNounExtractor_v2 save / load is different with trained extractor')
+        for word in words[:100]:
+            if not (loaded_noun_extractor_v2.predict(word) == parallel_noun_extractor_v2.predict(word)):
+                raise ValueError('LRNounExtractor_v2.predict({}) is different after load'.format(word))
+        for word in words + list(parallel_noun_extractor_v2._compounds_components):
+            if not (loaded_noun_extractor_v2.decompose_compound(word)
+                    == parallel_noun_extractor_v2.decompose_compound(word)):
+                raise ValueError('LRNounExtractor_v2.decompose_compound({}) is different after load'.format(word))
+            if not (loaded_noun_extractor_v2._compound_trie.segment(word, loaded_noun_extractor_v2._pos_features)
+                    == parallel_noun_extractor_v2._compound_trie.segment(word, parallel_noun_extractor_v2._pos_features)):
+                raise ValueError('Compound segmentation of {} is different after load'.format(word))
     print('noun extractor test has been done\n\n')
 
+    # EojeolCounter
+    from soynlp.utils import EojeolCounter
+    eojeol_counter = EojeolCounter(corpus, min_count=2)
+    for sents in [corpus, DoublespaceLineCorpus(corpus_path)]:
+        serial_counter = EojeolCounter(sents, min_count=2)
+        parallel_counter = EojeolCounter(sents, min_count=2, n_jobs=2)
+        if not (serial_counter._counter == parallel_counter._counter):
+            raise ValueError('EojeolCounter(n_jobs=2) counts are different with serial counting')
+    with spawn_start_method():
+        spawn_counter = EojeolCounter(corpus, min_count=2, n_jobs=2)
+    if not (spawn_counter._counter == eojeol_counter._counter):
+        raise ValueError('EojeolCounter(n_jobs=2) with spawn start method is different with serial counting')
+    from soynlp.predicator import PredicatorExtractor
+    with spawn_start_method():
+        predicator_extractor = PredicatorExtractor(noun_scores_v2, ensure_normalized=True, verbose=False)
+        predicator_extractor.train(corpus, n_jobs=2)
+    if not (predicator_extractor.eojeol_counter._counter == eojeol_counter._counter):
+        raise ValueError('PredicatorExtractor.train(n_jobs=2) with spawn start method is different with serial counting')
+    # CompactLRGraph
+    from soynlp.utils import CompactLRGraph
+    from soynlp.utils import LRGraph
+    lrgraph = eojeol_counter.to_lrgraph()
+    compact_lrgraph = eojeol_counter.to_lrgraph(compact=True)
+    for l in lrgraph._lr:
+        if not (lrgraph.get_r(l, -1) == compact_lrgraph.get_r(l, -1)):
+            raise ValueError('CompactLRGraph.get_r is different with LRGraph.get_r')
+    # sorted neighbor lists are invalidated by add_lr_pair and remove_eojeol
+    for graph in [LRGraph({'아이': {'가': 3, '는': 2, '': 1}, '어른': {'이': 2, '는': 2}}),
+                  CompactLRGraph({'아이': {'가': 3, '는': 2, '': 1}, '어른': {'이': 2, '는': 2}})]:
+        name = type(graph).__name__
+        if not (graph.get_r('아이') == [('가', 3), ('는', 2), ('', 1)] and graph.get_l('는') == [('아이', 2), ('어른', 2)]):
+            raise ValueError('{}.get_r or get_l is wrong'.format(name))
+        graph.add_lr_pair('아이', '는', 2)
+        if not (graph.get_r('아이') == [('는', 4), ('가', 3), ('', 1)] and graph.get_l('는') == [('아이', 4), ('어른', 2)]):
+            raise ValueError('{}.get_r or get_l is wrong after add_lr_pair'.format(name))
+        graph.remove_eojeol('아이가', 3)
+        if not (graph.get_r('아이', topk=2) == [('는', 4), ('', 1)] and graph.get_l('가') == []):
+            raise ValueError('{}.get_r or get_l is wrong after remove_eojeol'.format(name))
+        graph.reset_lrgraph()
+        if not (graph.get_r('아이') == [('가', 3), ('는', 2), ('', 1)] and graph.get_l('가') == [('아이', 3)]):
+            raise ValueError('{}.get_r or get_l is wrong after reset_lrgraph'.format(name))
+
+    sorted_r = {l:lrgraph.get_r(l, -1) for l in lrgraph._lr}
+    sorted_l = {r:lrgraph.get_l(r, -1) for r in lrgraph._rl}
+    for eojeol in list(eojeol_counter._counter)[:100]:
+        lrgraph.remove_eojeol(eojeol, eojeol_counter[eojeol])
+        compact_lrgraph.remove_eojeol(eojeol, eojeol_counter[eojeol])
+    if not (dict(lrgraph._rl) == dict(compact_lrgraph._rl.items())):
+        raise ValueError('CompactLRGraph.remove_eojeol is different with LRGraph.remove_eojeol')
+    compact_lrgraph.reset_lrgraph()
+    if not (dict(compact_lrgraph._lr.items()) == dict(lrgraph._lr_origin)):
+        raise ValueError('CompactLRGraph.reset_lrgraph does not restore original graph')
+    # order of ties is kept after reset_lrgraph
+    lrgraph.reset_lrgraph()
+    for graph in [lrgraph, compact_lrgraph]:
+        if not all(graph.get_r(l, -1) == rlist for l, rlist in sorted_r.items()):
+            raise ValueError('{}.get_r after reset_lrgraph is different with the original graph'.format(
+                type(graph).__name__))
+        if not all(graph.get_l(r, -1) == llist for r, llist in sorted_l.items()):
+            raise ValueError('{}.get_l after reset_lrgraph is different with the original graph'.format(
+                type(graph).__name__))
+    noun_extractor_v2 = LRNounExtractor_v2(verbose=False)
+    noun_extractor_v2.train(eojeol_counter.to_lrgraph(compact=True))
+    if not (noun_extractor_v2.extract() == LRNounExtractor_v2(verbose=False).train_extract(eojeol_counter)):
+        raise ValueError('LRNounExtractor_v2 with CompactLRGraph is different with LRGraph')
+
+    # binary save / load
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, 'eojeol_counter.npz')
+        eojeol_counter.save(path, binary=True)
+        loaded_counter = EojeolCounter()
+        loaded_counter.load(path)
+        if not (loaded_counter._counter == eojeol_counter._counter):
+            raise ValueError('EojeolCounter binary save / load is different with original counter')
+        path = os.path.join(dirname, 'lrgraph.npz')
+        lrgraph.save(path, binary=True)
+        for loaded_lrgraph in [LRGraph(), CompactLRGraph()]:
+            loaded_lrgraph.load(path)
+            if not (dict(loaded_lrgraph._lr.items()) == dict(lrgraph._lr_origin)):
+                raise ValueError('LRGraph binary save / load is different with original graph')
+
+        # CompactLRGraph without original counts
+        frozen_lrgraph = eojeol_counter.to_lrgraph(compact=True)
+        frozen_lrgraph.remove_eojeol('있다', eojeol_counter['있다'])
+        frozen_lrgraph.freeze()
+        frozen_methods = [
+            lambda: frozen_lrgraph.save(path, binary=True),
+            lambda: frozen_lrgraph.save(path),
+            lambda: frozen_lrgraph.copy_compatified_lrgraph_origin(),
+            lambda: frozen_lrgraph.to_EojeolCounter(reset_lrgraph=True)
+        ]
+        for method in frozen_methods:
+            try:
+                method()
+                raise AssertionError
+            except ValueError:
+                pass
+            except AssertionError:
+                raise ValueError('CompactLRGraph should raise ValueError without original counts')
+        if '있다' in frozen_lrgraph.to_EojeolCounter()._counter:
+            raise ValueError('CompactLRGraph.to_EojeolCounter after freeze should keep removed counts')
+        try:
+            frozen_lrgraph.add_lr_pair('있다', '없는R')
+            raise ValueError('CompactLRGraph.add_lr_pair should raise ValueError with new pair')
+        except ValueError as e:
+            if 'cannot add new pair' not in str(e):
+                raise
+
+    merged_counter = eojeol_counter + eojeol_counter
+    if not (merged_counter['있다'] == 2 * eojeol_counter['있다']):
+        raise ValueError('EojeolCounter + EojeolCounter should sum counts')
+    print('eojeol counter test has been done\n\n')
+
 def pos_tagger_test():
     from soynlp.postagger import Dictionary
     from soynlp.postagger import LRTemplateMatcher
@@ -247,6 +721,7 @@ def main():
         help='DoublespaceLineCorpus text file')
     parser.add_argument('--pass_hangle', dest='pass_hangle', action='store_true')
     parser.add_argument('--pass_tokenizer', dest='pass_tokenizer', action='store_true')
+    parser.add_argument('--pass_corpus', dest='pass_corpus', action='store_true')
     parser.add_argument('--pass_word', dest='pass_word', action='store_true')
     parser.add_argument('--pass_noun', dest='pass_noun', action='store_true')
     parser.add_argument('--pass_pos', dest='pass_pos', action='store_true')
@@ -265,6 +740,9 @@ def main():
     if not args.pass_tokenizer:
         tokenizer_test()
     
+    if not args.pass_corpus:
+        corpus_test(corpus_path)
+
     if not args.pass_word:
         word_extractor_test(corpus_path)
     